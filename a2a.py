@@ -4,43 +4,64 @@ import time
 import json
 from typing import List, Dict
 
+from event_bus import EventBus
+from storage import as_database
+
 
 class A2ABus:
     def __init__(self, memory) -> None:
         self.memory = memory
+        self.db = as_database(memory)
+        # Optional live feed of sent messages for push consumers (SSE / long-poll).
+        self.events: EventBus | None = None
         self._init()
 
     def _init(self) -> None:
-        cur = self.memory._conn.cursor()
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS a2a_messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp REAL NOT NULL,
-                sender TEXT NOT NULL,
-                receiver TEXT NOT NULL,
-                message TEXT NOT NULL
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS a2a_messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp REAL NOT NULL,
+                    sender TEXT NOT NULL,
+                    receiver TEXT NOT NULL,
+                    message TEXT NOT NULL
+                )
+                """
             )
-            """
-        )
-        self.memory._conn.commit()
 
     def send(self, sender: str, receiver: str, message: str) -> int:
-        cur = self.memory._conn.cursor()
-        cur.execute(
-            "INSERT INTO a2a_messages (timestamp, sender, receiver, message) VALUES (?, ?, ?, ?)",
-            (time.time(), sender, receiver, message),
-        )
-        self.memory._conn.commit()
-        return cur.lastrowid
+        timestamp = time.time()
+        # With group commit enabled the row is queued and no id is available yet.
+        if getattr(self.memory, "group_writer", None) is not None:
+            self.memory._write(
+                "INSERT INTO a2a_messages (timestamp, sender, receiver, message) VALUES (?, ?, ?, ?)",
+                (timestamp, sender, receiver, message),
+            )
+            row_id = 0
+        else:
+            with self.db.write() as conn:
+                cur = conn.cursor()
+                cur.execute(
+                    "INSERT INTO a2a_messages (timestamp, sender, receiver, message) VALUES (?, ?, ?, ?)",
+                    (timestamp, sender, receiver, message),
+                )
+            row_id = cur.lastrowid
+        if self.events is not None:
+            self.events.publish({"timestamp": timestamp, "sender": sender, "receiver": receiver, "message": message})
+        return row_id
 
     def recent(self, limit: int = 20) -> List[Dict[str, str]]:
-        cur = self.memory._conn.cursor()
-        cur.execute(
-            "SELECT timestamp, sender, receiver, message FROM a2a_messages ORDER BY id DESC LIMIT ?",
-            (limit,),
-        )
-        rows = cur.fetchall()
+        if hasattr(self.memory, "_sync_writes"):
+            self.memory._sync_writes()
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT timestamp, sender, receiver, message FROM a2a_messages ORDER BY id DESC LIMIT ?",
+                (limit,),
+            )
+            rows = cur.fetchall()
         return [
             {
                 "timestamp": r[0],
@@ -77,6 +77,7 @@ from agents import PlannerAgent, RetrieverAgent, ExecutorAgent, VerifierAgent
 from calibration import confidence_from_evidence
 
 from deep_research import DeepResearch
+from plan_scheduler import DagScheduler, PlanBudget, parse_depends_on, parse_tool_limits, step_dependencies
 
 from multimodal import ocr_pdf, capture_screenshot
 from vla import LiveDriver
@@ -86,11 +87,12 @@ from browser_use_adapter import BrowserUseAdapter, WorkflowUseAdapter
 from workflow_recorder import WorkflowRecorder
 from audio_io import record_and_transcribe, speak_text
 from cost import estimate_tokens
-from cognitive import slow_mode, dot_ensemble
+from cognitive import current_pass, dot_ensemble, slow_mode_stream
 from workflows import run_workflow
 from perception import collect_observation
 
 from router import choose_model
+from llm_gateway import resolve_model
 
 from policy import requires_confirmation
 from team import TeamOrchestrator, AgentRole, ManagerWorkerOrchestrator
@@ -255,62 +257,15 @@ def _configure_agent(settings, instruction: str = "", prefer_offline: bool = Fal
         pass
 
     # OpenAI if key exists; otherwise fallback to local Ollama if configured.
-
-    openai_key = os.getenv("OPENAI_API_KEY")
-
-    if openai_key and not prefer_offline:
-        oi_interpreter.offline = False
-
-        mode = choose_model(instruction)
-
-        if mode == "coding":
-            model = settings.openai_coding_model
-        elif mode == "reasoning":
-            model = settings.openai_reasoning_model
-        else:
-            model = settings.openai_model
-        oi_interpreter.llm.model = model
-        return model
-
-
-    # Local fallback (optional)
-
-    mode = choose_model(instruction)
-
-    if mode == "coding":
-        ollama_model = os.getenv("OLLAMA_CODING_MODEL") or settings.ollama_coding_model
-    elif mode == "reasoning":
-        ollama_model = os.getenv("OLLAMA_REASONING_MODEL") or settings.ollama_reasoning_model
-    else:
-        ollama_model = os.getenv("OLLAMA_MODEL") or settings.ollama_model
-    ollama_base = os.getenv("OLLAMA_BASE", settings.ollama_base)
-
-    if ollama_model:
-        oi_interpreter.offline = True
-        oi_interpreter.llm.model = ollama_model
-        oi_interpreter.llm.api_base = ollama_base
-        return ollama_model
-
-    if openai_key:
+    backend, model = resolve_model(settings, instruction, prefer_offline=prefer_offline)
+    if backend == "openai":
         oi_interpreter.offline = False
-        mode = choose_model(instruction)
-        if mode == "coding":
-            model = settings.openai_coding_model
-        elif mode == "reasoning":
-            model = settings.openai_reasoning_model
-        else:
-            model = settings.openai_model
         oi_interpreter.llm.model = model
         return model
-
-
-    raise RuntimeError(
-
-        "No OpenAI key found and no local fallback configured. "
-
-        "Set OPENAI_API_KEY or set OLLAMA_MODEL (and optional OLLAMA_BASE)."
-
-    )
+    oi_interpreter.offline = True
+    oi_interpreter.llm.model = model
+    oi_interpreter.llm.api_base = os.getenv("OLLAMA_BASE", settings.ollama_base)
+    return model
 
 
 
@@ -324,6 +279,12 @@ APP_TITLE = "Agentic Console"
 
 class AgentApp:
 
+    # Guards the per-task tool call counter when plan steps run in parallel.
+    _tool_budget_lock = threading.Lock()
+    # One task run at a time across all queue lanes: current_run, stop_event, the tool
+    # budget and step approval are per-app state, and so is the open-interpreter client.
+    _run_lock = threading.RLock()
+
     def __init__(self, root, settings, engine: AgentEngine):
 
         self.root = root
@@ -373,7 +334,6 @@ class AgentApp:
         self.mcp = MCPAdapter()
         self.slow_mode = False
         self.dot_mode = False
-        self._memory_prune_stop = threading.Event()
         self._start_memory_prune_loop()
         self._a2a_async_enabled = os.getenv("AGENTIC_A2A_ASYNC", "false").lower() in ("1", "true", "yes", "on")
         if self._a2a_async_enabled:
@@ -404,6 +364,7 @@ class AgentApp:
         tool_prefixes = list(self.tools.tools.keys())
 
         tool_prefixes.append("index")
+        tool_prefixes.append("reindex")
         tool_prefixes.append("rag")
         tool_prefixes.append("deep_research")
         tool_prefixes.append("ocr")
@@ -488,6 +449,7 @@ class AgentApp:
         tool_prefixes.append("slow_mode")
         tool_prefixes.append("dot_mode")
         tool_prefixes.append("graph_query")
+        tool_prefixes.append("graph_path")
         tool_prefixes.append("perception")
         tool_prefixes.append("hybrid_rag")
         tool_prefixes.append("graph_add")
@@ -523,7 +485,13 @@ class AgentApp:
 
         self.verifier = VerifierAgent()
 
-        self.deep_research = DeepResearch(self._agent_chat, self._rag_search)
+        self.deep_research = DeepResearch(
+            self._agent_chat,
+            self._rag_search,
+            rag_search_many=self._rag_search_many,
+            max_subquestions=int(getattr(settings, "research_subquestions", 4)),
+            on_stage=self._record_research_stage,
+        )
 
         self.autonomy_level = self.memory.get("autonomy_level") or settings.autonomy_level
 
@@ -534,7 +502,11 @@ class AgentApp:
         self.memory.purge_audit_logs(settings.audit_retention_seconds)
         self.memory.purge_debug_logs(settings.debug_retention_seconds)
 
-        self.team = TeamOrchestrator(self._agent_chat)
+        self.team = TeamOrchestrator(
+            self._agent_chat,
+            context_tokens=int(getattr(settings, "team_context_tokens", 1500)),
+            local_select_roles=int(getattr(settings, "team_local_select_roles", 2)),
+        )
         self.edge_mode = self.memory.get("edge_mode") or "auto"
         self.agent_profile = self.memory.get("agent_profile") or ""
         self.demo_mode = settings.demo_mode.lower() == "true"
@@ -1067,10 +1039,18 @@ class AgentApp:
             trace_id=(extra or {}).get("trace_id") or trace_id,
         )
         log_audit(self.memory, "task_event", event.__dict__, redact=getattr(self, "redact_logs", False))
+        engine = getattr(self, "engine", None)
+        bus = getattr(engine, "events", None)
+        if bus is not None:
+            bus.publish(event.__dict__)
         try:
             if getattr(self, "current_run", None) and getattr(self.current_run, "events_path", ""):
-                with open(self.current_run.events_path, "a", encoding="utf-8") as handle:
-                    handle.write(json.dumps(event.__dict__) + "\n")
+                writer = getattr(engine, "event_log", None)
+                if writer is not None:
+                    writer.write(self.current_run.events_path, event.__dict__)
+                else:
+                    with open(self.current_run.events_path, "a", encoding="utf-8") as handle:
+                        handle.write(json.dumps(event.__dict__) + "\n")
         except Exception:
             pass
 
@@ -1203,7 +1183,10 @@ class AgentApp:
 
         def _loop():
             while True:
-                _dream()
+                try:
+                    self.task_queue.enqueue(_dream, lane="background")
+                except RuntimeError:
+                    return
                 time.sleep(max(1, interval_hours) * 3600)
 
         threading.Thread(target=_loop, daemon=True).start()
@@ -1332,7 +1315,7 @@ class AgentApp:
                             run = self._create_task_run(entry["command"])
                             run.approved = True
                             self.current_run = run
-                            self.task_queue.enqueue(lambda r=run: self._run_task_run(r))
+                            self.task_queue.enqueue(lambda r=run: self._run_task_run(r), lane="scheduled")
                             entry["next"] = now_ts + entry["every"]
                         except Exception:
                             entry["next"] = now_ts + entry["every"]
@@ -1724,7 +1707,7 @@ class AgentApp:
             action = "extract"
             target = step.split(" ", 1)[1].strip() if " " in step else ""
             reason = "Retrieve or extract information."
-        elif lowered.startswith(("workflow ", "graph_add ", "graph_edge ", "graph_query ")):
+        elif lowered.startswith(("workflow ", "graph_add ", "graph_edge ", "graph_query ", "graph_path ")):
             action = "graph"
             target = step.split(" ", 1)[1].strip() if " " in step else ""
             reason = "Update or query structured data."
@@ -1950,6 +1933,12 @@ class AgentApp:
         validate_transition(run.status, status)
         run.status = status
         self.memory.update_task_run(run.run_id, status=run.status)
+        if status in (OrchestratorState.COMPLETE.value, OrchestratorState.ERROR.value, OrchestratorState.STOPPED.value):
+            # Durability barrier: batched event/audit rows for this run are committed before it is reported done.
+            self.memory.flush()
+            writer = getattr(getattr(self, "engine", None), "event_log", None)
+            if writer is not None and run.events_path:
+                writer.close(run.events_path)
 
     def approve_run(self) -> None:
         if not self.current_run:
@@ -2008,6 +1997,10 @@ class AgentApp:
             handle.write("\n".join(lines))
 
     def _run_task_run(self, run: TaskRun) -> None:
+        with self._run_lock:
+            self._run_task_run_locked(run)
+
+    def _run_task_run_locked(self, run: TaskRun) -> None:
         if not run.approved:
             self.log_line("Execution blocked: plan not approved.")
             return
@@ -2136,6 +2129,7 @@ class AgentApp:
         data_lines = [f"RAG chunks: {stats['chunks']}", f"RAG sources: {stats['sources']}"]
         if stats['chunks'] == 0:
             data_lines.append("Index documents with: index <path>")
+        data_lines.append("Refresh an indexed folder with: reindex <dir>")
         data_lines.append("List RAG sources with: rag_sources")
         data_lines.append("Rank RAG source with: rag_rank <source> <rank>")
         tech = []
@@ -2272,30 +2266,23 @@ class AgentApp:
 
             pass
 
+    @property
+    def _current_step_id(self) -> int | None:
+        # Per thread: plan steps without mutual dependencies run concurrently.
+        return getattr(self.__dict__.get("_step_local"), "step_id", None)
+
+    @_current_step_id.setter
+    def _current_step_id(self, value: int | None) -> None:
+        self.__dict__.setdefault("_step_local", threading.local()).step_id = value
+
     def _memory_context(self) -> tuple[str | None, int | None]:
         run_id = self.current_run.run_id if getattr(self, "current_run", None) else None
         step_id = getattr(self, "_current_step_id", None)
         return run_id, step_id
 
     def _start_memory_prune_loop(self) -> None:
-        interval = getattr(self.settings, "memory_prune_interval_seconds", 0)
-        if interval <= 0:
-            return
-        try:
-            self.memory.prune_memories()
-        except Exception:
-            pass
-
-        def _loop() -> None:
-            while not self._memory_prune_stop.is_set():
-                try:
-                    self.memory.prune_memories()
-                except Exception:
-                    pass
-                self._memory_prune_stop.wait(interval)
-
-        t = threading.Thread(target=_loop, daemon=True)
-        t.start()
+        # Expiry runs on the engine's background sweeper; recall filters expired rows itself.
+        self.engine.start_memory_sweeper()
 
     def _start_watchers(self) -> None:
         watch_path = os.getenv("AGENTIC_WATCH_FILE", "")
@@ -2383,24 +2370,60 @@ class AgentApp:
 
 
     def _agent_chat(self, instruction):
+        similarity = float(getattr(self.settings, "convergence_similarity", 0.9))
         if getattr(self, "dot_mode", False):
-            return dot_ensemble(self._agent_chat_base, instruction)
+            timeout = float(getattr(self.settings, "ensemble_draft_timeout_seconds", 0) or 0)
+            return dot_ensemble(
+                self._agent_chat_base,
+                instruction,
+                n=int(getattr(self.settings, "ensemble_drafts", 3)),
+                # open-interpreter is a single shared client; only gateway calls may overlap.
+                concurrent=self._uses_llm_gateway(),
+                draft_timeout=timeout or None,
+                agree_threshold=similarity,
+                on_draft=self._log_draft,
+            )
         if getattr(self, "slow_mode", False):
-            return slow_mode(self._agent_chat_base, instruction)
+            answer = ""
+            passes = int(getattr(self.settings, "slow_mode_passes", 2))
+            for idx, answer in enumerate(slow_mode_stream(self._agent_chat_base, instruction, passes=passes, converge=similarity), 1):
+                self._log_event("slow_mode_pass", {"pass": idx, "passes": passes, "preview": answer[:200]})
+            return answer
         return self._agent_chat_base(instruction)
 
+    def _log_draft(self, index: int, text: str, latency: float, error: BaseException | None) -> None:
+        payload = {"draft": index + 1, "latency": round(latency, 3), "chars": len(text)}
+        if error is not None:
+            payload["error"] = str(error)[:200]
+        self._log_event("ensemble_draft", payload)
+
+    def _uses_llm_gateway(self) -> bool:
+        oi_mode = (getattr(self.settings, "oi_mode", "text_only") or "text_only").lower()
+        return (
+            getattr(getattr(self, "engine", None), "llm", None) is not None
+            and oi_mode == "text_only"
+            and str(getattr(self.settings, "llm_gateway", "false")).lower() in ("1", "true", "yes", "on")
+        )
+
     def _agent_chat_base(self, instruction):
 
         prefer_offline = getattr(self, "edge_mode", "auto") == "offline"
-        model_name = _configure_agent(self.settings, instruction, prefer_offline=prefer_offline)
+        oi_mode = (getattr(self.settings, "oi_mode", "text_only") or "text_only").lower()
+        use_gateway = self._uses_llm_gateway()
+        gateway = self.engine.llm if use_gateway else None
+        backend_name = ""
+        if use_gateway:
+            # Per-call model selection: nothing global is mutated, so concurrent chats don't interfere.
+            backend_name, model_name = resolve_model(self.settings, instruction, prefer_offline=prefer_offline)
+        else:
+            model_name = _configure_agent(self.settings, instruction, prefer_offline=prefer_offline)
         safety_hits = screen_text(instruction)
         if safety_hits:
             self.log_line(f"Safety screen flagged patterns: {', '.join(safety_hits)}")
 
-        oi_mode = (getattr(self.settings, "oi_mode", "text_only") or "text_only").lower()
         if oi_mode in ("disabled", "off", "false"):
             raise RuntimeError("open-interpreter is disabled by AGENTIC_OI_MODE")
-        if oi_mode == "text_only":
+        if oi_mode == "text_only" and not use_gateway:
             oi_interpreter.auto_run = False
             # Best-effort safety knobs if supported by open-interpreter.
             for attr in ("safe_mode", "block_code", "deny_shell"):
@@ -2409,10 +2432,10 @@ class AgentApp:
                         setattr(oi_interpreter, attr, True)
                     except Exception:
                         pass
-        else:
+        elif oi_mode != "text_only":
             oi_interpreter.auto_run = True
 
-        oi_interpreter.system_message = (
+        system_message = (
 
             "You are ChatGPT with full access to the user's computer and browser. "
 
@@ -2424,7 +2447,7 @@ class AgentApp:
 
         )
         if oi_mode == "text_only":
-            oi_interpreter.system_message += (
+            system_message += (
                 " IMPORTANT: Do NOT execute actions, run code, browse, or access files. "
                 "Respond with text-only guidance and proposed steps."
             )
@@ -2432,27 +2455,42 @@ class AgentApp:
         purpose = getattr(self, "purpose", "")
         mode = getattr(self, "analysis_mode", "fast")
         if mode == "rigorous":
-            oi_interpreter.system_message += (
+            system_message += (
                 " Use checkable steps, verify calculations, and cite sources where possible."
             )
         if purpose:
-            oi_interpreter.system_message += f" Current purpose: {purpose}."
+            system_message += f" Current purpose: {purpose}."
         profile = getattr(self, "agent_profile", "")
         if profile:
-            oi_interpreter.system_message += f" Current profile: {profile}."
+            system_message += f" Current profile: {profile}."
         try:
             user_profile = self.memory.get_user_profile("default")
             if user_profile:
-                oi_interpreter.system_message += f" User profile: {json.dumps(user_profile)}."
+                system_message += f" User profile: {json.dumps(user_profile)}."
         except Exception:
             pass
 
+        if not use_gateway:
+            oi_interpreter.system_message = system_message
+
         context = self.retriever.retrieve(instruction)
 
         if context:
 
             instruction = f"Context:\n{context}\n\nUser: {instruction}"
 
+        messages = None
+        if use_gateway:
+            # open-interpreter keeps its own transcript; the gateway is stateless, so replay recent turns.
+            max_messages = max(0, int(self.settings.max_chat_turns) * 2)
+            recent = list(self.chat_history)[-max_messages:] if max_messages else []
+            messages = [
+                {"role": m["role"], "content": m["content"]}
+                for m in recent
+                if m.get("role") in ("user", "assistant") and isinstance(m.get("content"), str)
+            ]
+            messages.append({"role": "user", "content": instruction})
+
         self._add_message("user", instruction)
 
         run_id, step_id = self._memory_context()
@@ -2469,7 +2507,7 @@ class AgentApp:
 
         if getattr(self, "current_run", None):
             run_id = self.current_run.run_id
-            prompt_hash = hashlib.sha256((oi_interpreter.system_message + instruction).encode("utf-8")).hexdigest()
+            prompt_hash = hashlib.sha256((system_message + instruction).encode("utf-8")).hexdigest()
             env_fp = f"{sys.platform}|{platform.python_version()}"
             self.memory.log_run_context(run_id, model_name or "", prompt_hash, "tools@local", env_fp)
 
@@ -2478,30 +2516,39 @@ class AgentApp:
         buf = io.StringIO()
         start = time.time()
 
-        with contextlib.redirect_stdout(buf), contextlib.redirect_stderr(buf):
-
+        if use_gateway:
             try:
+                result = gateway.chat(messages, backend=backend_name, model=model_name, system=system_message)
+            except Exception as exc:
+                if "quota" not in str(exc).lower():
+                    raise
+                backend_name, model_name = "ollama", self.settings.ollama_model
+                result = gateway.chat(messages, backend=backend_name, model=model_name, system=system_message)
+        else:
+            with contextlib.redirect_stdout(buf), contextlib.redirect_stderr(buf):
 
-                result = oi_interpreter.chat(instruction)
+                try:
 
-            except Exception as exc:
+                    result = oi_interpreter.chat(instruction)
 
-                msg = str(exc).lower()
+                except Exception as exc:
 
-                if "insufficient_quota" in msg or "quota" in msg:
+                    msg = str(exc).lower()
 
-                    oi_interpreter.offline = True
+                    if "insufficient_quota" in msg or "quota" in msg:
 
-                    oi_interpreter.llm.model = self.settings.ollama_model
+                        oi_interpreter.offline = True
 
-                    oi_interpreter.llm.api_base = self.settings.ollama_base
-                    model_name = self.settings.ollama_model
+                        oi_interpreter.llm.model = self.settings.ollama_model
 
-                    result = oi_interpreter.chat(instruction)
+                        oi_interpreter.llm.api_base = self.settings.ollama_base
+                        model_name = self.settings.ollama_model
 
-                else:
+                        result = oi_interpreter.chat(instruction)
 
-                    raise
+                    else:
+
+                        raise
 
         output = (buf.getvalue() or "").strip()
 
@@ -2542,7 +2589,10 @@ class AgentApp:
         latency = time.time() - start
         tokens_in = estimate_tokens(instruction)
         tokens_out = estimate_tokens(output)
-        is_openai = bool(os.getenv("OPENAI_API_KEY")) and not oi_interpreter.offline
+        if use_gateway:
+            is_openai = backend_name == "openai"
+        else:
+            is_openai = bool(os.getenv("OPENAI_API_KEY")) and not oi_interpreter.offline
         if is_openai:
             cost = estimate_cost(
                 tokens_in,
@@ -2557,7 +2607,7 @@ class AgentApp:
                 self.settings.ollama_cost_input_per_million,
                 self.settings.ollama_cost_output_per_million,
             )
-        self.memory.log_model_run(model_name or "", tokens_in, tokens_out, cost, latency)
+        self.memory.log_model_run(model_name or "", tokens_in, tokens_out, cost, latency, tag=current_pass())
         try:
             self.metrics.inc("tokens_in", tokens_in)
             self.metrics.inc("tokens_out", tokens_out)
@@ -2656,6 +2706,7 @@ class AgentApp:
             return None
         prompt = (
             "Return ONLY JSON for PlanSchema. Include goal, success_criteria, steps with tool and args. "
+            "Give a step depends_on (list of step_ids it needs) to let independent steps run in parallel. "
             "Available tools:\n"
             + json.dumps(tools, indent=2)
         )
@@ -2696,6 +2747,7 @@ class AgentApp:
                         max_attempts=int(s.get("max_attempts") or 2),
                         timeout_s=int(s.get("timeout_s") or 90),
                         success_check=s.get("success_check") or "",
+                        depends_on=parse_depends_on(s.get("depends_on")),
                     )
                 )
             if not steps and not data.get("needs_user_input"):
@@ -2735,6 +2787,12 @@ class AgentApp:
                 step.tool = "agent"
             if step.tool != "agent" and step.tool not in self.tools.tools:
                 step.tool = "agent"
+        try:
+            step_dependencies(plan.steps)
+        except ValueError:
+            # Unusable dependencies: fall back to running the steps in order.
+            for step in plan.steps:
+                step.depends_on = None
         return plan
 
     def _parse_verify(self, raw: str) -> Optional[VerifySchema]:
@@ -3023,32 +3081,45 @@ class AgentApp:
             report.status = "needs_input"
             report.failure_reason = "needs_user_input"
             return report
-        tool_calls = 0
         if "per_step" not in report.cost:
             report.cost["per_step"] = []
-        started = time.time()
-        for step in plan.steps:
-            if start_step_id and step.step_id < start_step_id:
-                continue
+        try:
+            step_dependencies(plan.steps)
+        except ValueError as exc:
+            report.status = "failed"
+            report.failure_reason = f"Invalid plan: {exc}"
+            steps_to_run: list[PlanStepSchema] = []
+        else:
+            steps_to_run = plan.steps
+        budget = PlanBudget(plan.budget, steps_used=len(report.steps))
+        report_lock = threading.Lock()
+        first_new = len(report.steps)
+
+        def _halt(status: str, reason: str | None = None) -> None:
+            # Concurrent steps may fail together; the first one decides the run's outcome.
+            with report_lock:
+                if report.status == "running":
+                    report.status = status
+                    if reason is not None:
+                        report.failure_reason = reason
+
+        def _run_step(step: PlanStepSchema) -> bool:
             self._current_step_id = step.step_id
-            self._write_run_state(plan, report, current_step=step.step_id)
-            if len(report.steps) >= plan.budget.max_steps:
+            with report_lock:
+                self._write_run_state(plan, report, current_step=step.step_id)
+            exceeded = budget.start_step()
+            if exceeded:
                 self._current_step_id = None
-                report.status = "failed"
-                report.failure_reason = "Budget exceeded: max_steps"
-                break
-            if (time.time() - started) > plan.budget.max_seconds:
-                self._current_step_id = None
-                report.status = "failed"
-                report.failure_reason = "Budget exceeded: max_seconds"
-                break
+                _halt("failed", exceeded)
+                return False
             self._log_event(
                 "step_started",
                 {"title": step.title, "tool": step.tool, "risk": step.risk},
                 extra={"step_id": step.step_id},
             )
             step_rep = StepReport(step_id=step.step_id, title=step.title, status="running")
-            report.steps.append(step_rep)
+            with report_lock:
+                report.steps.append(step_rep)
             try:
                 step_tokens = estimate_tokens(step.title + json.dumps(step.args))
                 step_cost = estimate_cost(
@@ -3060,22 +3131,18 @@ class AgentApp:
                 report.cost["per_step"].append({"step_id": step.step_id, "tokens": step_tokens, "cost": step_cost})
             except Exception:
                 pass
-            if step.tool != "agent":
-                tool_calls += 1
-                if tool_calls > plan.budget.max_tool_calls:
-                    self._current_step_id = None
-                    step_rep.status = "failed"
-                    report.status = "failed"
-                    report.failure_reason = "Budget exceeded: max_tool_calls"
-                    break
+            if step.tool != "agent" and not budget.take_tool_call():
+                self._current_step_id = None
+                step_rep.status = "failed"
+                _halt("failed", "Budget exceeded: max_tool_calls")
+                return False
             step.requires_confirmation = step.requires_confirmation or self._needs_approval(step.tool, step.args if isinstance(step.args, dict) else {})
             if step.requires_confirmation:
                 if self.memory.get(f"deny_tool:{step.tool}") == "true":
                     self._current_step_id = None
-                    report.status = "needs_input"
                     step_rep.status = "skipped"
-                    report.failure_reason = f"Tool {step.tool} blocked by policy"
-                    break
+                    _halt("needs_input", f"Tool {step.tool} blocked by policy")
+                    return False
                 if self.memory.get(f"allow_tool:{step.tool}") != "true" and self.step_approval_enabled:
                     pending_args = step.args.get("raw", "") if isinstance(step.args, dict) else ""
                     if step.tool == "computer":
@@ -3104,9 +3171,9 @@ class AgentApp:
                     self.memory.set("pending_step_id", str(step.step_id))
                     self.memory.set("pending_plan_run_id", plan.run_id)
                     self._current_step_id = None
-                    report.status = "needs_input"
                     step_rep.status = "skipped"
-                    break
+                    _halt("needs_input")
+                    return False
             ok = False
             for attempt in range(1, step.max_attempts + 1):
                 step_rep.attempts = attempt
@@ -3213,12 +3280,24 @@ class AgentApp:
                     extra={"step_id": step.step_id},
                 )
             self._log_event("step_finished", {"status": step_rep.status}, extra={"step_id": step.step_id})
-            if step_rep.status == "failed":
-                self._current_step_id = None
-                report.status = "failed"
-                report.failure_reason = f"Step {step.step_id} failed: {step.title}"
-                break
             self._current_step_id = None
+            if step_rep.status == "failed":
+                _halt("failed", f"Step {step.step_id} failed: {step.title}")
+                return False
+            return True
+
+        scheduler = DagScheduler(
+            max_workers=int(getattr(self.settings, "plan_max_workers", 4) or 1),
+            tool_limits=parse_tool_limits(
+                getattr(self.settings, "plan_tool_limits", ""),
+                concurrent_agent=self._uses_llm_gateway(),
+            ),
+        )
+        done = [step.step_id for step in plan.steps if start_step_id and step.step_id < start_step_id]
+        scheduler.run(steps_to_run, _run_step, done=done)
+        # Parallel steps append their reports as they start; report them in plan order.
+        order = {step.step_id: idx for idx, step in enumerate(plan.steps)}
+        report.steps[first_new:] = sorted(report.steps[first_new:], key=lambda rep: order.get(rep.step_id, len(order)))
         if report.status == "running":
             report.status = "succeeded"
         report.ended_at = time.time()
@@ -3365,6 +3444,7 @@ class AgentApp:
                         max_attempts=int(s.get("max_attempts") or 2),
                         timeout_s=int(s.get("timeout_s") or 90),
                         success_check=s.get("success_check") or "",
+                        depends_on=parse_depends_on(s.get("depends_on")),
                     )
                 )
             return PlanSchema(
@@ -3455,13 +3535,16 @@ class AgentApp:
 
     def _execute_tool(self, name: str, args: str, confirm: bool = False, dry_run: bool = False):
 
-        if not hasattr(self, "_tool_calls_this_task"):
-            self._tool_calls_this_task = 0
         max_calls = getattr(self.settings, "max_tool_calls_per_task", 0)
-        if max_calls and self._tool_calls_this_task >= max_calls:
+        with self._tool_budget_lock:
+            if not hasattr(self, "_tool_calls_this_task"):
+                self._tool_calls_this_task = 0
+            exceeded = bool(max_calls and self._tool_calls_this_task >= max_calls)
+            if not exceeded:
+                self._tool_calls_this_task += 1
+        if exceeded:
             self.metrics.inc("tool_budget_exceeded")
             raise RuntimeError("Tool call budget exceeded for this task")
-        self._tool_calls_this_task += 1
         self.metrics.add_tool_call(name)
 
         run_id = self.current_run.run_id if getattr(self, "current_run", None) else ""
@@ -3501,6 +3584,13 @@ class AgentApp:
 
         return self.rag.search(query, limit=limit)
 
+    def _rag_search_many(self, queries, limit: int = 5):
+        return self.rag.search_many(queries, limit=limit)
+
+    def _record_research_stage(self, stage: str, seconds: float) -> None:
+        self.metrics.set_timer(f"deep_research.{stage}", seconds)
+        self._log_event("research_stage", {"stage": stage, "seconds": round(seconds, 3)})
+
     def _explain_query(self, query: str) -> str:
         route = choose_model(query)
         memory_hits = self.retriever.retrieve(query)
@@ -3806,35 +3896,48 @@ class AgentApp:
             self.log_line(compliance_checklist())
             return
 
+        if lowered.startswith("reindex "):
+            path = step[8:].strip()
+            if not os.path.isdir(path):
+                self.log_line(f"Not a directory: {path}")
+                return
+            done = [0]
+
+            def _progress(_result: dict) -> None:
+                done[0] += 1
+                if done[0] % 500 == 0:
+                    self.log_line(f"Reindex progress: {done[0]} files")
+
+            report = self.rag.reindex_dir(path, on_progress=_progress)
+            self.log_line(
+                f"Reindexed {report['root']}: {report['added']} added, {report['updated']} updated, "
+                f"{report['removed']} removed, {report['unchanged']} unchanged, {report['skipped']} skipped "
+                f"({report['files_per_sec']:.1f} files/s, {report['chunks_per_sec']:.1f} chunks/s)"
+            )
+            return
+
         if lowered.startswith("index "):
 
             path = step[6:].strip()
 
             if os.path.isdir(path):
 
-                count = 0
-
-                for root, _dirs, files in os.walk(path):
-
-                    for name in files:
-
-                        full = os.path.join(root, name)
-
-                        try:
-
-                            self.rag.index_file(full)
-                            try:
-                                summary = self._agent_chat(f"Summarize new file: {full}")
-                                if summary:
-                                    self._broadcast_memory_sync({"kind": "file_summary", "content": summary})
-                            except Exception:
-                                pass
-
-                            count += 1
+                indexed = []
 
-                        except Exception:
+                def _collect(result: dict) -> None:
+                    if result["status"] in ("added", "updated"):
+                        indexed.append(result["path"])
 
-                            continue
+                files = [os.path.join(root, name) for root, _dirs, names in os.walk(path) for name in names]
+                report = self.rag.ingest_paths(files, on_progress=_collect)
+                for full in indexed:
+                    try:
+                        summary = self._agent_chat(f"Summarize new file: {full}")
+                        if summary:
+                            self._broadcast_memory_sync({"kind": "file_summary", "content": summary})
+                    except Exception:
+                        pass
+                count = report["added"] + report["updated"] + report["unchanged"]
 
                 self.log_line(f"Indexed {count} files")
 
@@ -3886,7 +3989,10 @@ class AgentApp:
 
             question = step[len("deep_research "):].strip()
 
-            output = self.deep_research.run(question)
+            output = self.deep_research.run(
+                question,
+                on_partial=lambda stage, text: self._log_event("research_partial", {"stage": stage, "preview": (text or "")[:500]}),
+            )
 
             self.log_line(output)
             if output:
@@ -4284,14 +4390,35 @@ class AgentApp:
             return
 
         if lowered.startswith("graph_query "):
-            entity = step[len("graph_query "):].strip()
-            results = self.graph.neighbors(entity)
+            parts = [s.strip() for s in step[len("graph_query "):].split("|")]
+            entity = parts[0]
+            if len(parts) > 1:
+                try:
+                    depth = int(parts[1])
+                except ValueError:
+                    self.log_line("graph_query requires: graph_query name [| depth [| rel]]")
+                    return
+                results = self.graph.k_hop(entity, depth=depth, rel_filter=parts[2] if len(parts) > 2 and parts[2] else None)
+            else:
+                results = self.graph.neighbors(entity)
             if not results:
                 self.log_line("No graph neighbors found.")
                 return
             self.log_line(json.dumps(results))
             return
 
+        if lowered.startswith("graph_path "):
+            parts = [s.strip() for s in step[len("graph_path "):].split("|")]
+            if len(parts) != 2:
+                self.log_line("graph_path requires: graph_path src | dst")
+                return
+            path = self.graph.shortest_path(parts[0], parts[1])
+            if not path:
+                self.log_line("No graph path found.")
+                return
+            self.log_line(" -> ".join(f"[{p['rel']}] {p['name']}" if p["rel"] else p["name"] for p in path))
+            return
+
         if lowered.startswith("graph_add "):
             raw = step[len("graph_add "):].strip()
             if "|" not in raw:
@@ -4610,7 +4737,13 @@ class AgentApp:
 
         try:
 
-            self._memory_prune_stop.set()
+            self.engine.stop_memory_sweeper()
+            # Let queued runs finish briefly; anything still queued after that is dropped with the process.
+            self.task_queue.shutdown(timeout=5)
+            if self.engine.llm is not None:
+                self.engine.llm.close()
+            self.memory.flush(timeout=5)
+            self.engine.event_log.close_all()
             try:
                 self.a2a_net.stop()
             except Exception:
@@ -5059,7 +5192,9 @@ class AgentApp:
                     AgentRole("Security", "Check for security risks; no tool use.", allowed_tools=[]),
                     AgentRole("QA", "Validate correctness and edge cases.", allowed_tools=[]),
                 ]
-                orchestrator = ManagerWorkerOrchestrator(self._agent_chat)
+                # Workers fan out only through the gateway; the open-interpreter client is shared.
+                fan_out = int(getattr(self.settings, "team_max_workers", 4)) if self._uses_llm_gateway() else 1
+                orchestrator = ManagerWorkerOrchestrator(self._agent_chat, max_workers=fan_out)
                 output = orchestrator.run(manager, workers, task)
                 for role in [manager] + workers:
                     self._log_event("agent_handoff", {"role": role.name, "tools": role.allowed_tools})
@@ -5266,7 +5401,7 @@ class AgentApp:
 
 
 
-            if lowered.startswith("index ") or lowered.startswith("rag ") or lowered.startswith("deep_research ") or lowered.startswith("ocr "):
+            if lowered.startswith("index ") or lowered.startswith("reindex ") or lowered.startswith("rag ") or lowered.startswith("deep_research ") or lowered.startswith("ocr "):
 
                 self._execute_step(cmd)
 
@@ -5314,6 +5449,40 @@ def _make_web_handler(app):
 
             self.wfile.write(body)
 
+        def _event_bus(self, channel):
+            if channel == "events":
+                return app.engine.events
+            if channel == "a2a":
+                return getattr(app.a2a, "events", None)
+            return None
+
+        def _stream_events(self, bus, channel, since, keepalive=15.0):
+            # Server-Sent Events: one blocked thread per client, no polling while idle.
+            self.close_connection = True
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-store")
+            self.send_header("X-Accel-Buffering", "no")
+            self.end_headers()
+            try:
+                self.wfile.write(b"retry: 1000\n\n")
+                self.wfile.flush()
+                while True:
+                    if not bus.wait(since, keepalive):
+                        self.wfile.write(b": keepalive\n\n")
+                        self.wfile.flush()
+                        continue
+                    events, dropped = bus.since(since)
+                    chunks = [f"event: dropped\ndata: {dropped}\n\n"] if dropped else []
+                    for event in events:
+                        data = json.dumps(event, default=str)
+                        chunks.append(f"id: {event['seq']}\nevent: {channel}\ndata: {data}\n\n")
+                    since = events[-1]["seq"] if events else bus.last_seq
+                    self.wfile.write("".join(chunks).encode("utf-8"))
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError, OSError):
+                return
+
 
 
         def do_GET(self):
@@ -5333,7 +5502,35 @@ def _make_web_handler(app):
                 return
 
             if path == "/api/metrics":
-                body = json.dumps(app.metrics.snapshot()).encode("utf-8")
+                snapshot = app.metrics.snapshot()
+                snapshot["task_queue"] = app.task_queue.stats()
+                body = json.dumps(snapshot).encode("utf-8")
+                self._send(HTTPStatus.OK, body, "application/json")
+                return
+            if path in ("/api/events", "/api/stream"):
+                qs = parse_qs(parsed.query or "")
+                channel = (qs.get("channel") or ["events"])[0]
+                bus = self._event_bus(channel)
+                if bus is None:
+                    self._send(HTTPStatus.NOT_FOUND, b"unknown channel", "text/plain")
+                    return
+                try:
+                    # EventSource reconnects resume from the last id it received.
+                    since = int(self.headers.get("Last-Event-ID") or (qs.get("since") or ["0"])[0])
+                    limit = max(1, min(int((qs.get("limit") or ["500"])[0]), 5000))
+                    wait = max(0.0, min(float((qs.get("wait") or ["0"])[0]), 30.0))
+                except ValueError:
+                    self._send(HTTPStatus.BAD_REQUEST, b"since, limit and wait must be numbers", "text/plain")
+                    return
+                if path == "/api/stream":
+                    self._stream_events(bus, channel, since)
+                    return
+                if wait:
+                    # Long-poll: hold the request until something newer than `since` arrives.
+                    bus.wait(since, wait)
+                events, dropped = bus.since(since, limit)
+                cursor = events[-1]["seq"] if events else min(since, bus.last_seq)
+                body = json.dumps({"events": events, "next": cursor, "dropped": dropped}, default=str).encode("utf-8")
                 self._send(HTTPStatus.OK, body, "application/json")
                 return
             if path == "/api/trace":
@@ -5497,6 +5694,25 @@ def _make_web_handler(app):
                 body = json.dumps(runs).encode("utf-8")
                 self._send(HTTPStatus.OK, body, "application/json")
                 return
+            if path == "/api/logs":
+                qs = parse_qs(parsed.query or "")
+                try:
+                    start = float((qs.get("start") or [""])[0]) if qs.get("start") else None
+                    end = float((qs.get("end") or [""])[0]) if qs.get("end") else None
+                    limit = int((qs.get("limit") or ["200"])[0])
+                    rows = app.memory.query_logs(
+                        (qs.get("table") or ["events"])[0],
+                        start=start,
+                        end=end,
+                        event_type=(qs.get("type") or [""])[0] or None,
+                        limit=max(1, min(limit, 5000)),
+                    )
+                except ValueError as exc:
+                    self._send(HTTPStatus.BAD_REQUEST, str(exc).encode("utf-8"), "text/plain")
+                    return
+                body = json.dumps(rows).encode("utf-8")
+                self._send(HTTPStatus.OK, body, "application/json")
+                return
             if path == "/api/run_diff":
                 qs = parse_qs(parsed.query or "")
                 run_a = (qs.get("run_a") or [""])[0]
@@ -5538,9 +5754,9 @@ def _make_web_handler(app):
                 payload = {
                     "metrics": app.metrics.snapshot(),
                     "a2a": app.a2a.recent(20),
-                    "events": app.memory.recent_events(50),
+                    "events": app.engine.events.recent(50),
                 }
-                body = json.dumps(payload).encode("utf-8")
+                body = json.dumps(payload, default=str).encode("utf-8")
                 self._send(HTTPStatus.OK, body, "application/json")
                 return
             if path == "/dashboard":
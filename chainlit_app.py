@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import os
 import time
@@ -19,38 +20,39 @@ engine.start_a2a()
 ctrl = HeadlessController()
 
 
+async def _next_events(bus, seq: int) -> tuple[list, int]:
+    # Waits in a worker thread, not on the event loop, until the bus has something after `seq`.
+    await asyncio.to_thread(bus.wait, seq, 15.0)
+    events, _ = bus.since(seq)
+    return events, events[-1]["seq"] if events else bus.last_seq
+
+
 async def _a2a_stream() -> None:
-    last_ts = 0.0
+    seq = 0
     while True:
         try:
-            msgs = engine.a2a.recent(50)
-            for m in reversed(msgs):
-                ts = float(m.get("timestamp", 0))
-                if ts <= last_ts:
-                    continue
-                last_ts = ts
+            msgs, seq = await _next_events(engine.a2a.events, seq)
+            for m in msgs:
                 sender = m.get("sender")
                 receiver = m.get("receiver")
                 message = m.get("message")
                 await cl.Step(name="A2A", type="tool").send(
                     output=f"{sender} -> {receiver}: {message}")
         except Exception:
-            pass
-        await cl.sleep(1)
+            await cl.sleep(1)
 
 
 async def _event_stream() -> None:
-    last_ts = 0.0
+    # Runs started from this UI execute on ctrl's engine, so its bus carries their events.
+    seq = 0
     while True:
         try:
-            events = engine.memory.get_recent_events(20)
-            for ev in reversed(events):
-                ts = float(ev.get("timestamp", 0))
-                if ts <= last_ts:
-                    continue
-                last_ts = ts
+            events, seq = await _next_events(ctrl.engine.events, seq)
+            for ev in events:
                 etype = ev.get("type") or ev.get("event_type")
                 payload = ev.get("payload")
+                if isinstance(payload, dict) and "payload" in payload:
+                    payload = payload["payload"]
                 if etype == "agent_handoff" and isinstance(payload, dict):
                     role = payload.get("role") or "Agent"
                     tools = payload.get("tools") or []
@@ -101,11 +103,10 @@ async def _event_stream() -> None:
                         await cl.Message(content="Timeline:\n" + "\n".join(lines)).send()
                         continue
                 await cl.Step(name="Event", type="tool").send(
-                    output=json.dumps({"type": etype, "payload": payload}, indent=2)
+                    output=json.dumps({"type": etype, "payload": payload}, indent=2, default=str)
                 )
         except Exception:
-            pass
-        await cl.sleep(2)
+            await cl.sleep(1)
 
 
 @cl.on_chat_start
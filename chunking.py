@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import hashlib
+import re
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+from cost import estimate_tokens
+from embeddings import tokenize
+
+# (chunk_index, start, end, text); text is always source[start:end] so offsets stay exact.
+Chunk = Tuple[int, int, int, str]
+
+SIMHASH_BITS = 64
+SIMHASH_MIN_TOKENS = 8
+# Blank lines, or a line break right before a markdown heading.
+_PARAGRAPH_RE = re.compile(r"\n\s*\n|\n(?=#{1,6}\s)")
+_HEADING_RE = re.compile(r"^#{1,6}\s", re.MULTILINE)
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def chunk_fixed(text: str, size: int = 1000, **_options) -> List[Chunk]:
+    """Fixed-size character windows (the original behaviour)."""
+    spans = [(i, min(i + size, len(text))) for i in range(0, len(text), max(1, size))]
+    return _finish(text, spans)
+
+
+def chunk_sliding(text: str, size: int = 1000, overlap: int = 200, **_options) -> List[Chunk]:
+    """Windows of about `size` characters overlapping by `overlap`, ending on whitespace when possible."""
+    size = max(1, size)
+    overlap = max(0, min(overlap, size - 1))
+    spans = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            cut = text.rfind(" ", start + size // 2, end)
+            if cut > start:
+                end = cut
+        spans.append((start, end))
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return _finish(text, spans)
+
+
+def chunk_paragraphs(text: str, size: int = 1000, **_options) -> List[Chunk]:
+    """Pack whole paragraphs up to `size` characters, starting a new chunk at every heading.
+
+    Paragraphs longer than `size` are split on sentence boundaries, then on whitespace.
+    """
+    headings = {m.start() for m in _HEADING_RE.finditer(text)}
+    units = []
+    for start, end in _split_spans(text, _PARAGRAPH_RE, 0, len(text)):
+        if end - start > size:
+            units.extend(_split_long(text, start, end, size))
+        else:
+            units.append((start, end))
+    return _finish(text, _pack(units, lambda start, end: end - start, size, headings))
+
+
+def chunk_tokens(text: str, max_tokens: int = 256, overlap_tokens: int = 0, **_options) -> List[Chunk]:
+    """Pack sentences until `cost.estimate_tokens` would exceed `max_tokens`.
+
+    With `overlap_tokens`, each chunk starts with trailing sentences of the previous
+    one worth up to that many tokens.
+    """
+    size_chars = max(1, max_tokens * 4)
+    units = []
+    for start, end in _split_spans(text, _SENTENCE_RE, 0, len(text)):
+        if estimate_tokens(text[start:end]) > max_tokens:
+            units.extend(_split_long(text, start, end, size_chars))
+        else:
+            units.append((start, end))
+    spans = _pack(units, lambda start, end: estimate_tokens(text[start:end]), max_tokens)
+    if overlap_tokens > 0 and len(spans) > 1:
+        starts = [start for start, _ in units]
+        overlapped = [spans[0]]
+        for start, end in spans[1:]:
+            new_start = start
+            for unit_start in reversed([s for s in starts if s < start]):
+                if estimate_tokens(text[unit_start:start]) > overlap_tokens:
+                    break
+                new_start = unit_start
+            overlapped.append((new_start, end))
+        spans = overlapped
+    return _finish(text, spans)
+
+
+STRATEGIES: Dict[str, Callable[..., List[Chunk]]] = {
+    "fixed": chunk_fixed,
+    "sliding": chunk_sliding,
+    "paragraph": chunk_paragraphs,
+    "tokens": chunk_tokens,
+}
+
+
+def chunk_text(text: str, strategy: str = "fixed", **options) -> List[Chunk]:
+    try:
+        chunker = STRATEGIES[strategy]
+    except KeyError:
+        raise ValueError(f"Unknown chunking strategy: {strategy}") from None
+    return chunker(text, **options)
+
+
+def simhash(text: str, bits: int = SIMHASH_BITS) -> Optional[int]:
+    """Charikar simhash over token counts; None for texts too short to fingerprint reliably."""
+    counts = Counter(tokenize(text))
+    if sum(counts.values()) < SIMHASH_MIN_TOKENS:
+        return None
+    weights = [0] * bits
+    for token, count in counts.items():
+        value = int.from_bytes(hashlib.sha1(token.encode("utf-8")).digest()[: bits // 8], "big")
+        for bit in range(bits):
+            weights[bit] += count if value >> bit & 1 else -count
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def simhash_bands(fingerprint: int, bands: int = 4, bits: int = SIMHASH_BITS) -> List[int]:
+    """Band keys for near-duplicate lookup: fingerprints within `bands - 1` bits share one."""
+    width = bits // bands
+    mask = (1 << width) - 1
+    return [band * (mask + 1) + ((fingerprint >> (band * width)) & mask) for band in range(bands)]
+
+
+def to_signed64(value: int) -> int:
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def from_signed64(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+def _split_spans(text: str, pattern: re.Pattern, start: int, end: int) -> List[Tuple[int, int]]:
+    spans = []
+    pos = start
+    for match in pattern.finditer(text, start, end):
+        if match.start() > pos:
+            spans.append((pos, match.start()))
+        pos = match.end()
+    if pos < end:
+        spans.append((pos, end))
+    return spans
+
+
+def _split_long(text: str, start: int, end: int, size: int) -> List[Tuple[int, int]]:
+    pieces = []
+    for s, e in _split_spans(text, _SENTENCE_RE, start, end):
+        while e - s > size:
+            cut = text.rfind(" ", s + size // 2, s + size)
+            cut = cut if cut > s else s + size
+            pieces.append((s, cut))
+            s = cut
+        pieces.append((s, e))
+    return pieces
+
+
+def _pack(
+    units: List[Tuple[int, int]],
+    measure: Callable[[int, int], int],
+    budget: int,
+    breaks: Optional[set] = None,
+) -> List[Tuple[int, int]]:
+    spans: List[Tuple[int, int]] = []
+    current: Optional[Tuple[int, int]] = None
+    for start, end in units:
+        if current is None:
+            current = (start, end)
+        elif (breaks and start in breaks) or measure(current[0], end) > budget:
+            spans.append(current)
+            current = (start, end)
+        else:
+            current = (current[0], end)
+    if current is not None:
+        spans.append(current)
+    return spans
+
+
+def _finish(text: str, spans: List[Tuple[int, int]]) -> List[Chunk]:
+    chunks = []
+    for start, end in spans:
+        piece = text[start:end]
+        if piece.strip():
+            chunks.append((len(chunks), start, end, piece))
+    return chunks
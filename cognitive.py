@@ -1,28 +1,167 @@
 from __future__ import annotations
 
-from typing import List, Callable
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# (draft index, text, latency seconds, error) for each finished draft.
+DraftCallback = Callable[[int, str, float, Optional[BaseException]], None]
+
+_pass = threading.local()
+_WORD_RE = re.compile(r"\w+")
+
+
+def current_pass() -> str:
+    """Label of the ensemble draft or slow-mode pass running on this thread, "" outside one.
+
+    Chat functions read it to tag what they record (e.g. `model_runs.tag`).
+    """
+    return getattr(_pass, "label", "")
+
+
+def _labelled(agent_chat: Callable[[str], str], label: str, prompt: str) -> str:
+    _pass.label = label
+    try:
+        return agent_chat(prompt)
+    finally:
+        _pass.label = ""
+
+
+def similarity(a: str, b: str) -> float:
+    """Jaccard overlap of the two texts' lowercase word sets (1.0 for identical wording)."""
+    words_a = set(_WORD_RE.findall(a.lower()))
+    words_b = set(_WORD_RE.findall(b.lower()))
+    if not words_a and not words_b:
+        return 1.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+
+def _agreeing(drafts: Dict[int, str], quorum: int, threshold: float) -> Optional[int]:
+    """Index of a draft that at least `quorum` drafts (itself included) agree with, if any."""
+    if quorum < 2 or len(drafts) < quorum:
+        return None
+    for i, text in sorted(drafts.items()):
+        if sum(1 for other in drafts.values() if similarity(text, other) >= threshold) >= quorum:
+            return i
+    return None
 
 
 def slow_mode(agent_chat: Callable[[str], str], prompt: str, passes: int = 2) -> str:
     result = ""
     for i in range(passes):
-        result = agent_chat(
-            f"System 2 pass {i+1}/{passes}. Think deliberately before answering.\n\n{prompt}"
+        result = _labelled(
+            agent_chat,
+            f"pass {i+1}/{passes}",
+            f"System 2 pass {i+1}/{passes}. Think deliberately before answering.\n\n{prompt}",
         )
     return result
 
 
-def dot_ensemble(agent_chat: Callable[[str], str], prompt: str, n: int = 3) -> str:
-    drafts: List[str] = []
-    for i in range(n):
-        drafts.append(agent_chat(f"Draft {i+1}/{n}:\n{prompt}"))
-    critique = agent_chat(
+def slow_mode_stream(
+    agent_chat: Callable[[str], str],
+    prompt: str,
+    passes: int = 3,
+    converge: float = 0.9,
+) -> Iterator[str]:
+    """Yield each System 2 pass as it completes; every pass refines the previous answer.
+
+    Stops early once two successive answers have a `similarity` of at least `converge`.
+    """
+    previous: Optional[str] = None
+    for i in range(passes):
+        text = f"System 2 pass {i+1}/{passes}. Think deliberately before answering.\n\n{prompt}"
+        if previous is not None:
+            text += f"\n\nPrevious answer:\n{previous}\n\nImprove it, or repeat it if it is already right."
+        answer = _labelled(agent_chat, f"pass {i+1}/{passes}", text)
+        yield answer
+        if previous is not None and similarity(previous, answer) >= converge:
+            return
+        previous = answer
+
+
+def dot_ensemble(
+    agent_chat: Callable[[str], str],
+    prompt: str,
+    n: int = 3,
+    concurrent: bool = False,
+    draft_timeout: float | None = None,
+    quorum: int | None = None,
+    agree_threshold: float = 0.9,
+    on_draft: Optional[DraftCallback] = None,
+) -> str:
+    """Generate `n` drafts, then let a critique pass pick the best.
+
+    With `concurrent`, drafts are requested in parallel (only safe when
+    `agent_chat` is). As soon as `quorum` drafts (default: a majority) agree
+    within `agree_threshold` similarity, that draft is returned without waiting
+    for the rest or running the critique. Drafts that fail, or are not back
+    within `draft_timeout` seconds, are dropped; the ensemble only fails when no
+    draft arrives at all.
+    """
+    quorum = n // 2 + 1 if quorum is None else quorum
+    drafts: Dict[int, str] = {}
+    errors: List[BaseException] = []
+
+    def _draft(i: int) -> Tuple[str, float, Optional[BaseException]]:
+        started = time.monotonic()
+        try:
+            text = _labelled(agent_chat, f"draft {i+1}/{n}", f"Draft {i+1}/{n}:\n{prompt}")
+            return text, time.monotonic() - started, None
+        except Exception as exc:
+            return "", time.monotonic() - started, exc
+
+    def _record(i: int, result: Tuple[str, float, Optional[BaseException]]) -> Optional[int]:
+        text, latency, error = result
+        if error is None:
+            drafts[i] = text
+        else:
+            errors.append(error)
+        if on_draft is not None:
+            on_draft(i, text, latency, error)
+        return _agreeing(drafts, quorum, agree_threshold)
+
+    if concurrent and n > 1:
+        pool = ThreadPoolExecutor(max_workers=n, thread_name_prefix="dot-draft")
+        try:
+            futures = {pool.submit(_draft, i): i for i in range(n)}
+            deadline = None if draft_timeout is None else time.monotonic() + draft_timeout
+            pending = set(futures)
+            while pending:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                for future in sorted(done, key=futures.get):
+                    agreed = _record(futures[future], future.result())
+                    if agreed is not None:
+                        return drafts[agreed]
+        finally:
+            # Stragglers finish in the background; their results are ignored.
+            pool.shutdown(wait=False, cancel_futures=True)
+    else:
+        for i in range(n):
+            agreed = _record(i, _draft(i))
+            if agreed is not None:
+                return drafts[agreed]
+
+    if not drafts:
+        if errors:
+            raise errors[0]
+        raise TimeoutError(f"No ensemble draft finished within {draft_timeout}s")
+    if len(drafts) == 1:
+        return next(iter(drafts.values()))
+    critique = _labelled(
+        agent_chat,
+        "critique",
         "Evaluate the drafts and pick the best. Return the best draft index and a brief reason.\n\n"
-        + "\n\n".join(f"Draft {i+1}:\n{d}" for i, d in enumerate(drafts))
+        + "\n\n".join(f"Draft {i+1}:\n{d}" for i, d in sorted(drafts.items())),
     )
     # Simple selection: choose first unless critique names an index.
-    chosen = drafts[0]
-    for i in range(n):
+    indices = sorted(drafts)
+    chosen = drafts[indices[0]]
+    for i in indices:
         token = f"draft {i+1}"
         if token in critique.lower():
             chosen = drafts[i]
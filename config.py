@@ -35,21 +35,62 @@ def _env(name: str, default: str) -> str:
 class Settings:
     data_dir: str = _env("AGENTIC_DATA_DIR", os.path.join(os.getcwd(), "data"))
     memory_db: str = _env("AGENTIC_MEMORY_DB", os.path.join(os.getcwd(), "data", "memory.db"))
+    log_partition_dir: str = _env("AGENTIC_LOG_PARTITION_DIR", os.path.join(os.getcwd(), "data", "logs"))
     log_file: str = _env("AGENTIC_LOG_FILE", os.path.join(os.getcwd(), "data", "agentic.log"))
     ollama_base: str = _env("OLLAMA_BASE", "http://127.0.0.1:11434")
     ollama_model: str = _env("OLLAMA_MODEL", "phi3:latest")
     openai_model: str = _env("OPENAI_MODEL", "gpt-5.1")
     openai_reasoning_model: str = _env("OPENAI_REASONING_MODEL", _env("OPENAI_MODEL", "gpt-5.1"))
     openai_coding_model: str = _env("OPENAI_CODING_MODEL", _env("OPENAI_MODEL", "gpt-5.1"))
+    openai_base_url: str = _env("OPENAI_BASE_URL", "https://api.openai.com/v1")
     ollama_reasoning_model: str = _env("OLLAMA_REASONING_MODEL", _env("OLLAMA_MODEL", "phi3:latest"))
     ollama_coding_model: str = _env("OLLAMA_CODING_MODEL", _env("OLLAMA_MODEL", "phi3:latest"))
     embedding_dim: int = int(_env("AGENTIC_EMBEDDING_DIM", "256"))
     short_memory_ttl: int = int(_env("AGENTIC_SHORT_MEMORY_TTL", "86400"))
     long_memory_ttl: int = int(_env("AGENTIC_LONG_MEMORY_TTL", "2592000"))
+    memory_ann_threshold: int = int(_env("AGENTIC_MEMORY_ANN_THRESHOLD", "50000"))
+    memory_ann_nprobe: int = int(_env("AGENTIC_MEMORY_ANN_NPROBE", "8"))
     memory_prune_interval_seconds: int = int(_env("AGENTIC_MEMORY_PRUNE_INTERVAL_SECONDS", "3600"))
+    memory_prune_batch_size: int = int(_env("AGENTIC_MEMORY_PRUNE_BATCH_SIZE", "500"))
+    memory_consolidate_interval_seconds: int = int(_env("AGENTIC_MEMORY_CONSOLIDATE_INTERVAL_SECONDS", "21600"))
+    memory_merge_threshold: float = float(_env("AGENTIC_MEMORY_MERGE_THRESHOLD", "0.92"))
+    memory_archive_after_seconds: int = int(_env("AGENTIC_MEMORY_ARCHIVE_AFTER_SECONDS", "0"))
+    retrieval_cache_size: int = int(_env("AGENTIC_RETRIEVAL_CACHE_SIZE", "256"))
+    retrieval_cache_ttl_seconds: int = int(_env("AGENTIC_RETRIEVAL_CACHE_TTL_SECONDS", "300"))
+    graph_snapshot: str = _env("AGENTIC_GRAPH_SNAPSHOT", "false")
+    rag_search_mode: str = _env("AGENTIC_RAG_SEARCH_MODE", "hybrid")
+    rag_ingest_workers: int = int(_env("AGENTIC_RAG_INGEST_WORKERS", "0"))
+    rag_ingest_batch_rows: int = int(_env("AGENTIC_RAG_INGEST_BATCH_ROWS", "500"))
+    rag_chunker: str = _env("AGENTIC_RAG_CHUNKER", "paragraph")
+    rag_chunk_size: int = int(_env("AGENTIC_RAG_CHUNK_SIZE", "1000"))
+    rag_chunk_overlap: int = int(_env("AGENTIC_RAG_CHUNK_OVERLAP", "200"))
+    rag_chunk_max_tokens: int = int(_env("AGENTIC_RAG_CHUNK_MAX_TOKENS", "256"))
+    rag_dedup_distance: int = int(_env("AGENTIC_RAG_DEDUP_DISTANCE", "3"))
+    db_reader_pool_size: int = int(_env("AGENTIC_DB_READERS", "4"))
+    db_synchronous: str = _env("AGENTIC_DB_SYNCHRONOUS", "NORMAL")
+    db_cache_size_kb: int = int(_env("AGENTIC_DB_CACHE_KB", "65536"))
+    db_mmap_size_mb: int = int(_env("AGENTIC_DB_MMAP_MB", "256"))
+    group_commit: str = _env("AGENTIC_GROUP_COMMIT", "false")
+    group_commit_max_rows: int = int(_env("AGENTIC_GROUP_COMMIT_MAX_ROWS", "200"))
+    group_commit_interval_ms: int = int(_env("AGENTIC_GROUP_COMMIT_INTERVAL_MS", "50"))
+    group_commit_max_pending: int = int(_env("AGENTIC_GROUP_COMMIT_MAX_PENDING", "10000"))
+    llm_gateway: str = _env("AGENTIC_LLM_GATEWAY", "false")
+    llm_timeout_seconds: float = float(_env("AGENTIC_LLM_TIMEOUT_SECONDS", "120"))
+    llm_openai_concurrency: int = int(_env("AGENTIC_LLM_OPENAI_CONCURRENCY", "8"))
+    llm_ollama_concurrency: int = int(_env("AGENTIC_LLM_OLLAMA_CONCURRENCY", "2"))
+    ensemble_drafts: int = int(_env("AGENTIC_ENSEMBLE_DRAFTS", "3"))
+    ensemble_draft_timeout_seconds: float = float(_env("AGENTIC_ENSEMBLE_DRAFT_TIMEOUT_SECONDS", "90"))
+    slow_mode_passes: int = int(_env("AGENTIC_SLOW_MODE_PASSES", "2"))
+    convergence_similarity: float = float(_env("AGENTIC_CONVERGENCE_SIMILARITY", "0.9"))
+    team_max_workers: int = int(_env("AGENTIC_TEAM_MAX_WORKERS", "4"))
+    team_context_tokens: int = int(_env("AGENTIC_TEAM_CONTEXT_TOKENS", "1500"))
+    team_local_select_roles: int = int(_env("AGENTIC_TEAM_LOCAL_SELECT_ROLES", "2"))
+    research_subquestions: int = int(_env("AGENTIC_RESEARCH_SUBQUESTIONS", "4"))
     max_chat_turns: int = int(_env("CHAT_HISTORY_TURNS", "20"))
     auto_summarize: str = _env("AGENTIC_AUTO_SUMMARIZE", "true")
     task_queue_size: int = int(_env("AGENTIC_TASK_QUEUE_SIZE", "100"))
+    task_queue_workers: int = int(_env("AGENTIC_TASK_QUEUE_WORKERS", "3"))
+    task_queue_lanes: str = _env("AGENTIC_TASK_QUEUE_LANES", "interactive=1,scheduled=1,background=1")
     autonomy_level: str = _env("AGENTIC_AUTONOMY_LEVEL", "semi")
     server_host: str = _env("AGENTIC_WEB_HOST", "127.0.0.1")
     server_port: int = int(_env("AGENTIC_WEB_PORT", "8333"))
@@ -58,6 +99,7 @@ class Settings:
     redact_logs: str = _env("AGENTIC_REDACT_LOGS", "true")
     purpose: str = _env("AGENTIC_PURPOSE", "")
     event_retention_seconds: int = int(_env("AGENTIC_EVENT_RETENTION_SECONDS", "2592000"))
+    event_buffer_size: int = int(_env("AGENTIC_EVENT_BUFFER_SIZE", "1000"))
     audit_retention_seconds: int = int(_env("AGENTIC_AUDIT_RETENTION_SECONDS", _env("AGENTIC_EVENT_RETENTION_SECONDS", "2592000")))
     debug_retention_seconds: int = int(_env("AGENTIC_DEBUG_RETENTION_SECONDS", _env("AGENTIC_EVENT_RETENTION_SECONDS", "2592000")))
     policy_path: str = _env("AGENTIC_POLICY_PATH", "")
@@ -68,6 +110,8 @@ class Settings:
     ollama_cost_output_per_million: float = float(_env("OLLAMA_COST_OUTPUT_PER_1M", "0"))
     max_plan_steps: int = int(_env("AGENTIC_MAX_PLAN_STEPS", "20"))
     max_tool_calls_per_task: int = int(_env("AGENTIC_MAX_TOOL_CALLS", "50"))
+    plan_max_workers: int = int(_env("AGENTIC_PLAN_MAX_WORKERS", "4"))
+    plan_tool_limits: str = _env("AGENTIC_PLAN_TOOL_LIMITS", "computer=1,vm=1,browser=1")
     oi_mode: str = _env("AGENTIC_OI_MODE", "text_only")
     replay_mode: str = _env("AGENTIC_REPLAY_MODE", "false")
     a2a_listen: str = _env("AGENTIC_A2A_LISTEN", "true")
@@ -34,6 +34,7 @@ from core.schemas import (
     Budget,
 )
 from agents import PlannerAgent, RetrieverAgent, VerifierAgent
+from plan_scheduler import DagScheduler, PlanBudget, parse_depends_on, parse_tool_limits, step_dependencies
 from core.run_state import list_run_dirs, summarize_run, load_json
 
 
@@ -79,6 +80,8 @@ class HeadlessController:
         self.engine = AgentEngine(self.settings)
         self.memory = self.engine.memory
         self.activity_log: List[Dict] = []
+        # Bumped on every log() so UIs can skip re-rendering when nothing changed.
+        self.activity_seq = 0
 
         self.root = tk.Tk()
         self.root.withdraw()
@@ -103,6 +106,7 @@ class HeadlessController:
         self.activity_log.append(event)
         if len(self.activity_log) > 500:
             self.activity_log.pop(0)
+        self.activity_seq += 1
 
     def _sync_from_app(self) -> None:
         self.current_run = self.app.current_run
@@ -145,6 +149,7 @@ class HeadlessController:
                         max_attempts=int(s.get("max_attempts") or 2),
                         timeout_s=int(s.get("timeout_s") or 90),
                         success_check=s.get("success_check") or "",
+                        depends_on=parse_depends_on(s.get("depends_on")),
                     )
                 )
             if not steps:
@@ -247,8 +252,10 @@ class HeadlessController:
             started_at=time.time(),
             ended_at=0.0,
         )
-        tool_calls = 0
-        for step in plan.steps:
+        budget = PlanBudget(plan.budget)
+        report_lock = threading.Lock()
+
+        def _run_step(step: PlanStepSchema) -> bool:
             try:
                 step.requires_confirmation = step.requires_confirmation or self.app._needs_approval(step.tool, step.args if isinstance(step.args, dict) else {})
             except Exception:
@@ -257,14 +264,14 @@ class HeadlessController:
                     if backend == "desktop" and self.get_desktop_approval():
                         step.requires_confirmation = True
             step_report = StepReport(step_id=step.step_id, title=step.title, status="running")
-            report.steps.append(step_report)
+            with report_lock:
+                report.steps.append(step_report)
+            reason = budget.start_step()
             for attempt in range(1, step.max_attempts + 1):
                 step_report.attempts = attempt
-                tool_calls += 1
-                if tool_calls > plan.budget.max_tool_calls:
+                if reason or not budget.take_tool_call():
+                    reason = reason or "Budget exceeded: max_tool_calls"
                     step_report.status = "failed"
-                    report.status = "failed"
-                    report.failure_reason = "Budget exceeded: max_tool_calls"
                     break
                 command = step.args.get("command")
                 if not command:
@@ -287,9 +294,8 @@ class HeadlessController:
                         "pending_action",
                         json.dumps({"type": "tool", "name": step.tool, "args": pending_args}),
                     )
-                    report.status = "needs_input"
                     step_report.status = "skipped"
-                    report.failure_reason = f"Approval required for {step.tool}"
+                    reason = f"Approval required for {step.tool}"
                     break
                 t0 = time.time()
                 ok = False
@@ -337,10 +343,29 @@ class HeadlessController:
                     step_report.status = "succeeded"
                     break
             if step_report.status != "succeeded":
-                report.status = "failed"
-                report.failure_reason = f"Step {step.step_id} failed"
-                break
-            step_report.status = "succeeded"
+                with report_lock:
+                    if report.status == "running":
+                        report.status = "failed"
+                        report.failure_reason = reason or f"Step {step.step_id} failed"
+                return False
+            return True
+
+        scheduler = DagScheduler(
+            max_workers=int(getattr(self.settings, "plan_max_workers", 4) or 1),
+            tool_limits=parse_tool_limits(
+                getattr(self.settings, "plan_tool_limits", ""),
+                concurrent_agent=self.app._uses_llm_gateway(),
+            ),
+        )
+        try:
+            step_dependencies(plan.steps)
+        except ValueError as exc:
+            report.status = "failed"
+            report.failure_reason = f"Invalid plan: {exc}"
+        else:
+            scheduler.run(plan.steps, _run_step)
+        order = {step.step_id: idx for idx, step in enumerate(plan.steps)}
+        report.steps.sort(key=lambda rep: order.get(rep.step_id, len(order)))
         if report.status == "running":
             report.status = "succeeded"
         report.ended_at = time.time()
@@ -477,6 +502,7 @@ class HeadlessController:
                     max_attempts=int(step.get("max_attempts") or 2),
                     timeout_s=int(step.get("timeout_s") or 90),
                     success_check=step.get("success_check") or "",
+                    depends_on=parse_depends_on(step.get("depends_on")),
                 )
             )
         plan.steps = updated_steps
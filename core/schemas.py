@@ -31,6 +31,9 @@ class PlanStepSchema:
     success_check: str = ""
     verify: Optional["VerifySchema"] = None
     fallback: Optional["PlanStepSchema"] = None
+    # None: run after the previous step. A list (possibly empty) lets the step run
+    # as soon as those steps have succeeded, in parallel with other ready steps.
+    depends_on: Optional[List[int]] = None
 
 
 @dataclass
@@ -373,13 +373,25 @@ def main_dashboard():
         ctrl.capture_screen()
         render_plan()
 
-    ui.timer(1.0, render_logs)
-    ui.timer(1.0, render_plan)
-    ui.timer(1.0, render_runs)
-    ui.timer(1.0, render_thinking)
-    ui.timer(1.0, render_activity)
-    ui.timer(2.0, render_graph)
-    ui.timer(1.0, render_nudges)
+    seen = {"activity": -1, "events": -1}
+
+    def refresh():
+        # Cheap in-memory counters decide what to redraw; idle ticks touch neither the DOM nor SQLite.
+        activity = ctrl.activity_seq
+        events = ctrl.engine.events.last_seq
+        if activity != seen["activity"]:
+            render_logs()
+            render_thinking()
+            render_activity()
+            render_nudges()
+        if activity != seen["activity"] or events != seen["events"]:
+            render_plan()
+            render_graph()
+        if events != seen["events"]:
+            render_runs()
+        seen.update(activity=activity, events=events)
+
+    ui.timer(0.1, refresh)
 
 def run_dashboard():
     ui.run(title="Agentic Console", dark=True, port=8333)
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
 import re
+from functools import lru_cache
 from pathlib import Path
-from typing import List
+from typing import List, Tuple
 
 
 DEFAULT_MIN_CHARS = 200
@@ -11,11 +12,21 @@ DEFAULT_MIN_CHARS = 200
 def load_constitution(path: str | None = None) -> List[re.Pattern]:
     if path is None:
         path = str(Path(__file__).resolve().parent / "docs" / "data_constitution.md")
+    try:
+        mtime = Path(path).stat().st_mtime_ns
+    except Exception:
+        return []
+    return list(_compiled_rules(path, mtime))
+
+
+@lru_cache(maxsize=16)
+def _compiled_rules(path: str, mtime: int) -> Tuple[re.Pattern, ...]:
+    # Keyed on mtime so edits to the constitution file are picked up without a restart.
     rules: List[re.Pattern] = []
     try:
         text = Path(path).read_text(encoding="utf-8")
     except Exception:
-        return rules
+        return ()
     for line in text.splitlines():
         line = line.strip()
         if not line or line.startswith("#"):
@@ -26,7 +37,7 @@ def load_constitution(path: str | None = None) -> List[re.Pattern]:
                 rules.append(re.compile(pattern))
             except re.error:
                 continue
-    return rules
+    return tuple(rules)
 
 
 def check_text(text: str, min_chars: int = DEFAULT_MIN_CHARS, path: str | None = None) -> List[str]:
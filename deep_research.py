@@ -1,29 +1,123 @@
 ﻿from __future__ import annotations
 
-from typing import List
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+_SUBQUESTION_RE = re.compile(r"^\s*(?:[-*\u2022]|\d+[.)])\s+(.+?)\s*$")
+
+
+def plan_subquestions(plan: str, limit: int = 4) -> List[str]:
+    """Bulleted or numbered lines of a research plan, used as extra retrieval queries."""
+    found = []
+    for line in (plan or "").splitlines():
+        match = _SUBQUESTION_RE.match(line)
+        if match:
+            text = re.sub(r"[*_`]+", "", match.group(1)).strip()
+            if len(text) > 3:
+                found.append(text)
+    return list(dict.fromkeys(found))[:limit]
 
 
 class DeepResearch:
-    def __init__(self, agent_chat, rag_search):
+    """Plan, retrieve, draft, critique and revise a research answer.
+
+    Retrieval for the question itself runs while the plan is being written;
+    once the plan is back, its sub-questions are retrieved together through
+    `rag_search_many` (one batched scoring pass) when given, otherwise one
+    `rag_search` each. The draft is handed to `on_partial` before the critique
+    and revision, and each stage's latency goes to `on_stage` and
+    `last_timings`.
+    """
+
+    def __init__(
+        self,
+        agent_chat,
+        rag_search,
+        rag_search_many: Optional[Callable[..., List[dict]]] = None,
+        max_subquestions: int = 4,
+        evidence_limit: int = 8,
+        on_stage: Optional[Callable[[str, float], None]] = None,
+    ):
         self.agent_chat = agent_chat
         self.rag_search = rag_search
+        self.rag_search_many = rag_search_many
+        self.max_subquestions = max_subquestions
+        self.evidence_limit = evidence_limit
+        self.on_stage = on_stage
+        self.last_timings: Dict[str, float] = {}
+
+    def _timed(self, timings: Dict[str, float], stage: str, fn, *args, **kwargs):
+        started = time.monotonic()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            timings[stage] = time.monotonic() - started
+            if self.on_stage is not None:
+                try:
+                    self.on_stage(stage, timings[stage])
+                except Exception:
+                    pass
+
+    def _fan_out(self, queries: List[str]) -> List[dict]:
+        if self.rag_search_many is not None:
+            return self.rag_search_many(queries, limit=self.evidence_limit)
+        evidence: List[dict] = []
+        for query in queries:
+            evidence.extend(self.rag_search(query, limit=5))
+        return evidence
+
+    def _merge(self, *groups: List[dict]) -> List[dict]:
+        merged: List[dict] = []
+        seen = set()
+        for group in groups:
+            for item in group or []:
+                key = item.get("id", (item.get("source"), item.get("text")))
+                if key in seen:
+                    continue
+                seen.add(key)
+                merged.append(item)
+        return merged[: self.evidence_limit]
 
-    def run(self, question: str) -> str:
-        # Plan
-        plan = self.agent_chat(f"Create a concise research plan (3-5 steps) for: {question}")
-        # Retrieve
-        evidence = self.rag_search(question, limit=5)
+    def run(self, question: str, on_partial: Optional[Callable[[str, str], None]] = None) -> str:
+        timings: Dict[str, float] = {}
+        self.last_timings = timings
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="research-retrieve") as pool:
+            # Retrieve (question) overlaps Plan: it does not depend on the plan.
+            base = pool.submit(self._timed, timings, "retrieve", self.rag_search, question, limit=5)
+            plan = self._timed(
+                timings, "plan", self.agent_chat, f"Create a concise research plan (3-5 steps) for: {question}"
+            )
+            subquestions = plan_subquestions(plan, self.max_subquestions)
+            extra = self._timed(timings, "retrieve_subquestions", self._fan_out, subquestions) if subquestions else []
+            evidence = self._merge(base.result(), extra)
         ev_text = "\n".join(f"- {e['source']}: {e['text'][:200]}" for e in evidence)
         # Draft
-        draft = self.agent_chat(
-            f"Use the evidence to answer the question. Evidence:\n{ev_text}\n\nQuestion: {question}"
+        draft = self._timed(
+            timings,
+            "draft",
+            self.agent_chat,
+            f"Use the evidence to answer the question. Evidence:\n{ev_text}\n\nQuestion: {question}",
         )
+        if on_partial is not None:
+            on_partial("draft", draft)
         # Reflect
-        critique = self.agent_chat(
-            f"Critique the draft for missing evidence, uncertainty, and errors.\nDraft:\n{draft}"
+        critique = self._timed(
+            timings,
+            "critique",
+            self.agent_chat,
+            f"Critique the draft for missing evidence, uncertainty, and errors.\nDraft:\n{draft}",
         )
         # Revise
-        final = self.agent_chat(
-            f"Revise the draft using the critique.\nCritique:\n{critique}\n\nDraft:\n{draft}"
+        final = self._timed(
+            timings,
+            "revise",
+            self.agent_chat,
+            f"Revise the draft using the critique.\nCritique:\n{critique}\n\nDraft:\n{draft}",
         )
+        timings["total"] = time.monotonic() - started
+        if on_partial is not None:
+            on_partial("final", final)
         return f"Plan:\n{plan}\n\nAnswer:\n{final}"
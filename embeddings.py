@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import re
+import struct
+from array import array
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Sequence
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+
+# Stored embedding layout (little-endian):
+#   v1 sparse counts: <B version=1><B reserved><H dims><H nnz> then nnz uint16 indices, nnz uint16 counts
+#   v2 dense floats:  <B version=2><B reserved><H dims> then dims float32 values
+# Rows written before the binary format hold a JSON text list and are still decoded.
+EMBEDDING_SPARSE_V1 = 1
+EMBEDDING_DENSE_V2 = 2
+_HEADER = struct.Struct("<BBH")
+_MAX_COUNT = 0xFFFF
+_TOKEN_RE = re.compile(r"[a-zA-Z0-9_]+")
+TOKEN_CACHE_SIZE = 65536
+
+SparseVector = Dict[int, float]
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def token_bucket(token: str, dims: int) -> int:
+    # Same bucket as int(sha1(token).hexdigest(), 16) % dims, so stored vectors stay comparable.
+    return int.from_bytes(hashlib.sha1(token.encode("utf-8")).digest(), "big") % dims
+
+
+def embed_sparse(text: str, dims: int) -> SparseVector:
+    """Hashed bag-of-words embedding as a {bucket: count} map; tokens are hashed once per text."""
+    vec: SparseVector = {}
+    for tok, count in Counter(tokenize(text)).items():
+        idx = token_bucket(tok, dims)
+        vec[idx] = vec.get(idx, 0) + count
+    return vec
+
+
+def to_dense(vec: SparseVector, dims: int) -> List[float]:
+    dense = [0] * dims
+    for idx, value in vec.items():
+        dense[idx] = value
+    return dense
+
+
+def sparse_norm(vec: SparseVector) -> float:
+    return math.sqrt(sum(v * v for v in vec.values()))
+
+
+def sparse_cosine(a: SparseVector, b: SparseVector, norm_a: float | None = None, norm_b: float | None = None) -> float:
+    if len(a) > len(b):
+        a, b, norm_a, norm_b = b, a, norm_b, norm_a
+    dot = 0.0
+    for idx, value in a.items():
+        other = b.get(idx)
+        if other:
+            dot += value * other
+    if not dot:
+        return 0.0
+    na = norm_a if norm_a is not None else sparse_norm(a)
+    nb = norm_b if norm_b is not None else sparse_norm(b)
+    if na == 0 or nb == 0:
+        return 0.0
+    return dot / (na * nb)
+
+
+def encode_sparse(vec: SparseVector, dims: int) -> bytes:
+    if any(not float(v).is_integer() or v < 0 for v in vec.values()):
+        return encode_embedding(to_dense(vec, dims))
+    return _pack_sparse(sorted((idx, v) for idx, v in vec.items() if v), dims)
+
+
+def encode_embedding(vec: Sequence[float]) -> bytes:
+    dims = len(vec)
+    if all(float(v).is_integer() and 0 <= v for v in vec):
+        return _pack_sparse([(i, v) for i, v in enumerate(vec) if v], dims)
+    values = array("f", [float(v) for v in vec])
+    return _HEADER.pack(EMBEDDING_DENSE_V2, 0, dims) + _le_bytes(values)
+
+
+def decode_embedding(value, dims: int | None = None):
+    """Decode a stored embedding into a float32 NumPy vector (or a list without NumPy)."""
+    if isinstance(value, str):
+        return [float(v) for v in json.loads(value)]
+    blob = bytes(value)
+    version, _, stored_dims = _HEADER.unpack_from(blob, 0)
+    if dims is not None and stored_dims != dims:
+        raise ValueError(f"Embedding has {stored_dims} dims, expected {dims}")
+    if version == EMBEDDING_SPARSE_V1:
+        (nnz,) = struct.unpack_from("<H", blob, _HEADER.size)
+        offset = _HEADER.size + 2
+        if np is not None:
+            pairs = np.frombuffer(blob, dtype="<u2", count=nnz * 2, offset=offset)
+            dense = np.zeros(stored_dims, dtype=np.float32)
+            dense[pairs[:nnz]] = pairs[nnz:]
+            return dense
+        pairs = _from_le_bytes("H", blob[offset : offset + nnz * 4])
+        dense = [0.0] * stored_dims
+        for idx, count in zip(pairs[:nnz], pairs[nnz:]):
+            dense[idx] = float(count)
+        return dense
+    if version == EMBEDDING_DENSE_V2:
+        if np is not None:
+            return np.frombuffer(blob, dtype="<f4", count=stored_dims, offset=_HEADER.size).astype(np.float32)
+        return list(_from_le_bytes("f", blob[_HEADER.size : _HEADER.size + stored_dims * 4]))
+    raise ValueError(f"Unknown embedding encoding version: {version}")
+
+
+def decode_sparse(value, dims: int | None = None) -> SparseVector:
+    """Decode a stored embedding into a {bucket: value} map without densifying v1 rows."""
+    if not isinstance(value, str):
+        blob = bytes(value)
+        version, _, stored_dims = _HEADER.unpack_from(blob, 0)
+        if version == EMBEDDING_SPARSE_V1:
+            if dims is not None and stored_dims != dims:
+                raise ValueError(f"Embedding has {stored_dims} dims, expected {dims}")
+            (nnz,) = struct.unpack_from("<H", blob, _HEADER.size)
+            offset = _HEADER.size + 2
+            if np is not None:
+                pairs = np.frombuffer(blob, dtype="<u2", count=nnz * 2, offset=offset).tolist()
+            else:
+                pairs = _from_le_bytes("H", blob[offset : offset + nnz * 4])
+            return dict(zip(pairs[:nnz], pairs[nnz:]))
+    dense = decode_embedding(value, dims)
+    return {i: float(v) for i, v in enumerate(dense) if v}
+
+
+def migrate_embeddings(conn, table: str, batch_size: int = 1000) -> int:
+    """Rewrite JSON text embeddings in `table` as binary blobs, in place."""
+    cur = conn.cursor()
+    migrated = 0
+    while True:
+        cur.execute(
+            f"SELECT id, embedding FROM {table} WHERE typeof(embedding) = 'text' LIMIT ?",
+            (batch_size,),
+        )
+        rows = cur.fetchall()
+        if not rows:
+            break
+        updates = []
+        for row_id, emb_json in rows:
+            try:
+                blob = encode_embedding(json.loads(emb_json))
+            except Exception:
+                blob = encode_embedding([])
+            updates.append((blob, row_id))
+        cur.executemany(f"UPDATE {table} SET embedding = ? WHERE id = ?", updates)
+        conn.commit()
+        migrated += len(updates)
+    return migrated
+
+
+def _pack_sparse(items, dims: int) -> bytes:
+    indices = array("H", [idx for idx, _ in items])
+    counts = array("H", [min(int(v), _MAX_COUNT) for _, v in items])
+    return (
+        _HEADER.pack(EMBEDDING_SPARSE_V1, 0, dims)
+        + struct.pack("<H", len(indices))
+        + _le_bytes(indices)
+        + _le_bytes(counts)
+    )
+
+
+def _le_bytes(values: array) -> bytes:
+    if struct.pack("=H", 1) != struct.pack("<H", 1):
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_le_bytes(typecode: str, blob: bytes) -> List:
+    values = array(typecode)
+    values.frombytes(blob)
+    if struct.pack("=H", 1) != struct.pack("<H", 1):
+        values.byteswap()
+    return values.tolist()
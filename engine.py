@@ -2,31 +2,94 @@ from __future__ import annotations
 
 import os
 import threading
+import time
 from typing import Callable
 
 from memory import MemoryStore
 from metrics import Metrics
-from task_queue import TaskQueue
+from task_queue import TaskQueue, parse_lane_limits
+from llm_gateway import LLMGateway
 from rag import RagStore
 from graph_rag import GraphStore
 from research_store import ResearchStore
 from job_store import JobStore
 from a2a import A2ABus
 from a2a_network import A2ANetwork
+from retrieval_cache import RetrievalCache
+from event_bus import EventBus, RunEventWriter
 
 
 class AgentEngine:
     def __init__(self, settings, on_message=None, log_cb: Callable[[str], None] | None = None) -> None:
         self.settings = settings
         self.log_cb = log_cb
-        self.memory = MemoryStore(settings.memory_db, settings.embedding_dim)
+        self.memory = MemoryStore(
+            settings.memory_db,
+            settings.embedding_dim,
+            ann_threshold=settings.memory_ann_threshold,
+            ann_nprobe=settings.memory_ann_nprobe,
+            db_options={
+                "pool_size": settings.db_reader_pool_size,
+                "synchronous": settings.db_synchronous,
+                "cache_size_kb": settings.db_cache_size_kb,
+                "mmap_size_mb": settings.db_mmap_size_mb,
+            },
+            log_dir=getattr(settings, "log_partition_dir", "") or None,
+        )
         self.metrics = Metrics()
-        self.task_queue = TaskQueue(settings.task_queue_size)
-        self.rag = RagStore(self.memory)
-        self.graph = GraphStore(self.memory._conn)
-        self.research = ResearchStore(self.memory._conn)
-        self.jobs = JobStore(self.memory._conn)
+        if str(getattr(settings, "group_commit", "false")).lower() in ("1", "true", "yes", "on"):
+            self.memory.enable_group_commit(
+                max_rows=settings.group_commit_max_rows,
+                interval_ms=settings.group_commit_interval_ms,
+                max_pending=settings.group_commit_max_pending,
+                metrics=self.metrics,
+            )
+        # Live run events for UI clients (cursor reads) and the per-run events.jsonl writer.
+        self.events = EventBus(getattr(settings, "event_buffer_size", 1000))
+        self.event_log = RunEventWriter()
+        # Shared model client: pooled connections, per-call model, per-backend concurrency cap.
+        # Only built when enabled; it owns an event loop thread and an HTTP worker pool.
+        self.llm: LLMGateway | None = None
+        if str(getattr(settings, "llm_gateway", "false")).lower() in ("1", "true", "yes", "on"):
+            self.llm = LLMGateway.from_settings(settings)
+        self.task_queue = TaskQueue(
+            settings.task_queue_size,
+            workers=getattr(settings, "task_queue_workers", 1),
+            lane_limits=parse_lane_limits(getattr(settings, "task_queue_lanes", "")),
+            metrics=self.metrics,
+        )
+        self.rag = RagStore(
+            self.memory,
+            ingest_workers=settings.rag_ingest_workers,
+            ingest_batch_rows=settings.rag_ingest_batch_rows,
+            search_mode=settings.rag_search_mode,
+            chunking={
+                "strategy": settings.rag_chunker,
+                "size": settings.rag_chunk_size,
+                "overlap": settings.rag_chunk_overlap,
+                "max_tokens": settings.rag_chunk_max_tokens,
+                "overlap_tokens": settings.rag_chunk_overlap // 4,
+            },
+            dedup_distance=settings.rag_dedup_distance,
+        )
+        self.graph = GraphStore(
+            self.memory.db,
+            snapshot=str(getattr(settings, "graph_snapshot", "false")).lower() in ("1", "true", "yes", "on"),
+        )
+        self.retrieval_cache = None
+        if settings.retrieval_cache_size > 0:
+            self.retrieval_cache = RetrievalCache(
+                max_entries=settings.retrieval_cache_size,
+                ttl_seconds=settings.retrieval_cache_ttl_seconds,
+                metrics=self.metrics,
+            )
+        self.memory.cache = self.retrieval_cache
+        self.rag.cache = self.retrieval_cache
+        self.graph.cache = self.retrieval_cache
+        self.research = ResearchStore(self.memory.db)
+        self.jobs = JobStore(self.memory.db, writer=self.memory.group_writer)
         self.a2a = A2ABus(self.memory)
+        self.a2a.events = EventBus(getattr(settings, "event_buffer_size", 1000))
         self.a2a_net = A2ANetwork(
             self.a2a,
             self.settings.a2a_host,
@@ -36,6 +99,7 @@ class AgentEngine:
             on_message=on_message,
         )
         self._memory_prune_stop = threading.Event()
+        self._memory_sweeper = None
 
     def start_a2a(self) -> None:
         if str(self.settings.a2a_listen).lower() in ("1", "true", "yes", "on"):
@@ -45,6 +109,37 @@ class AgentEngine:
             except Exception:
                 self._log("A2A network failed to start.")
 
+    def start_memory_sweeper(self) -> None:
+        interval = getattr(self.settings, "memory_prune_interval_seconds", 0)
+        consolidate_every = getattr(self.settings, "memory_consolidate_interval_seconds", 0)
+        if (interval <= 0 and consolidate_every <= 0) or getattr(self, "_memory_sweeper", None):
+            return
+        batch_size = getattr(self.settings, "memory_prune_batch_size", 500)
+        wait = min(value for value in (interval, consolidate_every) if value > 0)
+
+        def _loop() -> None:
+            next_consolidation = time.monotonic() + consolidate_every
+            while not self._memory_prune_stop.is_set():
+                try:
+                    if interval > 0:
+                        self.memory.prune_memories(batch_size=batch_size)
+                    if consolidate_every > 0 and time.monotonic() >= next_consolidation:
+                        next_consolidation = time.monotonic() + consolidate_every
+                        self.memory.consolidate(
+                            threshold=getattr(self.settings, "memory_merge_threshold", 0.92),
+                            archive_after_seconds=getattr(self.settings, "memory_archive_after_seconds", 0) or None,
+                            batch_size=batch_size,
+                        )
+                except Exception:
+                    pass
+                self._memory_prune_stop.wait(wait)
+
+        self._memory_sweeper = threading.Thread(target=_loop, daemon=True)
+        self._memory_sweeper.start()
+
+    def stop_memory_sweeper(self) -> None:
+        self._memory_prune_stop.set()
+
     def _log(self, msg: str) -> None:
         if self.log_cb:
             self.log_cb(msg)
@@ -53,6 +148,7 @@ class AgentEngine:
 def run_headless(settings, on_message=None):
     engine = AgentEngine(settings, on_message=on_message, log_cb=print)
     engine.start_a2a()
+    engine.start_memory_sweeper()
     print("Headless engine running. Ctrl+C to exit.")
     try:
         while True:
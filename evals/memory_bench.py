@@ -0,0 +1,109 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from embeddings import decode_embedding, embed_sparse, encode_sparse
+from memory import MemoryStore, _cosine, _embed_text
+
+WORDS = (
+    "alpha beta gamma delta plan run tool agent memory index query result error retry "
+    "browser file shell policy audit budget cost model token cache graph source chunk"
+).split()
+QUERIES = ["agent memory query", "tool error retry", "graph source chunk", "budget cost model"]
+
+
+def _populate(store: MemoryStore, rows: int, seed: int = 7) -> None:
+    rng = random.Random(seed)
+    now = time.time()
+    cur = store._conn.cursor()
+    cur.executemany(
+        "INSERT INTO task_runs (run_id, created_at, status, approved, command, intent_json, plan_json, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [(f"run-{i}", now, "failed" if i % 5 == 0 else "completed", 1, "", "", "", now) for i in range(50)],
+    )
+    batch = []
+    refs = []
+    for i in range(1, rows + 1):
+        content = " ".join(rng.choice(WORDS) for _ in range(12))
+        acl = json.dumps({"users": ["owner"]}) if i % 10 == 0 else "{}"
+        emb = encode_sparse(embed_sparse(content, store.embedding_dim), store.embedding_dim)
+        batch.append((i, "note", content, emb, now, "[]", "bench", 0.9, 0.5, "default", "", acl, "shared", "active"))
+        if i % 4 == 0:
+            refs.append((i, f"run-{i % 50}"))
+    cur.executemany(
+        "INSERT INTO memories (id, kind, content, embedding, created_at, tags, source, confidence, relevance, "
+        "user_id, project_id, acl, scope, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        batch,
+    )
+    cur.executemany("INSERT INTO memory_refs (memory_id, run_id) VALUES (?, ?)", refs)
+    store._conn.commit()
+
+
+def _legacy_search(store: MemoryStore, query: str, limit: int = 5, user_id: str | None = None) -> list:
+    # The pre-index recall path: per-row ACL and memory_refs lookups plus a Python cosine per row.
+    qvec = _embed_text(query, store.embedding_dim)
+    cur = store._conn.cursor()
+    cur.execute(
+        "SELECT id, kind, content, embedding, created_at, tags FROM memories "
+        "WHERE status = ? AND scope = ? AND (confidence IS NULL OR confidence >= ?)",
+        ("active", "shared", 0.2),
+    )
+    rows = cur.fetchall()
+    cur.execute("SELECT run_id FROM task_runs WHERE status IN ('error','failed','stopped')")
+    failed_runs = {row[0] for row in cur.fetchall() if row[0]}
+    scored = []
+    for memory_id, kind, content, emb_blob, created_at, tags_blob in rows:
+        emb = list(decode_embedding(emb_blob, store.embedding_dim))
+        cur.execute("SELECT acl FROM memories WHERE id=?", (memory_id,))
+        acl_blob = cur.fetchone()
+        if acl_blob and acl_blob[0]:
+            users = json.loads(acl_blob[0]).get("users") or []
+            if user_id and users and user_id not in users:
+                continue
+        if failed_runs:
+            cur.execute("SELECT run_id FROM memory_refs WHERE memory_id=?", (memory_id,))
+            if any(row[0] in failed_runs for row in cur.fetchall() if row[0]):
+                continue
+        score = _cosine(qvec, emb)
+        if score > 0:
+            scored.append({"content": content, "score": score})
+    scored.sort(key=lambda x: x["score"], reverse=True)
+    return scored[:limit]
+
+
+def _time(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(QUERIES[i % len(QUERIES)])
+    return (time.perf_counter() - start) / repeat
+
+
+def run(sizes, repeat: int = 5, skip_legacy_above: int = 0) -> None:
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = MemoryStore(os.path.join(tmp, "bench.db"), embedding_dim=256)
+            try:
+                _populate(store, rows)
+                store.search_memory(QUERIES[0], user_id="guest")  # warm the resident index
+                new_s = _time(lambda q: store.search_memory(q, user_id="guest"), repeat)
+                line = f"rows={rows} search_memory={new_s * 1000:.1f}ms"
+                if not skip_legacy_above or rows <= skip_legacy_above:
+                    legacy_s = _time(lambda q: _legacy_search(store, q, user_id="guest"), max(1, repeat // 2))
+                    line += f" legacy={legacy_s * 1000:.1f}ms speedup={legacy_s / new_s:.1f}x"
+                print(line)
+            finally:
+                store._conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark memory recall against the legacy N+1 path.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--skip-legacy-above", type=int, default=0)
+    args = parser.parse_args()
+    run(args.rows, repeat=args.repeat, skip_legacy_above=args.skip_legacy_above)
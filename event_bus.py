@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+
+
+class EventBus:
+    """In-process run event feed: a bounded ring buffer addressed by sequence number.
+
+    `publish` stamps each event with a monotonically increasing `seq`. Readers keep
+    the last `seq` they saw and call `since(seq)` (or `wait(seq, timeout)` to block
+    for the next event), so they only ever receive new events. Only the newest
+    `capacity` events are retained; `since` reports how many a slow reader missed.
+    """
+
+    def __init__(self, capacity: int = 1000) -> None:
+        self.capacity = max(1, capacity)
+        self._events: "deque[Dict[str, Any]]" = deque(maxlen=self.capacity)
+        self._seq = 0
+        self._cond = threading.Condition()
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    def publish(self, event: Dict[str, Any]) -> int:
+        with self._cond:
+            self._seq += 1
+            self._events.append(dict(event, seq=self._seq))
+            self._cond.notify_all()
+            return self._seq
+
+    def since(self, seq: int = 0, limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """Events after `seq`, oldest first, and how many were already evicted.
+
+        A cursor ahead of the bus (e.g. from before a restart) starts over from the oldest event.
+        """
+        with self._cond:
+            if seq > self._seq or seq < 0:
+                seq = 0
+            oldest = self._events[0]["seq"] if self._events else self._seq + 1
+            dropped = max(0, oldest - seq - 1)
+            # seq values are contiguous, so the first wanted event sits at a known offset.
+            start = max(0, seq + 1 - oldest)
+            events = [self._events[i] for i in range(start, len(self._events))]
+        if limit is not None:
+            events = events[:limit]
+        return events, dropped
+
+    def wait(self, seq: int, timeout: float) -> bool:
+        """Block until an event newer than `seq` exists (or the cursor is stale) or `timeout` passes."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._seq != seq, timeout)
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Newest `limit` events, newest first."""
+        with self._cond:
+            count = min(limit, len(self._events))
+            return [self._events[-1 - i] for i in range(count)]
+
+
+class RunEventWriter:
+    """Append-only JSONL writer that keeps one line-buffered handle open per run file.
+
+    Replaces open/append/close per event. At most `max_open` files stay open;
+    the least recently written one is closed first. Call `close(path)` when a run
+    finishes.
+    """
+
+    def __init__(self, max_open: int = 16) -> None:
+        self.max_open = max(1, max_open)
+        self._handles: "OrderedDict[str, TextIO]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def write(self, path: str, record: Dict[str, Any]) -> None:
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            handle = self._handles.get(path)
+            if handle is None:
+                handle = open(path, "a", encoding="utf-8", buffering=1)
+                self._handles[path] = handle
+                while len(self._handles) > self.max_open:
+                    self._handles.popitem(last=False)[1].close()
+            else:
+                self._handles.move_to_end(path)
+            handle.write(line)
+
+    def close(self, path: str) -> None:
+        with self._lock:
+            handle = self._handles.pop(path, None)
+        if handle is not None:
+            handle.close()
+
+    def close_all(self) -> None:
+        with self._lock:
+            handles = list(self._handles.values())
+            self._handles.clear()
+        for handle in handles:
+            handle.close()
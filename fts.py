@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import sqlite3
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from embeddings import tokenize
+
+RRF_K = 60
+
+
+def fts5_available(conn: sqlite3.Connection) -> bool:
+    try:
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp._fts5_probe USING fts5(x)")
+        conn.execute("DROP TABLE IF EXISTS temp._fts5_probe")
+        return True
+    except sqlite3.DatabaseError:
+        return False
+
+
+def ensure_fts(conn: sqlite3.Connection, table: str, fts_table: str, column: str) -> bool:
+    """Create an external-content FTS5 mirror of `table.column`, kept in sync by triggers.
+
+    The mirror is rebuilt from the base table the first time it is created, so
+    existing databases are backfilled. Returns False when SQLite lacks FTS5.
+    """
+    if not fts5_available(conn):
+        return False
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts_table,))
+    exists = cur.fetchone() is not None
+    cur.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} "
+        f"USING fts5({column}, content='{table}', content_rowid='id')"
+    )
+    cur.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts_table}(rowid, {column}) VALUES (new.id, new.{column}); END"
+    )
+    cur.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {column}) VALUES ('delete', old.id, old.{column}); END"
+    )
+    cur.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {column} ON {table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {column}) VALUES ('delete', old.id, old.{column}); "
+        f"INSERT INTO {fts_table}(rowid, {column}) VALUES (new.id, new.{column}); END"
+    )
+    if not exists:
+        cur.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+    return True
+
+
+def match_query(text: str) -> str:
+    """OR of the quoted query tokens; uses the embedding tokenizer so both paths agree on terms."""
+    terms = list(dict.fromkeys(tokenize(text)))
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+def bm25_search(cur: sqlite3.Cursor, fts_table: str, query: str, limit: int) -> List[Tuple[int, float]]:
+    """Return up to `limit` (rowid, score) pairs, best first; score is the negated bm25 (higher is better)."""
+    expr = match_query(query)
+    if not expr or limit <= 0:
+        return []
+    cur.execute(
+        f"SELECT rowid, bm25({fts_table}) FROM {fts_table} WHERE {fts_table} MATCH ? ORDER BY rank LIMIT ?",
+        (expr, limit),
+    )
+    return [(row[0], -row[1]) for row in cur.fetchall()]
+
+
+def rrf(rankings: Iterable[Sequence[int]], k: int = RRF_K) -> Dict[int, float]:
+    """Reciprocal-rank fusion: sum of 1 / (k + rank) over every ranking an id appears in."""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            fused[item_id] = fused.get(item_id, 0.0) + 1.0 / (k + rank)
+    return fused
@@ -1,83 +1,511 @@
 from __future__ import annotations
 
 import sqlite3
-from typing import List, Dict
+import threading
+from array import array
+from collections import deque
+from typing import List, Dict, Iterable, Optional, Sequence, Tuple
+
+from storage import Database, as_database
+
+
+class EntityMatcher:
+    """Aho-Corasick automaton over lower-cased entity names.
+
+    `add` extends the trie in place; failure links are recomputed lazily on the
+    next `find`, which then runs in time linear in the text length (plus the
+    number of matches).
+    """
+
+    def __init__(self, names: Iterable[str] = ()) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._out: List[List[Tuple[str, int]]] = [[]]
+        self._fail: List[int] = [0]
+        self._link: List[int] = [0]
+        self._dirty = False
+        for name in names:
+            self.add(name)
+
+    def add(self, name: str) -> None:
+        key = name.lower()
+        if not key.strip():
+            return
+        node = 0
+        for ch in key:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._out.append([])
+                self._goto[node][ch] = nxt
+            node = nxt
+        if all(existing != name for existing, _ in self._out[node]):
+            self._out[node].append((name, len(key)))
+            self._dirty = True
+
+    def _build(self) -> None:
+        size = len(self._goto)
+        fail = [0] * size
+        link = [0] * size
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                if node == 0:
+                    continue
+                f = fail[node]
+                while f and ch not in self._goto[f]:
+                    f = fail[f]
+                fail[child] = self._goto[f].get(ch, 0)
+                link[child] = fail[child] if self._out[fail[child]] else link[fail[child]]
+        self._fail = fail
+        self._link = link
+        self._dirty = False
+
+    def find(self, text: str) -> List[str]:
+        """Entity names mentioned in `text` on word boundaries, in order of first mention."""
+        if self._dirty or len(self._fail) != len(self._goto):
+            self._build()
+        lowered = text.lower()
+        found: Dict[str, int] = {}
+        node = 0
+        for i, ch in enumerate(lowered):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            match = node if self._out[node] else self._link[node]
+            while match:
+                for name, length in self._out[match]:
+                    start = i - length + 1
+                    before = lowered[start - 1] if start > 0 else " "
+                    after = lowered[i + 1] if i + 1 < len(lowered) else " "
+                    if not before.isalnum() and not after.isalnum():
+                        found[name] = min(start, found.get(name, start))
+                match = self._link[match]
+        return sorted(found, key=found.get)
+
+
+class AdjacencySnapshot:
+    """Read-only CSR (compressed sparse row) copy of the outgoing edges.
+
+    Node positions index `offsets`; the out-edges of position p are
+    `targets[offsets[p]:offsets[p + 1]]` with matching `rels`.
+    """
+
+    def __init__(self, entities: Sequence[Tuple[int, str, str]], edges: Sequence[Tuple[int, str, int]]) -> None:
+        self.ids = [row[0] for row in entities]
+        self.names = [row[1] for row in entities]
+        self.types = [row[2] for row in entities]
+        self.pos = {entity_id: i for i, entity_id in enumerate(self.ids)}
+        self.by_name = {name: i for i, name in enumerate(self.names)}
+        counts = [0] * (len(self.ids) + 1)
+        valid = [(self.pos[src], rel, self.pos[dst]) for src, rel, dst in edges if src in self.pos and dst in self.pos]
+        for src, _, _ in valid:
+            counts[src + 1] += 1
+        for i in range(len(self.ids)):
+            counts[i + 1] += counts[i]
+        self.offsets = array("l", counts)
+        self.targets = array("l", [0] * len(valid))
+        self.rels: List[str] = [""] * len(valid)
+        fill = list(counts[:-1])
+        for src, rel, dst in valid:
+            self.targets[fill[src]] = dst
+            self.rels[fill[src]] = rel
+            fill[src] += 1
+
+    def out_edges(self, node: int):
+        for i in range(self.offsets[node], self.offsets[node + 1]):
+            yield self.rels[i], self.targets[i]
+
+    def k_hop(self, start: int, depth: int, rels: Optional[set], limit: int) -> List[Tuple[int, int, str]]:
+        seen = {start}
+        frontier = [start]
+        found: List[Tuple[int, int, str]] = []
+        for level in range(1, depth + 1):
+            nxt = []
+            for node in frontier:
+                for rel, dst in self.out_edges(node):
+                    if (rels and rel not in rels) or dst in seen:
+                        continue
+                    seen.add(dst)
+                    nxt.append(dst)
+                    found.append((dst, level, rel))
+                    if len(found) >= limit:
+                        return found
+            frontier = nxt
+        return found
+
+    def shortest_path(self, start: int, goal: int, max_depth: int, rels: Optional[set]) -> List[Tuple[int, str]]:
+        parents: Dict[int, Tuple[int, str]] = {start: (-1, "")}
+        frontier = [start]
+        for _ in range(max_depth):
+            nxt = []
+            for node in frontier:
+                for rel, dst in self.out_edges(node):
+                    if (rels and rel not in rels) or dst in parents:
+                        continue
+                    parents[dst] = (node, rel)
+                    if dst == goal:
+                        path = []
+                        while dst != -1:
+                            parent, via = parents[dst]
+                            path.append((dst, via))
+                            dst = parent
+                        return list(reversed(path))
+                    nxt.append(dst)
+            frontier = nxt
+        return []
 
 
 class GraphStore:
-    def __init__(self, conn: sqlite3.Connection) -> None:
-        self.conn = conn
+    def __init__(self, conn: sqlite3.Connection | Database, snapshot: bool = False) -> None:
+        self.db = as_database(conn)
+        self.conn = self.db.writer
+        self._matcher: Optional[EntityMatcher] = None
+        self._matcher_lock = threading.Lock()
+        # Optional in-memory adjacency for hot graphs; dropped on every write and rebuilt on demand.
+        self.use_snapshot = snapshot
+        self._snapshot: Optional[AdjacencySnapshot] = None
+        # Shared retrieval cache; graph writes change hybrid RAG expansion.
+        self.cache = None
         self._init()
 
     def _init(self) -> None:
-        cur = self.conn.cursor()
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS graph_entities (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                entity_type TEXT NOT NULL
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS graph_entities (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    entity_type TEXT NOT NULL
+                )
+                """
             )
-            """
-        )
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS graph_edges (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                src_id INTEGER NOT NULL,
-                rel TEXT NOT NULL,
-                dst_id INTEGER NOT NULL
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS graph_edges (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    src_id INTEGER NOT NULL,
+                    rel TEXT NOT NULL,
+                    dst_id INTEGER NOT NULL
+                )
+                """
             )
-            """
-        )
-        self.conn.commit()
+            self._dedupe_entities(cur)
+            cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_graph_entities_name ON graph_entities(name)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_graph_edges_src ON graph_edges(src_id)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_graph_edges_dst ON graph_edges(dst_id)")
+
+    @staticmethod
+    def _dedupe_entities(cur: sqlite3.Cursor) -> None:
+        # Older databases allowed repeated names; keep the first row and re-point edges at it.
+        cur.execute("SELECT name, MIN(id) FROM graph_entities GROUP BY name HAVING COUNT(*) > 1")
+        for name, keep in cur.fetchall():
+            dupes = "SELECT id FROM graph_entities WHERE name = ? AND id <> ?"
+            cur.execute(f"UPDATE graph_edges SET src_id = ? WHERE src_id IN ({dupes})", (keep, name, keep))
+            cur.execute(f"UPDATE graph_edges SET dst_id = ? WHERE dst_id IN ({dupes})", (keep, name, keep))
+            cur.execute("DELETE FROM graph_entities WHERE name = ? AND id <> ?", (name, keep))
 
     def add_entity(self, name: str, entity_type: str) -> int:
-        cur = self.conn.cursor()
-        cur.execute(
-            "INSERT INTO graph_entities (name, entity_type) VALUES (?, ?)",
-            (name, entity_type),
-        )
-        self.conn.commit()
-        return cur.lastrowid
+        """Insert an entity, or return the id of the existing entity with the same name."""
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT OR IGNORE INTO graph_entities (name, entity_type) VALUES (?, ?)",
+                (name, entity_type),
+            )
+            if cur.rowcount:
+                entity_id = cur.lastrowid
+            else:
+                cur.execute("SELECT id FROM graph_entities WHERE name = ?", (name,))
+                entity_id = cur.fetchone()[0]
+        self._entities_changed([name])
+        return entity_id
+
+    def add_entities(self, entities: Iterable[Tuple[str, str]]) -> Dict[str, int]:
+        """Bulk `add_entity` in one transaction; returns {name: id} for every name given."""
+        entities = list(entities)
+        if not entities:
+            return {}
+        names = list(dict.fromkeys(name for name, _ in entities))
+        ids: Dict[str, int] = {}
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.executemany("INSERT OR IGNORE INTO graph_entities (name, entity_type) VALUES (?, ?)", entities)
+            for i in range(0, len(names), 500):
+                batch = names[i : i + 500]
+                cur.execute(
+                    f"SELECT name, id FROM graph_entities WHERE name IN ({','.join('?' * len(batch))})",
+                    batch,
+                )
+                ids.update(cur.fetchall())
+        self._entities_changed(names)
+        return ids
+
+    def _entities_changed(self, names: Iterable[str]) -> None:
+        with self._matcher_lock:
+            if self._matcher is not None:
+                for name in names:
+                    self._matcher.add(name)
+        self._graph_changed()
+
+    def _graph_changed(self) -> None:
+        self._snapshot = None
+        if self.cache is not None:
+            self.cache.bump()
 
     def add_edge(self, src_id: int, rel: str, dst_id: int) -> int:
-        cur = self.conn.cursor()
-        cur.execute(
-            "INSERT INTO graph_edges (src_id, rel, dst_id) VALUES (?, ?, ?)",
-            (src_id, rel, dst_id),
-        )
-        self.conn.commit()
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT INTO graph_edges (src_id, rel, dst_id) VALUES (?, ?, ?)",
+                (src_id, rel, dst_id),
+            )
+        self._graph_changed()
         return cur.lastrowid
 
-    def neighbors(self, name: str) -> List[Dict]:
-        cur = self.conn.cursor()
-        cur.execute("SELECT id FROM graph_entities WHERE name = ?", (name,))
-        row = cur.fetchone()
-        if not row:
+    def add_edges(self, edges: Iterable[Tuple[int, str, int]]) -> int:
+        """Bulk `add_edge` of (src_id, rel, dst_id) rows in one transaction."""
+        edges = list(edges)
+        if not edges:
+            return 0
+        with self.db.write() as conn:
+            conn.executemany("INSERT INTO graph_edges (src_id, rel, dst_id) VALUES (?, ?, ?)", edges)
+        self._graph_changed()
+        return len(edges)
+
+    def snapshot(self) -> AdjacencySnapshot:
+        """Current CSR adjacency snapshot, rebuilt if a write happened since the last one."""
+        snap = self._snapshot
+        if snap is None:
+            with self.db.read() as conn:
+                cur = conn.cursor()
+                cur.execute("SELECT id, name, entity_type FROM graph_entities ORDER BY id")
+                entities = cur.fetchall()
+                cur.execute("SELECT src_id, rel, dst_id FROM graph_edges ORDER BY id")
+                edges = cur.fetchall()
+            snap = AdjacencySnapshot(entities, edges)
+            self._snapshot = snap
+        return snap
+
+    @staticmethod
+    def _rel_clause(rel_filter, column: str = "g.rel") -> Tuple[str, list]:
+        if not rel_filter:
+            return "", []
+        rels = [rel_filter] if isinstance(rel_filter, str) else list(rel_filter)
+        return f" AND {column} IN ({','.join('?' * len(rels))})", rels
+
+    def k_hop(
+        self,
+        name: str,
+        depth: int = 2,
+        rel_filter: str | Sequence[str] | None = None,
+        limit: int = 100,
+    ) -> List[Dict]:
+        """Entities reachable from `name` along outgoing edges within `depth` hops, nearest first.
+
+        Each result carries the hop count and the relation of the edge it was reached by.
+        """
+        if depth <= 0 or limit <= 0:
             return []
-        entity_id = row[0]
-        cur.execute(
-            """
-            SELECT e2.name, e2.entity_type, g.rel
-            FROM graph_edges g
-            JOIN graph_entities e2 ON e2.id = g.dst_id
-            WHERE g.src_id = ?
-            """,
-            (entity_id,),
-        )
+        if self.use_snapshot:
+            snap = self.snapshot()
+            start = snap.by_name.get(name)
+            if start is None:
+                return []
+            rels = {rel_filter} if isinstance(rel_filter, str) else set(rel_filter or ())
+            return [
+                {"name": snap.names[node], "type": snap.types[node], "rel": rel, "depth": level}
+                for node, level, rel in snap.k_hop(start, depth, rels or None, limit)
+            ]
+        rel_sql, rel_params = self._rel_clause(rel_filter)
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                f"""
+                WITH RECURSIVE walk(id, depth, rel) AS (
+                    SELECT id, 0, NULL FROM graph_entities WHERE name = ?
+                    UNION
+                    SELECT g.dst_id, w.depth + 1, g.rel
+                    FROM walk w JOIN graph_edges g ON g.src_id = w.id
+                    WHERE w.depth < ?{rel_sql}
+                )
+                SELECT e.name, e.entity_type, w.rel, MIN(w.depth) AS hops
+                FROM walk w JOIN graph_entities e ON e.id = w.id
+                WHERE e.name <> ?
+                GROUP BY w.id
+                ORDER BY hops, w.id
+                LIMIT ?
+                """,
+                [name, depth] + rel_params + [name, limit],
+            )
+            rows = cur.fetchall()
+        return [{"name": n, "type": t, "rel": rel, "depth": hops} for n, t, rel, hops in rows]
+
+    def shortest_path(
+        self,
+        src: str,
+        dst: str,
+        max_depth: int = 6,
+        rel_filter: str | Sequence[str] | None = None,
+    ) -> List[Dict]:
+        """Fewest-hop path from `src` to `dst` along outgoing edges, as a list of
+        {name, type, rel} steps starting at `src` (whose rel is empty); [] if none."""
+        if src == dst:
+            return []
+        if self.use_snapshot:
+            snap = self.snapshot()
+            start, goal = snap.by_name.get(src), snap.by_name.get(dst)
+            if start is None or goal is None:
+                return []
+            rels = {rel_filter} if isinstance(rel_filter, str) else set(rel_filter or ())
+            return [
+                {"name": snap.names[node], "type": snap.types[node], "rel": rel}
+                for node, rel in snap.shortest_path(start, goal, max_depth, rels or None)
+            ]
+        rel_sql, rel_params = self._rel_clause(rel_filter, "rel")
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT name, id FROM graph_entities WHERE name IN (?, ?)", (src, dst))
+            ids = dict(cur.fetchall())
+            if src not in ids or dst not in ids:
+                return []
+            start, goal = ids[src], ids[dst]
+            # Level-by-level BFS over idx_graph_edges_src: each entity is visited once, and the
+            # walk stops at the first level that reaches `dst`.
+            parents: Dict[int, Tuple[int, str]] = {start: (-1, "")}
+            frontier = [start]
+            found = False
+            for _ in range(max_depth):
+                out: Dict[int, List[Tuple[str, int]]] = {}
+                for i in range(0, len(frontier), 500):
+                    batch = frontier[i : i + 500]
+                    cur.execute(
+                        f"SELECT src_id, rel, dst_id FROM graph_edges "
+                        f"WHERE src_id IN ({','.join('?' * len(batch))}){rel_sql} ORDER BY id",
+                        batch + rel_params,
+                    )
+                    for src_id, rel, dst_id in cur.fetchall():
+                        out.setdefault(src_id, []).append((rel, dst_id))
+                nxt = []
+                for node in frontier:
+                    for rel, dst_id in out.get(node, ()):
+                        if dst_id in parents:
+                            continue
+                        parents[dst_id] = (node, rel)
+                        if dst_id == goal:
+                            found = True
+                            break
+                        nxt.append(dst_id)
+                    if found:
+                        break
+                if found or not nxt:
+                    break
+                frontier = nxt
+            if not found:
+                return []
+            trail: List[Tuple[int, str]] = []
+            node = goal
+            while node != -1:
+                parent, via = parents[node]
+                trail.append((node, via))
+                node = parent
+            trail.reverse()
+            path_ids = [entity_id for entity_id, _ in trail]
+            cur.execute(
+                f"SELECT id, name, entity_type FROM graph_entities WHERE id IN ({','.join('?' * len(path_ids))})",
+                path_ids,
+            )
+            entities = {entity_id: (n, t) for entity_id, n, t in cur.fetchall()}
+        return [
+            {"name": entities[entity_id][0], "type": entities[entity_id][1], "rel": rel}
+            for entity_id, rel in trail
+        ]
+
+    def subgraph(
+        self,
+        names: Sequence[str],
+        depth: int = 1,
+        rel_filter: str | Sequence[str] | None = None,
+        limit: int = 500,
+    ) -> Dict[str, List[Dict]]:
+        """Entities within `depth` outgoing hops of `names` and every edge among them."""
+        if not names:
+            return {"nodes": [], "edges": []}
+        rel_sql, rel_params = self._rel_clause(rel_filter)
+        edge_rel_sql, _ = self._rel_clause(rel_filter, "rel")
+        seeds = ",".join("?" * len(names))
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                f"""
+                WITH RECURSIVE walk(id, depth) AS (
+                    SELECT id, 0 FROM graph_entities WHERE name IN ({seeds})
+                    UNION
+                    SELECT g.dst_id, w.depth + 1
+                    FROM walk w JOIN graph_edges g ON g.src_id = w.id
+                    WHERE w.depth < ?{rel_sql}
+                )
+                SELECT e.id, e.name, e.entity_type
+                FROM graph_entities e
+                WHERE e.id IN (SELECT id FROM walk)
+                ORDER BY e.id
+                LIMIT ?
+                """,
+                list(names) + [depth] + rel_params + [limit],
+            )
+            nodes = cur.fetchall()
+            ids = [row[0] for row in nodes]
+            edges = []
+            for i in range(0, len(ids), 500):
+                batch = ids[i : i + 500]
+                cur.execute(
+                    f"SELECT src_id, rel, dst_id FROM graph_edges "
+                    f"WHERE src_id IN ({','.join('?' * len(batch))}){edge_rel_sql} ORDER BY id",
+                    batch + rel_params,
+                )
+                edges.extend(cur.fetchall())
+        names_by_id = {entity_id: name for entity_id, name, _ in nodes}
+        return {
+            "nodes": [{"id": entity_id, "name": name, "type": etype} for entity_id, name, etype in nodes],
+            "edges": [
+                {"src": names_by_id[src], "rel": rel, "dst": names_by_id[dst]}
+                for src, rel, dst in edges
+                if dst in names_by_id
+            ],
+        }
+
+    def neighbors(self, name: str) -> List[Dict]:
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT id FROM graph_entities WHERE name = ?", (name,))
+            row = cur.fetchone()
+            if not row:
+                return []
+            entity_id = row[0]
+            cur.execute(
+                """
+                SELECT e2.name, e2.entity_type, g.rel
+                FROM graph_edges g
+                JOIN graph_entities e2 ON e2.id = g.dst_id
+                WHERE g.src_id = ?
+                """,
+                (entity_id,),
+            )
+            rows = cur.fetchall()
         results = []
-        for name, etype, rel in cur.fetchall():
+        for name, etype, rel in rows:
             results.append({"name": name, "type": etype, "rel": rel})
         return results
 
     def find_entities(self, query: str) -> List[str]:
-        cur = self.conn.cursor()
-        cur.execute("SELECT name FROM graph_entities")
-        names = [row[0] for row in cur.fetchall()]
-        lowered = query.lower()
-        hits = []
-        for name in names:
-            if name.lower() in lowered or lowered in name.lower():
-                hits.append(name)
-        return hits
+        with self._matcher_lock:
+            if self._matcher is None:
+                with self.db.read() as conn:
+                    cur = conn.cursor()
+                    cur.execute("SELECT name FROM graph_entities ORDER BY id")
+                    names = [row[0] for row in cur.fetchall()]
+                self._matcher = EntityMatcher(names)
+            return self._matcher.find(query)
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import Callable, List, Optional, Sequence, Tuple
+
+
+class GroupCommitWriter:
+    """Batches fire-and-forget INSERT/UPDATE statements into shared commits.
+
+    Statements are queued in-process and a flusher thread applies them with
+    `executemany` (consecutive statements with the same SQL are grouped),
+    committing every `max_rows` statements or `interval_ms` milliseconds,
+    whichever comes first.
+
+    Loss bound: a crash can drop statements that were queued but not yet
+    committed, i.e. at most `max_pending` rows (the queue size; `submit`
+    blocks once it is full) and typically no more than `interval_ms` worth of
+    writes. Call `flush()` where durability matters, e.g. at run completion.
+
+    If a batch fails, it is rolled back and replayed one statement per commit,
+    so only the failing statements are lost. Each one is logged, counted in
+    `failed` (and `group_commit.failed` on `metrics`) and passed to `on_error`.
+    """
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        lock: Optional[threading.RLock] = None,
+        max_rows: int = 200,
+        interval_ms: int = 50,
+        max_pending: int = 10000,
+        on_error: Optional[Callable[[Exception], None]] = None,
+        metrics=None,
+    ) -> None:
+        self._conn = conn
+        self._lock = lock or threading.RLock()
+        self.max_rows = max(1, max_rows)
+        self.interval = max(1, interval_ms) / 1000.0
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, max_pending))
+        self._on_error = on_error
+        self.metrics = metrics
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._closed = False
+        self.batches = 0
+        self.rows = 0
+        self.failed = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def submit(self, sql: str, params: Sequence) -> None:
+        if self._closed:
+            raise RuntimeError("Group commit writer is closed")
+        with self._pending_lock:
+            self._pending += 1
+        self._queue.put((sql, tuple(params)))
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Block until everything submitted before this call is committed."""
+        if self._closed and not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: float | None = 5.0) -> None:
+        if self._closed:
+            return
+        self.flush(timeout)
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch: List[Tuple[str, tuple]] = []
+            barriers: List[threading.Event] = []
+            deadline = time.monotonic() + self.interval
+            stop = False
+            while True:
+                if item is None:
+                    stop = True
+                    break
+                if isinstance(item, threading.Event):
+                    barriers.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.max_rows:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            self._apply(batch)
+            for barrier in barriers:
+                barrier.set()
+            if stop:
+                return
+
+    def _apply(self, batch: List[Tuple[str, tuple]]) -> None:
+        if not batch:
+            return
+        try:
+            try:
+                with self._lock:
+                    cur = self._conn.cursor()
+                    start = 0
+                    while start < len(batch):
+                        sql = batch[start][0]
+                        end = start
+                        while end < len(batch) and batch[end][0] == sql:
+                            end += 1
+                        cur.executemany(sql, [params for _, params in batch[start:end]])
+                        start = end
+                    self._conn.commit()
+                self.batches += 1
+                self.rows += len(batch)
+            except Exception:
+                self._rollback()
+                # One bad statement must not discard the rows other callers queued with it.
+                self._apply_singly(batch)
+        finally:
+            with self._pending_lock:
+                self._pending -= len(batch)
+
+    def _apply_singly(self, batch: List[Tuple[str, tuple]]) -> None:
+        for sql, params in batch:
+            try:
+                with self._lock:
+                    self._conn.execute(sql, params)
+                    self._conn.commit()
+                self.rows += 1
+            except Exception as exc:
+                self._rollback()
+                self._failure(exc, sql)
+        self.batches += 1
+
+    def _rollback(self) -> None:
+        try:
+            self._conn.rollback()
+        except Exception:
+            pass
+
+    def _failure(self, exc: Exception, sql: str) -> None:
+        self.failed += 1
+        logging.error("Group commit dropped a statement: %s", sql.split("(", 1)[0].strip(), exc_info=exc)
+        if self.metrics is not None:
+            self.metrics.inc("group_commit.failed")
+        if self._on_error:
+            try:
+                self._on_error(exc)
+            except Exception:
+                logging.exception("Group commit on_error callback failed")
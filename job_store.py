@@ -4,51 +4,61 @@ import sqlite3
 import time
 from typing import List, Dict
 
+from group_commit import GroupCommitWriter
+from storage import Database, as_database
+
 
 class JobStore:
-    def __init__(self, conn: sqlite3.Connection) -> None:
-        self._conn = conn
+    def __init__(self, conn: sqlite3.Connection | Database, writer: GroupCommitWriter | None = None) -> None:
+        self.db = as_database(conn)
+        self._writer = writer
         self._init()
 
     def _init(self) -> None:
-        cur = self._conn.cursor()
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS jobs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                created_at REAL NOT NULL,
-                status TEXT NOT NULL,
-                command TEXT NOT NULL,
-                result TEXT
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at REAL NOT NULL,
+                    status TEXT NOT NULL,
+                    command TEXT NOT NULL,
+                    result TEXT
+                )
+                """
             )
-            """
-        )
-        self._conn.commit()
 
     def create(self, command: str) -> int:
-        cur = self._conn.cursor()
-        cur.execute(
-            "INSERT INTO jobs (created_at, status, command) VALUES (?, ?, ?)",
-            (time.time(), "running", command),
-        )
-        self._conn.commit()
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT INTO jobs (created_at, status, command) VALUES (?, ?, ?)",
+                (time.time(), "running", command),
+            )
         return cur.lastrowid
 
     def update(self, job_id: int, status: str, result: str = "") -> None:
-        cur = self._conn.cursor()
-        cur.execute(
-            "UPDATE jobs SET status=?, result=? WHERE id=?",
-            (status, result, job_id),
-        )
-        self._conn.commit()
+        if self._writer is not None:
+            self._writer.submit("UPDATE jobs SET status=?, result=? WHERE id=?", (status, result, job_id))
+            return
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "UPDATE jobs SET status=?, result=? WHERE id=?",
+                (status, result, job_id),
+            )
 
     def list(self, limit: int = 20) -> List[Dict[str, str]]:
-        cur = self._conn.cursor()
-        cur.execute(
-            "SELECT id, created_at, status, command, result FROM jobs ORDER BY id DESC LIMIT ?",
-            (limit,),
-        )
-        rows = cur.fetchall()
+        if self._writer is not None and self._writer.pending:
+            self._writer.flush()
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT id, created_at, status, command, result FROM jobs ORDER BY id DESC LIMIT ?",
+                (limit,),
+            )
+            rows = cur.fetchall()
         return [
             {
                 "id": r[0],
@@ -0,0 +1,378 @@
+from __future__ import annotations
+
+import asyncio
+import http.client
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+from urllib.parse import urlparse
+
+try:
+    import aiohttp
+except Exception:
+    aiohttp = None
+
+from router import choose_model
+
+Messages = List[Dict[str, str]]
+TokenCallback = Callable[[str], None]
+
+
+class LLMError(RuntimeError):
+    pass
+
+
+@dataclass
+class LLMBackend:
+    """One model server. `kind` is "openai" (chat completions API) or "ollama"."""
+
+    name: str
+    kind: str
+    base_url: str
+    api_key: str = ""
+    max_concurrency: int = 4
+    timeout: float = 120.0
+
+
+def resolve_model(settings, instruction: str = "", prefer_offline: bool = False) -> Tuple[str, str]:
+    """Pick (backend, model) for `instruction` the way `_configure_agent` does, without touching any global."""
+    openai_key = os.getenv("OPENAI_API_KEY")
+    mode = choose_model(instruction)
+    if openai_key and not prefer_offline:
+        return "openai", _openai_model(settings, mode)
+    if mode == "coding":
+        ollama_model = os.getenv("OLLAMA_CODING_MODEL") or settings.ollama_coding_model
+    elif mode == "reasoning":
+        ollama_model = os.getenv("OLLAMA_REASONING_MODEL") or settings.ollama_reasoning_model
+    else:
+        ollama_model = os.getenv("OLLAMA_MODEL") or settings.ollama_model
+    if ollama_model:
+        return "ollama", ollama_model
+    if openai_key:
+        return "openai", _openai_model(settings, mode)
+    raise RuntimeError(
+        "No OpenAI key found and no local fallback configured. "
+        "Set OPENAI_API_KEY or set OLLAMA_MODEL (and optional OLLAMA_BASE)."
+    )
+
+
+def _openai_model(settings, mode: str) -> str:
+    if mode == "coding":
+        return settings.openai_coding_model
+    if mode == "reasoning":
+        return settings.openai_reasoning_model
+    return settings.openai_model
+
+
+class _PooledHTTPTransport:
+    """Keep-alive `http.client` connections for one backend, used from executor threads."""
+
+    def __init__(self, backend: LLMBackend) -> None:
+        parsed = urlparse(backend.base_url)
+        self.https = parsed.scheme == "https"
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or (443 if self.https else 80)
+        self.prefix = parsed.path.rstrip("/")
+        self.size = max(1, backend.max_concurrency)
+        self._idle: List[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+
+    def _acquire(self, timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            if self._idle:
+                conn = self._idle.pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=timeout), False
+
+    def _release(self, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def post(
+        self,
+        path: str,
+        headers: Dict[str, str],
+        body: bytes,
+        timeout: float,
+        on_line: Optional[Callable[[str], None]] = None,
+    ) -> bytes:
+        while True:
+            conn, reused = self._acquire(timeout)
+            try:
+                conn.request("POST", self.prefix + path, body=body, headers=headers)
+                resp = conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if reused:
+                    # The server dropped an idle keep-alive connection; retry on a fresh one.
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            break
+        try:
+            if resp.status >= 400:
+                raise LLMError(f"HTTP {resp.status}: {resp.read()[:500].decode('utf-8', 'replace')}")
+            if on_line is None:
+                data = resp.read()
+            else:
+                data = b""
+                for raw in iter(resp.readline, b""):
+                    on_line(raw.decode("utf-8", "replace"))
+        except Exception:
+            conn.close()
+            raise
+        if resp.will_close:
+            conn.close()
+        else:
+            self._release(conn)
+        return data
+
+    async def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+class _AiohttpTransport:
+    """One keep-alive `aiohttp.ClientSession` per backend, created lazily on the gateway loop."""
+
+    def __init__(self, backend: LLMBackend) -> None:
+        self.base_url = backend.base_url.rstrip("/")
+        self.limit = max(1, backend.max_concurrency)
+        self._session = None
+
+    async def post(
+        self,
+        path: str,
+        headers: Dict[str, str],
+        body: bytes,
+        timeout: float,
+        on_line: Optional[Callable[[str], None]] = None,
+    ) -> bytes:
+        if self._session is None:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.limit, keepalive_timeout=60))
+        async with self._session.post(
+            self.base_url + path, data=body, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)
+        ) as resp:
+            if resp.status >= 400:
+                raise LLMError(f"HTTP {resp.status}: {(await resp.text())[:500]}")
+            if on_line is None:
+                return await resp.read()
+            async for raw in resp.content:
+                on_line(raw.decode("utf-8", "replace"))
+            return b""
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class LLMGateway:
+    """Thread-safe, asyncio-based chat client for OpenAI-compatible and Ollama servers.
+
+    The gateway owns an event loop on a daemon thread. `achat` can be awaited from
+    any loop; `chat` and `chat_many` are blocking wrappers for threaded callers.
+    Every call names its own backend and model, so concurrent runs never share
+    mutable client state. Each backend has a semaphore capping in-flight requests
+    and a pool of keep-alive connections (aiohttp sessions when installed,
+    otherwise `http.client`).
+    """
+
+    def __init__(self, backends: Sequence[LLMBackend], default_backend: str = "") -> None:
+        self.backends: Dict[str, LLMBackend] = {backend.name: backend for backend in backends}
+        self.default_backend = default_backend or (backends[0].name if backends else "")
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-gateway", daemon=True)
+        self._thread.start()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, sum(backend.max_concurrency for backend in backends)),
+            thread_name_prefix="llm-http",
+        )
+        self._transports: Dict[str, Union[_PooledHTTPTransport, _AiohttpTransport]] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        for backend in backends:
+            transport = _AiohttpTransport(backend) if aiohttp is not None else _PooledHTTPTransport(backend)
+            self._transports[backend.name] = transport
+
+    @classmethod
+    def from_settings(cls, settings) -> "LLMGateway":
+        backends = [
+            LLMBackend(
+                name="ollama",
+                kind="ollama",
+                base_url=os.getenv("OLLAMA_BASE", settings.ollama_base),
+                max_concurrency=getattr(settings, "llm_ollama_concurrency", 2),
+                timeout=getattr(settings, "llm_timeout_seconds", 120),
+            ),
+            LLMBackend(
+                name="openai",
+                kind="openai",
+                base_url=getattr(settings, "openai_base_url", "https://api.openai.com/v1"),
+                api_key=os.getenv("OPENAI_API_KEY", ""),
+                max_concurrency=getattr(settings, "llm_openai_concurrency", 8),
+                timeout=getattr(settings, "llm_timeout_seconds", 120),
+            ),
+        ]
+        return cls(backends, default_backend="openai" if os.getenv("OPENAI_API_KEY") else "ollama")
+
+    def _semaphore(self, name: str) -> asyncio.Semaphore:
+        # Only touched on the gateway loop, so no lock is needed.
+        if name not in self._semaphores:
+            self._semaphores[name] = asyncio.Semaphore(max(1, self.backends[name].max_concurrency))
+        return self._semaphores[name]
+
+    async def achat(
+        self,
+        prompt: Union[str, Messages],
+        model: str = "",
+        backend: str = "",
+        system: str = "",
+        timeout: float | None = None,
+        on_token: Optional[TokenCallback] = None,
+        **options: Any,
+    ) -> str:
+        """Send one chat request and return the reply text.
+
+        `prompt` is a user message or a full message list. With `on_token`, the
+        reply is streamed and each text delta is passed to it as it arrives.
+        `options` (temperature, ...) are forwarded to the backend.
+        """
+        coro = self._chat(prompt, model, backend, system, timeout, on_token, options)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._loop))
+
+    def chat(self, prompt: Union[str, Messages], **kwargs: Any) -> str:
+        """Blocking `achat`; must not be called from the gateway's own loop."""
+        return asyncio.run_coroutine_threadsafe(self.achat(prompt, **kwargs), self._loop).result()
+
+    async def achat_many(self, prompts: Sequence[Union[str, Messages]], **kwargs: Any) -> List[Union[str, BaseException]]:
+        """Run `prompts` concurrently (bounded by the backend semaphore); failures are returned in place."""
+        return list(await asyncio.gather(*(self.achat(prompt, **kwargs) for prompt in prompts), return_exceptions=True))
+
+    def chat_many(self, prompts: Sequence[Union[str, Messages]], **kwargs: Any) -> List[Union[str, BaseException]]:
+        return asyncio.run_coroutine_threadsafe(self.achat_many(prompts, **kwargs), self._loop).result()
+
+    def chat_fn(self, **defaults: Any) -> Callable[[str], str]:
+        """An `agent_chat`-style callable bound to fixed backend/model/system settings."""
+        return lambda prompt: self.chat(prompt, **defaults)
+
+    async def _chat(
+        self,
+        prompt: Union[str, Messages],
+        model: str,
+        backend: str,
+        system: str,
+        timeout: float | None,
+        on_token: Optional[TokenCallback],
+        options: Dict[str, Any],
+    ) -> str:
+        name = backend or self.default_backend
+        if name not in self.backends:
+            raise LLMError(f"Unknown LLM backend: {name}")
+        spec = self.backends[name]
+        if not model:
+            raise LLMError("An explicit model is required for each gateway call")
+        messages: Messages = [{"role": "user", "content": prompt}] if isinstance(prompt, str) else list(prompt)
+        if system:
+            messages.insert(0, {"role": "system", "content": system})
+        stream = on_token is not None
+        payload: Dict[str, Any] = {"model": model, "messages": messages, "stream": stream}
+        if spec.kind == "ollama":
+            path = "/api/chat"
+            if options:
+                payload["options"] = options
+        else:
+            path = "/chat/completions"
+            payload.update(options)
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        if spec.api_key:
+            headers["Authorization"] = f"Bearer {spec.api_key}"
+        body = json.dumps(payload).encode("utf-8")
+        timeout = spec.timeout if timeout is None else timeout
+        parts: List[str] = []
+        on_line = None
+        if stream:
+
+            def on_line(line: str) -> None:
+                delta = _stream_delta(spec.kind, line)
+                if delta:
+                    parts.append(delta)
+                    on_token(delta)
+
+        transport = self._transports[name]
+        async with self._semaphore(name):
+            if isinstance(transport, _PooledHTTPTransport):
+                request = self._loop.run_in_executor(
+                    self._executor, transport.post, path, headers, body, timeout, on_line
+                )
+            else:
+                request = transport.post(path, headers, body, timeout, on_line)
+            try:
+                data = await asyncio.wait_for(request, timeout)
+            except asyncio.TimeoutError:
+                raise LLMError(f"{name} request timed out after {timeout}s") from None
+        if stream:
+            return "".join(parts)
+        return _reply_text(spec.kind, json.loads(data.decode("utf-8")))
+
+    def close(self) -> None:
+        async def _close() -> None:
+            for transport in self._transports.values():
+                await transport.close()
+
+        if self._loop.is_running():
+            asyncio.run_coroutine_threadsafe(_close(), self._loop).result(timeout=5)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+        if not self._loop.is_running() and not self._loop.is_closed():
+            self._loop.close()
+        self._executor.shutdown(wait=False)
+
+
+def _reply_text(kind: str, data: Dict[str, Any]) -> str:
+    try:
+        if kind == "ollama":
+            return data["message"]["content"] or ""
+        return data["choices"][0]["message"]["content"] or ""
+    except (KeyError, IndexError, TypeError):
+        raise LLMError(f"Unexpected {kind} response: {json.dumps(data)[:500]}") from None
+
+
+def _stream_delta(kind: str, line: str) -> str:
+    """Text carried by one line of a streamed reply (OpenAI SSE `data:` lines or Ollama NDJSON)."""
+    line = line.strip()
+    if not line:
+        return ""
+    if kind != "ollama":
+        if not line.startswith("data:"):
+            return ""
+        line = line[len("data:"):].strip()
+        if line == "[DONE]":
+            return ""
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return ""
+    if kind == "ollama":
+        return (data.get("message") or {}).get("content") or ""
+    choices = data.get("choices") or [{}]
+    return (choices[0].get("delta") or {}).get("content") or ""
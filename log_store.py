@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import datetime as _dt
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.request import pathname2url
+
+from group_commit import GroupCommitWriter
+from storage import Database
+
+LOG_TABLES = ("events", "audit_logs", "debug_logs")
+# (timestamp, event_type, payload, schema_version); events rows have no schema_version.
+LogRow = Tuple[float, str, str, Optional[str]]
+
+
+def _day(timestamp: float) -> str:
+    return _dt.datetime.utcfromtimestamp(timestamp).strftime("%Y-%m-%d")
+
+
+def _insert_sql(table: str) -> str:
+    if table == "events":
+        return "INSERT INTO events (timestamp, event_type, payload) VALUES (?, ?, ?)"
+    return f"INSERT INTO {table} (timestamp, event_type, payload, schema_version) VALUES (?, ?, ?, ?)"
+
+
+def _params(table: str, row: LogRow) -> tuple:
+    return tuple(row[:3]) if table == "events" else tuple(row)
+
+
+class PartitionedLogStore:
+    """Append-only log tables kept in one SQLite file per table and UTC day.
+
+    `{table}-YYYY-MM-DD.db` holds that day's rows with the same columns as the
+    table it replaces in `memory.db`, so logging never takes the main database's
+    writer lock and the main file does not grow with logs. Retention drops whole
+    files (`drop_before`); `query` scans a time range across partitions, newest
+    first, on short-lived connections so dropping a file never races a reader.
+    """
+
+    def __init__(self, root: str, group_commit: Optional[Dict] = None) -> None:
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.group_commit = group_commit
+        self._open: Dict[Tuple[str, str], Tuple[Database, Optional[GroupCommitWriter]]] = {}
+        self._lock = threading.Lock()
+
+    def path_for(self, table: str, day: str) -> str:
+        return os.path.join(self.root, f"{table}-{day}.db")
+
+    def days(self, table: str) -> List[str]:
+        pattern = re.compile(rf"^{re.escape(table)}-(\d{{4}}-\d{{2}}-\d{{2}})\.db$")
+        return sorted(m.group(1) for m in (pattern.match(name) for name in os.listdir(self.root)) if m)
+
+    def enable_group_commit(self, **options) -> None:
+        """Batch appends through a `GroupCommitWriter` per open partition."""
+        with self._lock:
+            self.group_commit = options
+            for key, (db, writer) in list(self._open.items()):
+                if writer is None:
+                    self._open[key] = (db, GroupCommitWriter(db.writer, lock=db.write_lock, **options))
+
+    def _partition(self, table: str, day: str) -> Tuple[Database, Optional[GroupCommitWriter]]:
+        with self._lock:
+            entry = self._open.get((table, day))
+            if entry is not None:
+                return entry
+            db = Database(self.path_for(table, day), pool_size=1)
+            with db.write() as conn:
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ("
+                    "id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp REAL NOT NULL, "
+                    "event_type TEXT NOT NULL, payload TEXT NOT NULL"
+                    + ("" if table == "events" else ", schema_version TEXT")
+                    + ")"
+                )
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_ts ON {table}(timestamp)")
+            writer = None
+            if self.group_commit is not None:
+                writer = GroupCommitWriter(db.writer, lock=db.write_lock, **self.group_commit)
+            entry = self._open[(table, day)] = (db, writer)
+            # Only today's and yesterday's partitions still receive rows.
+            stale = (_dt.date.fromisoformat(day) - _dt.timedelta(days=1)).isoformat()
+            for key in [key for key in self._open if key[0] == table and key[1] < stale]:
+                self._close(self._open.pop(key))
+            return entry
+
+    @staticmethod
+    def _close(entry: Tuple[Database, Optional[GroupCommitWriter]]) -> None:
+        db, writer = entry
+        if writer is not None:
+            writer.close()
+        db.close()
+
+    def append(
+        self,
+        table: str,
+        event_type: str,
+        payload: str,
+        schema_version: Optional[str] = None,
+        timestamp: float | None = None,
+    ) -> None:
+        if table not in LOG_TABLES:
+            raise ValueError(f"Unknown log table: {table}")
+        timestamp = time.time() if timestamp is None else timestamp
+        db, writer = self._partition(table, _day(timestamp))
+        params = _params(table, (timestamp, event_type, payload, schema_version))
+        if writer is not None:
+            writer.submit(_insert_sql(table), params)
+            return
+        with db.write() as conn:
+            conn.execute(_insert_sql(table), params)
+
+    def import_rows(self, table: str, rows: Iterable[LogRow]) -> int:
+        """Bulk-append rows (e.g. moved out of `memory.db`), one transaction per partition."""
+        by_day: Dict[str, List[tuple]] = {}
+        for row in rows:
+            by_day.setdefault(_day(row[0]), []).append(_params(table, row))
+        for day, batch in by_day.items():
+            db, writer = self._partition(table, day)
+            if writer is not None:
+                writer.flush()
+            with db.write() as conn:
+                conn.executemany(_insert_sql(table), batch)
+        return sum(len(batch) for batch in by_day.values())
+
+    def flush(self, timeout: float | None = None) -> bool:
+        with self._lock:
+            writers = [writer for _, writer in self._open.values() if writer is not None]
+        return all(writer.flush(timeout) for writer in writers)
+
+    def query(
+        self,
+        table: str,
+        start: float | None = None,
+        end: float | None = None,
+        event_type: str | None = None,
+        limit: int | None = None,
+        newest_first: bool = True,
+    ) -> List[LogRow]:
+        """Rows of `table` with `start <= timestamp < end`, reading only the partitions in range."""
+        if table not in LOG_TABLES:
+            raise ValueError(f"Unknown log table: {table}")
+        self.flush()
+        days = self.days(table)
+        if start is not None:
+            days = [day for day in days if day >= _day(start)]
+        if end is not None:
+            days = [day for day in days if day <= _day(end)]
+        if newest_first:
+            days.reverse()
+        clauses = []
+        params: list = []
+        if start is not None:
+            clauses.append("timestamp >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("timestamp < ?")
+            params.append(end)
+        if event_type:
+            clauses.append("event_type = ?")
+            params.append(event_type)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        order = "DESC" if newest_first else "ASC"
+        version = "NULL" if table == "events" else "schema_version"
+        rows: List[LogRow] = []
+        for day in days:
+            remaining = None if limit is None else limit - len(rows)
+            if remaining is not None and remaining <= 0:
+                break
+            try:
+                # mode=rw: never recreate a partition that was dropped meanwhile.
+                conn = sqlite3.connect(f"file:{pathname2url(self.path_for(table, day))}?mode=rw", uri=True)
+            except sqlite3.OperationalError:
+                continue
+            try:
+                cur = conn.execute(
+                    f"SELECT timestamp, event_type, payload, {version} FROM {table} {where} "
+                    f"ORDER BY timestamp {order}, id {order}"
+                    + ("" if remaining is None else f" LIMIT {int(remaining)}"),
+                    params,
+                )
+                rows.extend(cur.fetchall())
+            except sqlite3.OperationalError:
+                continue
+            finally:
+                conn.close()
+        return rows
+
+    def drop_before(self, table: str, cutoff: float) -> int:
+        """Delete the partitions of `table` whose whole day is older than `cutoff`.
+
+        Rows of the day containing `cutoff` are kept until that partition ages out.
+        """
+        cutoff_day = _day(cutoff)
+        dropped = 0
+        for day in self.days(table):
+            if day >= cutoff_day:
+                break
+            with self._lock:
+                entry = self._open.pop((table, day), None)
+            if entry is not None:
+                self._close(entry)
+            path = self.path_for(table, day)
+            try:
+                for suffix in ("-wal", "-shm", ""):
+                    if os.path.exists(path + suffix):
+                        os.remove(path + suffix)
+            except OSError:
+                # Still open elsewhere (Windows); retried on the next purge.
+                continue
+            dropped += 1
+        return dropped
+
+    def close(self) -> None:
+        with self._lock:
+            entries = list(self._open.values())
+            self._open.clear()
+        for entry in entries:
+            self._close(entry)
@@ -2,29 +2,64 @@ from __future__ import annotations
 
 import os
 import sqlite3
+import threading
 import time
 import json
 import math
-import hashlib
-import re
 from typing import Optional, List, Dict, Any
+
 from privacy import redact_text, contains_sensitive
+from vector_index import VectorIndex
+from group_commit import GroupCommitWriter
+from log_store import LOG_TABLES, PartitionedLogStore
+from retrieval_cache import RetrievalCache
+from chunking import simhash, simhash_bands
+from storage import Database
+from fts import bm25_search, ensure_fts, rrf
+from embeddings import (
+    decode_embedding,
+    decode_sparse,
+    embed_sparse,
+    encode_sparse,
+    migrate_embeddings,
+    sparse_cosine,
+    sparse_norm,
+    to_dense,
+    tokenize,
+)
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+_MEMORY_COLUMNS = (
+    "id, kind, content, embedding, created_at, expires_at, tags, source, confidence, relevance, "
+    "user_id, project_id, acl, scope, status, quarantine_reason"
+)
+# Kinds the user asked to keep; never archived as cold.
+_ARCHIVE_EXEMPT_KINDS = ("pin",)
+# Memories referenced by a failed run; recall hides them and consolidation leaves them alone.
+_NOT_FROM_FAILED_RUN = (
+    "NOT EXISTS (SELECT 1 FROM memory_refs r JOIN task_runs t ON t.run_id = r.run_id "
+    "WHERE r.memory_id = memories.id AND t.status IN ('error','failed','stopped'))"
+)
 
 
 def _tokenize(text: str) -> List[str]:
-    return re.findall(r"[a-zA-Z0-9_]+", text.lower())
+    return tokenize(text)
 
 
 def _embed_text(text: str, dims: int) -> List[int]:
-    vec = [0] * dims
-    for tok in _tokenize(text):
-        h = hashlib.sha1(tok.encode("utf-8")).hexdigest()
-        idx = int(h, 16) % dims
-        vec[idx] += 1
-    return vec
+    return to_dense(embed_sparse(text, dims), dims)
 
 
 def _cosine(a: List[int], b: List[int]) -> float:
+    if np is not None and (isinstance(a, np.ndarray) or isinstance(b, np.ndarray)):
+        a = np.asarray(a, dtype=np.float32)
+        b = np.asarray(b, dtype=np.float32)
+        denom = float(np.linalg.norm(a)) * float(np.linalg.norm(b))
+        return float(a @ b) / denom if denom else 0.0
     dot = 0
     na = 0
     nb = 0
@@ -40,11 +75,32 @@ def _cosine(a: List[int], b: List[int]) -> float:
 
 
 class MemoryStore:
-    def __init__(self, db_path: str, embedding_dim: int = 256) -> None:
+    def __init__(
+        self,
+        db_path: str,
+        embedding_dim: int = 256,
+        ann_threshold: int = 50000,
+        ann_nprobe: int = 8,
+        db_options: Optional[Dict[str, Any]] = None,
+        log_dir: Optional[str] = None,
+    ) -> None:
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
-        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.db = Database(db_path, **(db_options or {}))
+        # Writer connection; kept for schema setup and callers that predate `db`.
+        self._conn = self.db.writer
         self.embedding_dim = embedding_dim
+        self._index = VectorIndex(embedding_dim, ann_threshold=ann_threshold, nprobe=ann_nprobe)
+        self._index_loaded = False
+        self._index_lock = threading.Lock()
+        self.group_writer: GroupCommitWriter | None = None
+        self.shortlist_size = 200
+        self.cache: RetrievalCache | None = None
+        self._fts = False
+        # events/audit_logs/debug_logs go to per-day partition files when set.
+        self.logs: PartitionedLogStore | None = PartitionedLogStore(log_dir) if log_dir else None
         self._init()
+        if self.logs is not None:
+            self._move_legacy_logs()
         self._allowed_scopes = {"shared", "private"}
         self._allowed_statuses = {"active", "quarantined", "deprecated"}
 
@@ -97,7 +153,7 @@ class MemoryStore:
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 kind TEXT NOT NULL,
                 content TEXT NOT NULL,
-                embedding TEXT NOT NULL,
+                embedding BLOB NOT NULL,
                 created_at REAL NOT NULL,
                 expires_at REAL,
                 tags TEXT,
@@ -120,7 +176,33 @@ class MemoryStore:
                 memory_id INTEGER NOT NULL,
                 run_id TEXT,
                 step_id INTEGER,
-                tool_call_id TEXT
+                tool_call_id TEXT,
+                merged_from INTEGER
+            )
+            """
+        )
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS memories_archive (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                content TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL,
+                tags TEXT,
+                source TEXT,
+                confidence REAL,
+                relevance REAL,
+                user_id TEXT,
+                project_id TEXT,
+                acl TEXT,
+                scope TEXT,
+                status TEXT,
+                quarantine_reason TEXT,
+                archived_at REAL NOT NULL,
+                archive_reason TEXT,
+                merged_into INTEGER
             )
             """
         )
@@ -292,6 +374,7 @@ class MemoryStore:
         )
         self._conn.commit()
         self._migrate_memories()
+        migrate_embeddings(self._conn, "memories")
         self._ensure_indexes()
 
     def _migrate_memories(self) -> None:
@@ -316,114 +399,212 @@ class MemoryStore:
             cur.execute("ALTER TABLE memories ADD COLUMN project_id TEXT")
         if "acl" not in cols:
             cur.execute("ALTER TABLE memories ADD COLUMN acl TEXT")
+        cur.execute("PRAGMA table_info(memory_refs)")
+        if "merged_from" not in {row[1] for row in cur.fetchall()}:
+            cur.execute("ALTER TABLE memory_refs ADD COLUMN merged_from INTEGER")
+        cur.execute("PRAGMA table_info(model_runs)")
+        if "tag" not in {row[1] for row in cur.fetchall()}:
+            cur.execute("ALTER TABLE model_runs ADD COLUMN tag TEXT")
         self._conn.commit()
 
     def _ensure_indexes(self) -> None:
         cur = self._conn.cursor()
         cur.execute("CREATE INDEX IF NOT EXISTS idx_events_ts ON events(timestamp)")
         cur.execute("CREATE INDEX IF NOT EXISTS idx_memories_exp ON memories(expires_at)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_memories_created ON memories(created_at)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_memories_archive_exp ON memories_archive(expires_at)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_memory_refs_memory ON memory_refs(memory_id)")
         try:
             cur.execute("CREATE INDEX IF NOT EXISTS idx_rag_source ON rag_chunks(source)")
         except sqlite3.OperationalError:
             # rag_chunks table is created by RagStore; skip if it doesn't exist yet.
             pass
+        self._fts = ensure_fts(self._conn, "memories", "memories_fts", "content")
         self._conn.commit()
 
+    def enable_group_commit(
+        self, max_rows: int = 200, interval_ms: int = 50, max_pending: int = 10000, metrics=None
+    ) -> GroupCommitWriter:
+        if self.group_writer is None:
+            self.group_writer = GroupCommitWriter(
+                self.db.writer,
+                lock=self.db.write_lock,
+                max_rows=max_rows,
+                interval_ms=interval_ms,
+                max_pending=max_pending,
+                metrics=metrics,
+            )
+            if self.logs is not None:
+                self.logs.enable_group_commit(
+                    max_rows=max_rows, interval_ms=interval_ms, max_pending=max_pending, metrics=metrics
+                )
+        return self.group_writer
+
+    def flush(self, timeout: float | None = None) -> bool:
+        flushed = self.logs.flush(timeout) if self.logs is not None else True
+        if self.group_writer is None:
+            return flushed
+        return self.group_writer.flush(timeout) and flushed
+
+    def _write(self, sql: str, params: tuple) -> None:
+        # Fire-and-forget writes go through the group-commit writer when enabled.
+        if self.group_writer is not None:
+            self.group_writer.submit(sql, params)
+            return
+        with self.db.write() as conn:
+            conn.execute(sql, params)
+
+    def _sync_writes(self) -> None:
+        # Read-your-writes for tables fed through _write.
+        if self.group_writer is not None and self.group_writer.pending:
+            self.group_writer.flush()
+
     def set(self, key: str, value: str) -> None:
-        cur = self._conn.cursor()
-        cur.execute(
+        self._write(
             "INSERT INTO kv (key, value, updated_at) VALUES (?, ?, ?) "
             "ON CONFLICT(key) DO UPDATE SET value=excluded.value, updated_at=excluded.updated_at",
             (key, value, time.time()),
         )
-        self._conn.commit()
 
     def get(self, key: str) -> Optional[str]:
-        cur = self._conn.cursor()
-        cur.execute("SELECT value FROM kv WHERE key=?", (key,))
-        row = cur.fetchone()
+        self._sync_writes()
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT value FROM kv WHERE key=?", (key,))
+            row = cur.fetchone()
         return row[0] if row else None
 
+    def _move_legacy_logs(self, batch_size: int = 5000) -> None:
+        # One-time move of log rows written before partitioning out of memory.db.
+        for table in LOG_TABLES:
+            version = "NULL" if table == "events" else "schema_version"
+            while True:
+                with self.db.read() as conn:
+                    cur = conn.cursor()
+                    cur.execute(
+                        f"SELECT id, timestamp, event_type, payload, {version} FROM {table} ORDER BY id LIMIT ?",
+                        (batch_size,),
+                    )
+                    rows = cur.fetchall()
+                if not rows:
+                    break
+                self.logs.import_rows(table, [row[1:] for row in rows])
+                with self.db.write() as conn:
+                    conn.execute(f"DELETE FROM {table} WHERE id <= ?", (rows[-1][0],))
+
     def log_event(self, event_type: str, payload: str) -> None:
-        cur = self._conn.cursor()
-        cur.execute(
+        if self.logs is not None:
+            self.logs.append("events", event_type, payload)
+            return
+        self._write(
             "INSERT INTO events (timestamp, event_type, payload) VALUES (?, ?, ?)",
             (time.time(), event_type, payload),
         )
-        self._conn.commit()
 
     def log_audit(self, event_type: str, payload: str, schema_version: str = "v1") -> None:
-        cur = self._conn.cursor()
-        cur.execute(
+        if self.logs is not None:
+            self.logs.append("audit_logs", event_type, payload, schema_version)
+            return
+        self._write(
             "INSERT INTO audit_logs (timestamp, event_type, payload, schema_version) VALUES (?, ?, ?, ?)",
             (time.time(), event_type, payload, schema_version),
         )
-        self._conn.commit()
 
     def log_debug(self, event_type: str, payload: str, schema_version: str = "v1") -> None:
-        cur = self._conn.cursor()
-        cur.execute(
+        if self.logs is not None:
+            self.logs.append("debug_logs", event_type, payload, schema_version)
+            return
+        self._write(
             "INSERT INTO debug_logs (timestamp, event_type, payload, schema_version) VALUES (?, ?, ?, ?)",
             (time.time(), event_type, payload, schema_version),
         )
-        self._conn.commit()
+
+    def query_logs(
+        self,
+        table: str = "events",
+        start: float | None = None,
+        end: float | None = None,
+        event_type: str | None = None,
+        limit: int | None = 200,
+    ) -> List[Dict[str, Any]]:
+        """Newest-first log rows with `start <= timestamp < end`, across partitions when enabled."""
+        if table not in LOG_TABLES:
+            raise ValueError(f"Unknown log table: {table}")
+        if self.logs is not None:
+            rows = self.logs.query(table, start=start, end=end, event_type=event_type, limit=limit)
+        else:
+            self._sync_writes()
+            clauses = []
+            params: list = []
+            if start is not None:
+                clauses.append("timestamp >= ?")
+                params.append(start)
+            if end is not None:
+                clauses.append("timestamp < ?")
+                params.append(end)
+            if event_type:
+                clauses.append("event_type = ?")
+                params.append(event_type)
+            where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+            version = "NULL" if table == "events" else "schema_version"
+            sql = f"SELECT timestamp, event_type, payload, {version} FROM {table} {where} ORDER BY timestamp DESC, id DESC"
+            if limit is not None:
+                sql += " LIMIT ?"
+                params.append(limit)
+            with self.db.read() as conn:
+                rows = conn.execute(sql, params).fetchall()
+        return [
+            {"timestamp": ts, "event_type": et, "payload": payload, "schema_version": version}
+            for ts, et, payload, version in rows
+        ]
 
     def get_recent_events(self, limit: int = 20) -> List[Dict]:
-        cur = self._conn.cursor()
-        cur.execute(
-            "SELECT timestamp, event_type, payload FROM events ORDER BY timestamp DESC LIMIT ?",
-            (limit,),
-        )
-        rows = cur.fetchall()
         events: List[Dict] = []
-        for ts, etype, payload in rows:
+        for row in self.query_logs("events", limit=limit):
             try:
-                payload_obj = json.loads(payload)
+                payload_obj = json.loads(row["payload"])
             except Exception:
-                payload_obj = {"raw": payload}
-            events.append({"timestamp": ts, "type": etype, "payload": payload_obj})
+                payload_obj = {"raw": row["payload"]}
+            events.append({"timestamp": row["timestamp"], "type": row["event_type"], "payload": payload_obj})
         return events
 
-    def purge_events(self, retention_seconds: Optional[int]) -> None:
+    def _purge_logs(self, table: str, retention_seconds: Optional[int]) -> None:
         if retention_seconds is None or retention_seconds <= 0:
             return
         cutoff = time.time() - retention_seconds
-        cur = self._conn.cursor()
-        cur.execute("DELETE FROM events WHERE timestamp < ?", (cutoff,))
-        self._conn.commit()
+        if self.logs is not None:
+            self.logs.drop_before(table, cutoff)
+            return
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute(f"DELETE FROM {table} WHERE timestamp < ?", (cutoff,))
+
+    def purge_events(self, retention_seconds: Optional[int]) -> None:
+        self._purge_logs("events", retention_seconds)
 
     def purge_audit_logs(self, retention_seconds: Optional[int]) -> None:
-        if retention_seconds is None or retention_seconds <= 0:
-            return
-        cutoff = time.time() - retention_seconds
-        cur = self._conn.cursor()
-        cur.execute("DELETE FROM audit_logs WHERE timestamp < ?", (cutoff,))
-        self._conn.commit()
+        self._purge_logs("audit_logs", retention_seconds)
 
     def purge_debug_logs(self, retention_seconds: Optional[int]) -> None:
-        if retention_seconds is None or retention_seconds <= 0:
-            return
-        cutoff = time.time() - retention_seconds
-        cur = self._conn.cursor()
-        cur.execute("DELETE FROM debug_logs WHERE timestamp < ?", (cutoff,))
-        self._conn.commit()
+        self._purge_logs("debug_logs", retention_seconds)
 
-    def log_model_run(self, model: str, tokens_in: int, tokens_out: int, cost: float, latency: float) -> None:
-        cur = self._conn.cursor()
-        cur.execute(
-            "INSERT INTO model_runs (timestamp, model, tokens_in, tokens_out, cost, latency) VALUES (?, ?, ?, ?, ?, ?)",
-            (time.time(), model, tokens_in, tokens_out, cost, latency),
+    def log_model_run(self, model: str, tokens_in: int, tokens_out: int, cost: float, latency: float, tag: str = "") -> None:
+        """`tag` tells calls of one request apart, e.g. "draft 2/3" of an ensemble."""
+        self._write(
+            "INSERT INTO model_runs (timestamp, model, tokens_in, tokens_out, cost, latency, tag) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (time.time(), model, tokens_in, tokens_out, cost, latency, tag or None),
         )
-        self._conn.commit()
 
     def model_summary(self, limit: int = 50) -> List[Dict[str, str]]:
-        cur = self._conn.cursor()
-        cur.execute(
-            "SELECT model, COUNT(*), AVG(latency), SUM(tokens_in), SUM(tokens_out), SUM(cost) "
-            "FROM model_runs GROUP BY model ORDER BY COUNT(*) DESC LIMIT ?",
-            (limit,),
-        )
-        rows = cur.fetchall()
+        self._sync_writes()
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT model, COUNT(*), AVG(latency), SUM(tokens_in), SUM(tokens_out), SUM(cost) "
+                "FROM model_runs GROUP BY model ORDER BY COUNT(*) DESC LIMIT ?",
+                (limit,),
+            )
+            rows = cur.fetchall()
         return [
             {
                 "model": model,
@@ -437,71 +618,74 @@ class MemoryStore:
         ]
 
     def add_feedback(self, rating: int, notes: str | None = None) -> None:
-        cur = self._conn.cursor()
-        cur.execute(
-            "INSERT INTO feedback (timestamp, rating, notes) VALUES (?, ?, ?)",
-            (time.time(), rating, notes or ""),
-        )
-        self._conn.commit()
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT INTO feedback (timestamp, rating, notes) VALUES (?, ?, ?)",
+                (time.time(), rating, notes or ""),
+            )
 
     def add_incident(self, severity: str, summary: str) -> int:
-        cur = self._conn.cursor()
-        cur.execute(
-            "INSERT INTO incidents (timestamp, severity, summary) VALUES (?, ?, ?)",
-            (time.time(), severity, summary),
-        )
-        self._conn.commit()
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT INTO incidents (timestamp, severity, summary) VALUES (?, ?, ?)",
+                (time.time(), severity, summary),
+            )
         return cur.lastrowid
 
     def list_incidents(self, limit: int = 20) -> List[Dict[str, str]]:
-        cur = self._conn.cursor()
-        cur.execute(
-            "SELECT id, timestamp, severity, summary FROM incidents ORDER BY id DESC LIMIT ?",
-            (limit,),
-        )
-        rows = cur.fetchall()
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT id, timestamp, severity, summary FROM incidents ORDER BY id DESC LIMIT ?",
+                (limit,),
+            )
+            rows = cur.fetchall()
         return [
             {"id": rid, "timestamp": ts, "severity": severity, "summary": summary}
             for (rid, ts, severity, summary) in rows
         ]
 
     def add_evaluation(self, name: str, notes: str | None = None) -> int:
-        cur = self._conn.cursor()
-        cur.execute(
-            "INSERT INTO evaluations (timestamp, name, notes) VALUES (?, ?, ?)",
-            (time.time(), name, notes or ""),
-        )
-        self._conn.commit()
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT INTO evaluations (timestamp, name, notes) VALUES (?, ?, ?)",
+                (time.time(), name, notes or ""),
+            )
         return cur.lastrowid
 
     def list_evaluations(self, limit: int = 20) -> List[Dict[str, str]]:
-        cur = self._conn.cursor()
-        cur.execute(
-            "SELECT id, timestamp, name, notes FROM evaluations ORDER BY id DESC LIMIT ?",
-            (limit,),
-        )
-        rows = cur.fetchall()
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT id, timestamp, name, notes FROM evaluations ORDER BY id DESC LIMIT ?",
+                (limit,),
+            )
+            rows = cur.fetchall()
         return [
             {"id": rid, "timestamp": ts, "name": name, "notes": notes or ""}
             for (rid, ts, name, notes) in rows
         ]
 
     def add_persona(self, name: str, role: str, constraints: str | None = None, owner: str | None = None) -> int:
-        cur = self._conn.cursor()
-        cur.execute(
-            "INSERT INTO personas (timestamp, name, role, constraints, owner) VALUES (?, ?, ?, ?, ?)",
-            (time.time(), name, role, constraints or "", owner or ""),
-        )
-        self._conn.commit()
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT INTO personas (timestamp, name, role, constraints, owner) VALUES (?, ?, ?, ?, ?)",
+                (time.time(), name, role, constraints or "", owner or ""),
+            )
         return cur.lastrowid
 
     def list_personas(self, limit: int = 20) -> List[Dict[str, str]]:
-        cur = self._conn.cursor()
-        cur.execute(
-            "SELECT id, timestamp, name, role, constraints, owner FROM personas ORDER BY id DESC LIMIT ?",
-            (limit,),
-        )
-        rows = cur.fetchall()
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT id, timestamp, name, role, constraints, owner FROM personas ORDER BY id DESC LIMIT ?",
+                (limit,),
+            )
+            rows = cur.fetchall()
         return [
             {
                 "id": rid,
@@ -516,29 +700,30 @@ class MemoryStore:
 
     def add_long_run(self, title: str, milestones: str | None = None) -> int:
         now = time.time()
-        cur = self._conn.cursor()
-        cur.execute(
-            "INSERT INTO long_runs (timestamp, title, milestones, status, last_checkin) VALUES (?, ?, ?, ?, ?)",
-            (now, title, milestones or "", "active", now),
-        )
-        self._conn.commit()
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT INTO long_runs (timestamp, title, milestones, status, last_checkin) VALUES (?, ?, ?, ?, ?)",
+                (now, title, milestones or "", "active", now),
+            )
         return cur.lastrowid
 
     def update_long_run(self, run_id: int, status: str, note: str | None = None) -> None:
-        cur = self._conn.cursor()
-        cur.execute(
-            "UPDATE long_runs SET status=?, milestones=?, last_checkin=? WHERE id=?",
-            (status, note or "", time.time(), run_id),
-        )
-        self._conn.commit()
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "UPDATE long_runs SET status=?, milestones=?, last_checkin=? WHERE id=?",
+                (status, note or "", time.time(), run_id),
+            )
 
     def list_long_runs(self, limit: int = 20) -> List[Dict[str, str]]:
-        cur = self._conn.cursor()
-        cur.execute(
-            "SELECT id, timestamp, title, milestones, status, last_checkin FROM long_runs ORDER BY id DESC LIMIT ?",
-            (limit,),
-        )
-        rows = cur.fetchall()
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT id, timestamp, title, milestones, status, last_checkin FROM long_runs ORDER BY id DESC LIMIT ?",
+                (limit,),
+            )
+            rows = cur.fetchall()
         return [
             {
                 "id": rid,
@@ -552,44 +737,45 @@ class MemoryStore:
         ]
 
     def add_oversight_rule(self, rule: str, severity: str) -> int:
-        cur = self._conn.cursor()
-        cur.execute(
-            "INSERT INTO oversight_rules (timestamp, rule, severity) VALUES (?, ?, ?)",
-            (time.time(), rule, severity),
-        )
-        self._conn.commit()
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT INTO oversight_rules (timestamp, rule, severity) VALUES (?, ?, ?)",
+                (time.time(), rule, severity),
+            )
         return cur.lastrowid
 
     def list_oversight_rules(self, limit: int = 20) -> List[Dict[str, str]]:
-        cur = self._conn.cursor()
-        cur.execute(
-            "SELECT id, timestamp, rule, severity FROM oversight_rules ORDER BY id DESC LIMIT ?",
-            (limit,),
-        )
-        rows = cur.fetchall()
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT id, timestamp, rule, severity FROM oversight_rules ORDER BY id DESC LIMIT ?",
+                (limit,),
+            )
+            rows = cur.fetchall()
         return [
             {"id": rid, "timestamp": ts, "rule": rule, "severity": severity}
             for (rid, ts, rule, severity) in rows
         ]
 
     def begin_transaction(self, run_id: str | None, metadata: str = "") -> int:
-        cur = self._conn.cursor()
-        cur.execute(
-            "INSERT INTO transactions (created_at, run_id, status, metadata) VALUES (?, ?, ?, ?)",
-            (time.time(), run_id or "", "prepared", metadata),
-        )
-        self._conn.commit()
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT INTO transactions (created_at, run_id, status, metadata) VALUES (?, ?, ?, ?)",
+                (time.time(), run_id or "", "prepared", metadata),
+            )
         return cur.lastrowid
 
     def commit_transaction(self, tx_id: int) -> None:
-        cur = self._conn.cursor()
-        cur.execute("UPDATE transactions SET status=? WHERE id=?", ("committed", tx_id))
-        self._conn.commit()
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute("UPDATE transactions SET status=? WHERE id=?", ("committed", tx_id))
 
     def rollback_transaction(self, tx_id: int) -> None:
-        cur = self._conn.cursor()
-        cur.execute("UPDATE transactions SET status=? WHERE id=?", ("rolled_back", tx_id))
-        self._conn.commit()
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute("UPDATE transactions SET status=? WHERE id=?", ("rolled_back", tx_id))
 
     def log_run_context(
         self,
@@ -599,21 +785,21 @@ class MemoryStore:
         tool_versions: str,
         env_fingerprint: str,
     ) -> None:
-        cur = self._conn.cursor()
-        cur.execute(
-            "INSERT INTO run_context (run_id, timestamp, model_id, prompt_hash, tool_versions, env_fingerprint) "
-            "VALUES (?, ?, ?, ?, ?, ?)",
-            (run_id, time.time(), model_id, prompt_hash, tool_versions, env_fingerprint),
-        )
-        self._conn.commit()
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT INTO run_context (run_id, timestamp, model_id, prompt_hash, tool_versions, env_fingerprint) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, time.time(), model_id, prompt_hash, tool_versions, env_fingerprint),
+            )
 
     def log_nondet_input(self, run_id: str, source: str, payload: str) -> None:
-        cur = self._conn.cursor()
-        cur.execute(
-            "INSERT INTO nondet_inputs (run_id, timestamp, source, payload) VALUES (?, ?, ?, ?)",
-            (run_id, time.time(), source, payload),
-        )
-        self._conn.commit()
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT INTO nondet_inputs (run_id, timestamp, source, payload) VALUES (?, ?, ?, ?)",
+                (run_id, time.time(), source, payload),
+            )
 
     def create_task_run(
         self,
@@ -624,16 +810,16 @@ class MemoryStore:
         intent_json: str,
         plan_json: str,
     ) -> None:
-        cur = self._conn.cursor()
-        now = time.time()
-        cur.execute(
-            """
-            INSERT INTO task_runs (run_id, created_at, status, approved, command, intent_json, plan_json, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (run_id, now, status, int(approved), command, intent_json, plan_json, now),
-        )
-        self._conn.commit()
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            now = time.time()
+            cur.execute(
+                """
+                INSERT INTO task_runs (run_id, created_at, status, approved, command, intent_json, plan_json, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (run_id, now, status, int(approved), command, intent_json, plan_json, now),
+            )
 
     def update_task_run(
         self,
@@ -643,7 +829,6 @@ class MemoryStore:
         intent_json: str | None = None,
         plan_json: str | None = None,
     ) -> None:
-        cur = self._conn.cursor()
         fields = []
         values = []
         if status is not None:
@@ -663,17 +848,22 @@ class MemoryStore:
         fields.append("updated_at=?")
         values.append(time.time())
         values.append(run_id)
-        cur.execute(f"UPDATE task_runs SET {', '.join(fields)} WHERE run_id=?", values)
-        self._conn.commit()
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute(f"UPDATE task_runs SET {', '.join(fields)} WHERE run_id=?", values)
+        if status is not None:
+            # run status feeds the failed-run recall filter
+            self._invalidate()
 
     def get_task_run(self, run_id: str) -> Optional[Dict]:
-        cur = self._conn.cursor()
-        cur.execute(
-            "SELECT run_id, created_at, status, approved, command, intent_json, plan_json, updated_at "
-            "FROM task_runs WHERE run_id=?",
-            (run_id,),
-        )
-        row = cur.fetchone()
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT run_id, created_at, status, approved, command, intent_json, plan_json, updated_at "
+                "FROM task_runs WHERE run_id=?",
+                (run_id,),
+            )
+            row = cur.fetchone()
         if not row:
             return None
         return {
@@ -688,12 +878,13 @@ class MemoryStore:
         }
 
     def get_latest_task_run(self) -> Optional[Dict]:
-        cur = self._conn.cursor()
-        cur.execute(
-            "SELECT run_id, created_at, status, approved, command, intent_json, plan_json, updated_at "
-            "FROM task_runs ORDER BY updated_at DESC LIMIT 1"
-        )
-        row = cur.fetchone()
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT run_id, created_at, status, approved, command, intent_json, plan_json, updated_at "
+                "FROM task_runs ORDER BY updated_at DESC LIMIT 1"
+            )
+            row = cur.fetchone()
         if not row:
             return None
         return {
@@ -708,85 +899,89 @@ class MemoryStore:
         }
 
     def add_bdi(self, kind: str, text: str, owner: str | None = None) -> int:
-        cur = self._conn.cursor()
-        cur.execute(
-            "INSERT INTO bdi_entries (timestamp, kind, text, owner) VALUES (?, ?, ?, ?)",
-            (time.time(), kind, text, owner or ""),
-        )
-        self._conn.commit()
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT INTO bdi_entries (timestamp, kind, text, owner) VALUES (?, ?, ?, ?)",
+                (time.time(), kind, text, owner or ""),
+            )
         return cur.lastrowid
 
     def list_bdi(self, kind: str, limit: int = 20) -> List[Dict[str, str]]:
-        cur = self._conn.cursor()
-        cur.execute(
-            "SELECT id, timestamp, kind, text, owner FROM bdi_entries WHERE kind=? ORDER BY id DESC LIMIT ?",
-            (kind, limit),
-        )
-        rows = cur.fetchall()
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT id, timestamp, kind, text, owner FROM bdi_entries WHERE kind=? ORDER BY id DESC LIMIT ?",
+                (kind, limit),
+            )
+            rows = cur.fetchall()
         return [
             {"id": rid, "timestamp": ts, "kind": k, "text": text, "owner": owner or ""}
             for (rid, ts, k, text, owner) in rows
         ]
 
     def add_action_space(self, name: str, description: str) -> int:
-        cur = self._conn.cursor()
-        cur.execute(
-            "INSERT INTO action_space (timestamp, name, description) VALUES (?, ?, ?)",
-            (time.time(), name, description),
-        )
-        self._conn.commit()
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT INTO action_space (timestamp, name, description) VALUES (?, ?, ?)",
+                (time.time(), name, description),
+            )
         return cur.lastrowid
 
     def list_action_space(self, limit: int = 50) -> List[Dict[str, str]]:
-        cur = self._conn.cursor()
-        cur.execute(
-            "SELECT id, timestamp, name, description FROM action_space ORDER BY id DESC LIMIT ?",
-            (limit,),
-        )
-        rows = cur.fetchall()
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT id, timestamp, name, description FROM action_space ORDER BY id DESC LIMIT ?",
+                (limit,),
+            )
+            rows = cur.fetchall()
         return [
             {"id": rid, "timestamp": ts, "name": name, "description": desc}
             for (rid, ts, name, desc) in rows
         ]
 
     def remove_action_space(self, name: str) -> None:
-        cur = self._conn.cursor()
-        cur.execute("DELETE FROM action_space WHERE name=?", (name,))
-        self._conn.commit()
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM action_space WHERE name=?", (name,))
 
     def add_checkpoint(self, label: str, notes: str | None = None) -> int:
-        cur = self._conn.cursor()
-        cur.execute(
-            "INSERT INTO checkpoints (timestamp, label, notes) VALUES (?, ?, ?)",
-            (time.time(), label, notes or ""),
-        )
-        self._conn.commit()
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT INTO checkpoints (timestamp, label, notes) VALUES (?, ?, ?)",
+                (time.time(), label, notes or ""),
+            )
         return cur.lastrowid
 
     def update_checkpoint(self, checkpoint_id: int, notes: str) -> None:
-        cur = self._conn.cursor()
-        cur.execute(
-            "UPDATE checkpoints SET notes=? WHERE id=?",
-            (notes, checkpoint_id),
-        )
-        self._conn.commit()
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "UPDATE checkpoints SET notes=? WHERE id=?",
+                (notes, checkpoint_id),
+            )
 
     def list_checkpoints(self, limit: int = 20) -> List[Dict[str, str]]:
-        cur = self._conn.cursor()
-        cur.execute(
-            "SELECT id, timestamp, label, notes FROM checkpoints ORDER BY id DESC LIMIT ?",
-            (limit,),
-        )
-        rows = cur.fetchall()
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT id, timestamp, label, notes FROM checkpoints ORDER BY id DESC LIMIT ?",
+                (limit,),
+            )
+            rows = cur.fetchall()
         return [
             {"id": rid, "timestamp": ts, "label": label, "notes": notes or ""}
             for (rid, ts, label, notes) in rows
         ]
 
     def get_user_profile(self, user_id: str = "default") -> Dict[str, str]:
-        cur = self._conn.cursor()
-        cur.execute("SELECT payload FROM user_profiles WHERE user_id=?", (user_id,))
-        row = cur.fetchone()
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT payload FROM user_profiles WHERE user_id=?", (user_id,))
+            row = cur.fetchone()
         if not row:
             return {}
         try:
@@ -798,23 +993,17 @@ class MemoryStore:
         current = self.get_user_profile(user_id)
         current.update(updates or {})
         payload = json.dumps(current)
-        cur = self._conn.cursor()
-        cur.execute(
-            "INSERT OR REPLACE INTO user_profiles (user_id, payload, updated_at) VALUES (?, ?, ?)",
-            (user_id, payload, time.time()),
-        )
-        self._conn.commit()
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT OR REPLACE INTO user_profiles (user_id, payload, updated_at) VALUES (?, ?, ?)",
+                (user_id, payload, time.time()),
+            )
 
     def recent_events(self, limit: int = 50) -> List[Dict[str, str]]:
-        cur = self._conn.cursor()
-        cur.execute(
-            "SELECT timestamp, event_type, payload FROM events ORDER BY id DESC LIMIT ?",
-            (limit,),
-        )
-        rows = cur.fetchall()
         return [
-            {"timestamp": ts, "event_type": et, "payload": payload}
-            for (ts, et, payload) in rows
+            {"timestamp": row["timestamp"], "event_type": row["event_type"], "payload": row["payload"]}
+            for row in self.query_logs("events", limit=limit)
         ]
 
     def add_memory(
@@ -847,32 +1036,257 @@ class MemoryStore:
         if contains_sensitive(content):
             content = redact_text(content)
         expires_at = time.time() + ttl_seconds if ttl_seconds else None
-        embedding = _embed_text(content, self.embedding_dim)
-        payload = json.dumps(embedding)
+        embedding = embed_sparse(content, self.embedding_dim)
+        payload = encode_sparse(embedding, self.embedding_dim)
         tags_blob = json.dumps(tags or [])
-        cur = self._conn.cursor()
         acl_blob = json.dumps(acl or {})
-        cur.execute(
-            "INSERT INTO memories (kind, content, embedding, created_at, expires_at, tags, source, confidence, relevance, user_id, project_id, acl, scope, status, quarantine_reason) "
-            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            (kind, content, payload, time.time(), expires_at, tags_blob, source, confidence, relevance, user_id, project_id, acl_blob, scope, status, quarantine_reason),
-        )
-        memory_id = cur.lastrowid
-        if run_id or step_id or tool_call_id:
+        with self.db.write() as conn:
+            cur = conn.cursor()
             cur.execute(
-                "INSERT INTO memory_refs (memory_id, run_id, step_id, tool_call_id) VALUES (?, ?, ?, ?)",
-                (memory_id, run_id, step_id, tool_call_id),
+                "INSERT INTO memories (kind, content, embedding, created_at, expires_at, tags, source, confidence, relevance, user_id, project_id, acl, scope, status, quarantine_reason) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (kind, content, payload, time.time(), expires_at, tags_blob, source, confidence, relevance, user_id, project_id, acl_blob, scope, status, quarantine_reason),
             )
-        self._conn.commit()
+            memory_id = cur.lastrowid
+            if run_id or step_id or tool_call_id:
+                cur.execute(
+                    "INSERT INTO memory_refs (memory_id, run_id, step_id, tool_call_id) VALUES (?, ?, ?, ?)",
+                    (memory_id, run_id, step_id, tool_call_id),
+                )
+        if self._index_loaded:
+            self._index.add(memory_id, to_dense(embedding, self.embedding_dim))
+        self._invalidate()
 
-    def purge_expired(self) -> None:
-        cur = self._conn.cursor()
-        cur.execute("DELETE FROM memories WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),))
-        self._conn.commit()
+    def purge_expired(self, batch_size: int = 500, max_batches: int | None = None) -> int:
+        # Deletes in small id batches with a commit per batch so the writer lock is
+        # released between batches; readers already ignore expired rows.
+        now = time.time()
+        removed = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            with self.db.write() as conn:
+                cur = conn.cursor()
+                cur.execute(
+                    "SELECT id FROM memories WHERE expires_at IS NOT NULL AND expires_at < ? ORDER BY expires_at LIMIT ?",
+                    (now, batch_size),
+                )
+                expired = [row[0] for row in cur.fetchall()]
+                if expired:
+                    marks = ",".join("?" * len(expired))
+                    cur.execute(f"DELETE FROM memories WHERE id IN ({marks})", expired)
+            if not expired:
+                break
+            self._index.remove(expired)
+            removed += len(expired)
+            batches += 1
+        if removed:
+            self._invalidate()
+        return removed
+
+    def _invalidate(self) -> None:
+        if self.cache is not None:
+            self.cache.bump()
 
-    def prune_memories(self) -> None:
+    def prune_memories(self, batch_size: int = 500) -> int:
         # Phase 6: enforce TTL-based pruning for all expired memories.
-        self.purge_expired()
+        return self.purge_expired(batch_size=batch_size)
+
+    def consolidate(
+        self,
+        threshold: float = 0.92,
+        archive_after_seconds: int | None = None,
+        archive_max_relevance: float = 0.5,
+        batch_size: int = 500,
+        vacuum_free_ratio: float = 0.2,
+    ) -> Dict[str, Any]:
+        """Compaction pass: merge near-duplicates, archive cold rows (only when
+        `archive_after_seconds` is given), then ANALYZE/VACUUM."""
+        report: Dict[str, Any] = {"merged": self.merge_duplicates(threshold, batch_size=batch_size)}
+        report["archived"] = (
+            self.archive_cold(archive_after_seconds, archive_max_relevance, batch_size=batch_size)
+            if archive_after_seconds
+            else 0
+        )
+        report.update(self.optimize(vacuum_free_ratio))
+        return report
+
+    def merge_duplicates(self, threshold: float = 0.92, batch_size: int = 500) -> int:
+        """Fold active memories whose embeddings are within `threshold` cosine of each other
+        into one canonical row per cluster; returns the number of rows merged away.
+
+        Clusters never cross scope, user, project or kind. The canonical row is the most
+        relevant (then newest) member and takes the summed relevance, highest confidence,
+        latest expiry and union of tags. Merged rows move to `memories_archive`, their
+        `memory_refs` are re-pointed to the canonical row and a `merged_from` ref records
+        each merge. Candidates come from 8 x 8-bit simhash bands, so only rows sharing a
+        band are compared. Memories referenced by a failed run are never merged, so their
+        refs cannot hide a good canonical row from recall.
+        """
+        now = time.time()
+        buckets: Dict[tuple, List[int]] = {}
+        leaders: Dict[int, tuple] = {}
+        clusters: Dict[int, List[tuple]] = {}
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT id, kind, content, embedding, scope, user_id, project_id, relevance, confidence, "
+                "expires_at, tags FROM memories WHERE status = 'active' AND (expires_at IS NULL OR expires_at > ?) "
+                f"AND {_NOT_FROM_FAILED_RUN} ORDER BY COALESCE(relevance, 0) DESC, created_at DESC",
+                (now,),
+            )
+            for memory_id, kind, content, blob, scope, user_id, project_id, *fields in cur:
+                try:
+                    vec = decode_sparse(blob, self.embedding_dim)
+                except Exception:
+                    continue
+                norm = sparse_norm(vec)
+                if not norm:
+                    continue
+                group = (scope, user_id, project_id, kind)
+                fingerprint = simhash(content)
+                if fingerprint is None:
+                    # Too short to fingerprint: only identical token sequences are compared.
+                    keys = [group + (" ".join(tokenize(content)),)]
+                else:
+                    keys = [group + (band,) for band in simhash_bands(fingerprint, bands=8)]
+                best, best_score = None, threshold
+                for leader in {leader for key in keys for leader in buckets.get(key, ())}:
+                    leader_vec, leader_norm = leaders[leader][:2]
+                    score = sparse_cosine(vec, leader_vec, norm, leader_norm)
+                    if score >= best_score:
+                        best, best_score = leader, score
+                if best is None:
+                    leaders[memory_id] = (vec, norm, fields)
+                    for key in keys:
+                        buckets.setdefault(key, []).append(memory_id)
+                else:
+                    clusters.setdefault(best, []).append((memory_id, fields))
+        merged: List[int] = []
+        pending = list(clusters.items())
+        while pending:
+            batch, size = [], 0
+            while pending and size < batch_size:
+                batch.append(pending.pop())
+                size += len(batch[-1][1])
+            with self.db.write() as conn:
+                cur = conn.cursor()
+                for leader, members in batch:
+                    self._merge_cluster(cur, leader, leaders[leader][2], members, now)
+                    merged.extend(member_id for member_id, _ in members)
+        if merged:
+            self._index.remove(merged)
+            self._invalidate()
+        return len(merged)
+
+    @staticmethod
+    def _merge_cluster(cur, leader: int, leader_fields: tuple, members: List[tuple], now: float) -> None:
+        rows = [leader_fields] + [fields for _, fields in members]
+        relevance = sum(row[0] or 0.0 for row in rows)
+        confidence = max(row[1] or 0.0 for row in rows)
+        expiries = [row[2] for row in rows]
+        expires_at = None if any(value is None for value in expiries) else max(expiries)
+        tags: List[str] = []
+        for row in rows:
+            try:
+                tags.extend(tag for tag in json.loads(row[3] or "[]") if tag not in tags)
+            except Exception:
+                continue
+        ids = [member_id for member_id, _ in members]
+        marks = ",".join("?" * len(ids))
+        cur.execute(
+            "UPDATE memories SET relevance = ?, confidence = ?, expires_at = ?, tags = ? WHERE id = ?",
+            (relevance, confidence, expires_at, json.dumps(tags), leader),
+        )
+        cur.execute(
+            f"INSERT OR REPLACE INTO memories_archive ({_MEMORY_COLUMNS}, archived_at, archive_reason, merged_into) "
+            f"SELECT {_MEMORY_COLUMNS}, ?, 'merged', ? FROM memories WHERE id IN ({marks})",
+            [now, leader] + ids,
+        )
+        cur.execute(f"UPDATE memory_refs SET memory_id = ? WHERE memory_id IN ({marks})", [leader] + ids)
+        cur.executemany(
+            "INSERT INTO memory_refs (memory_id, merged_from) VALUES (?, ?)",
+            [(leader, member_id) for member_id in ids],
+        )
+        cur.execute(f"DELETE FROM memories WHERE id IN ({marks})", ids)
+
+    def archive_cold(self, older_than_seconds: int, max_relevance: float = 0.5, batch_size: int = 500) -> int:
+        """Move rows older than `older_than_seconds` whose relevance was never raised above
+        `max_relevance` (e.g. by merges) to `memories_archive`, one commit per batch.
+
+        Recall never reads the archive, so pinned memories and rows without a TTL (kept
+        on purpose, e.g. long-term facts) stay. Expired archive rows are deleted on the way.
+        """
+        now = time.time()
+        cutoff = now - older_than_seconds
+        exempt = ",".join("?" * len(_ARCHIVE_EXEMPT_KINDS))
+        moved: List[int] = []
+        with self.db.write() as conn:
+            conn.execute("DELETE FROM memories_archive WHERE expires_at IS NOT NULL AND expires_at < ?", (now,))
+        while True:
+            with self.db.write() as conn:
+                cur = conn.cursor()
+                cur.execute(
+                    f"SELECT id FROM memories WHERE created_at < ? AND COALESCE(relevance, 0) <= ? "
+                    f"AND expires_at IS NOT NULL AND kind NOT IN ({exempt}) ORDER BY created_at LIMIT ?",
+                    (cutoff, max_relevance, *_ARCHIVE_EXEMPT_KINDS, batch_size),
+                )
+                ids = [row[0] for row in cur.fetchall()]
+                if ids:
+                    marks = ",".join("?" * len(ids))
+                    cur.execute(
+                        f"INSERT OR REPLACE INTO memories_archive ({_MEMORY_COLUMNS}, archived_at, archive_reason) "
+                        f"SELECT {_MEMORY_COLUMNS}, ?, 'cold' FROM memories WHERE id IN ({marks})",
+                        [now] + ids,
+                    )
+                    cur.execute(f"DELETE FROM memories WHERE id IN ({marks})", ids)
+            if not ids:
+                break
+            moved.extend(ids)
+        if moved:
+            self._index.remove(moved)
+            self._invalidate()
+        return len(moved)
+
+    def optimize(self, vacuum_free_ratio: float = 0.2) -> Dict[str, Any]:
+        """Refresh planner statistics and VACUUM once free pages reach `vacuum_free_ratio` of the file."""
+        with self.db.write() as conn:
+            conn.commit()
+            conn.execute("ANALYZE")
+            pages = conn.execute("PRAGMA page_count").fetchone()[0]
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            vacuumed = False
+            if pages and free / pages >= vacuum_free_ratio:
+                try:
+                    conn.execute("VACUUM")
+                    vacuumed = True
+                except sqlite3.OperationalError:
+                    # Busy readers; retried on the next pass.
+                    pass
+        return {"pages": pages, "free_pages": free, "vacuumed": vacuumed}
+
+    def _load_index(self, ids: Optional[List[int]] = None) -> None:
+        # Populate the resident vector index from SQLite; with `ids`, only backfill rows
+        # written outside add_memory (e.g. by another process).
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            if ids is None:
+                cur.execute("SELECT id, embedding FROM memories")
+                rows = cur.fetchall()
+            else:
+                rows = []
+                for i in range(0, len(ids), 500):
+                    batch = ids[i : i + 500]
+                    marks = ",".join("?" * len(batch))
+                    cur.execute(f"SELECT id, embedding FROM memories WHERE id IN ({marks})", batch)
+                    rows.extend(cur.fetchall())
+        items = []
+        for memory_id, emb_blob in rows:
+            try:
+                items.append((memory_id, decode_embedding(emb_blob, self.embedding_dim)))
+            except Exception:
+                continue
+        self._index.add_many(items)
+        self._index_loaded = True
 
     def search_memory(
         self,
@@ -884,14 +1298,47 @@ class MemoryStore:
         user_id: str | None = None,
         project_id: str | None = None,
         exclude_failed_runs: bool = True,
+        mode: str = "vector",
+    ) -> List[Dict[str, str]]:
+        """Recall memories by `mode`: `vector` (resident index), `bm25` (FTS5) or
+        `hybrid` (BM25 shortlist rescored by the index, fused by reciprocal rank).
+
+        Results are served from `cache` when one is attached.
+        """
+        args = (query, limit, scope, include_quarantined, min_confidence, user_id, project_id, exclude_failed_runs, mode)
+        cache = self.cache
+        if cache is None:
+            return self._search_memory(*args)
+        key = cache.key("memory", *args)
+        hit, cached = cache.get(key)
+        if hit:
+            return cached
+        generation = cache.generation
+        results = self._search_memory(*args)
+        cache.put(key, results, generation)
+        return results
+
+    def _search_memory(
+        self,
+        query: str,
+        limit: int,
+        scope: str,
+        include_quarantined: bool,
+        min_confidence: float,
+        user_id: str | None,
+        project_id: str | None,
+        exclude_failed_runs: bool,
+        mode: str,
     ) -> List[Dict[str, str]]:
         if scope not in self._allowed_scopes and scope != "all":
             raise ValueError(f"Invalid memory scope: {scope}")
-        self.purge_expired()
+        if mode not in ("vector", "bm25", "hybrid"):
+            raise ValueError(f"Invalid memory search mode: {mode}")
+        if not self._fts:
+            mode = "vector"
         qvec = _embed_text(query, self.embedding_dim)
-        cur = self._conn.cursor()
-        clauses = []
-        params: list = []
+        clauses = ["(expires_at IS NULL OR expires_at > ?)"]
+        params: list = [time.time()]
         if not include_quarantined:
             clauses.append("status = ?")
             params.append("active")
@@ -907,44 +1354,64 @@ class MemoryStore:
         if project_id:
             clauses.append("(project_id IS NULL OR project_id = ?)")
             params.append(project_id)
-        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
-        cur.execute(f"SELECT id, kind, content, embedding, created_at, tags FROM memories {where}", params)
-        rows = cur.fetchall()
-        failed_runs = set()
         if exclude_failed_runs:
-            try:
-                cur.execute("SELECT run_id FROM task_runs WHERE status IN ('error','failed','stopped')")
-                failed_runs = {row[0] for row in cur.fetchall() if row[0]}
-            except Exception:
-                failed_runs = set()
+            clauses.append(_NOT_FROM_FAILED_RUN)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            cur.execute(f"SELECT id, acl FROM memories {where}", params)
+            candidates = []
+            for memory_id, acl_blob in cur.fetchall():
+                # ACL filter
+                if user_id and acl_blob and acl_blob != "{}":
+                    try:
+                        users = json.loads(acl_blob).get("users") or []
+                        if users and user_id not in users:
+                            continue
+                    except Exception:
+                        pass
+                candidates.append(memory_id)
+            if not candidates:
+                return []
+            if mode != "vector":
+                allowed = set(candidates)
+                lexical = [
+                    (memory_id, score)
+                    for memory_id, score in bm25_search(cur, "memories_fts", query, max(self.shortlist_size, limit))
+                    if memory_id in allowed
+                ]
+                candidates = [memory_id for memory_id, _ in lexical]
+            if mode == "bm25":
+                hits = lexical[:limit]
+            elif candidates:
+                if not self._index_loaded:
+                    with self._index_lock:
+                        if not self._index_loaded:
+                            self._load_index()
+                missing = [memory_id for memory_id in candidates if memory_id not in self._index]
+                if missing:
+                    self._load_index(missing)
+                if mode == "hybrid":
+                    semantic = self._index.search(qvec, len(candidates), allowed=candidates)
+                    fused = rrf([candidates, [memory_id for memory_id, _ in semantic]])
+                    hits = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:limit]
+                else:
+                    hits = self._index.search(qvec, limit, allowed=candidates)
+            else:
+                hits = []
+            if not hits:
+                return []
+            marks = ",".join("?" * len(hits))
+            cur.execute(
+                f"SELECT id, kind, content, created_at, tags FROM memories WHERE id IN ({marks})",
+                [memory_id for memory_id, _ in hits],
+            )
+            rows = {row[0]: row[1:] for row in cur.fetchall()}
         scored = []
-        for memory_id, kind, content, emb_json, created_at, tags_blob in rows:
-            try:
-                emb = json.loads(emb_json)
-            except Exception:
-                continue
-            # ACL filter
-            try:
-                cur.execute("SELECT acl FROM memories WHERE id=?", (memory_id,))
-                acl_blob = cur.fetchone()
-                if acl_blob and acl_blob[0]:
-                    acl = json.loads(acl_blob[0])
-                    users = acl.get("users") or []
-                    if user_id and users and user_id not in users:
-                        continue
-            except Exception:
-                pass
-            if exclude_failed_runs and failed_runs:
-                try:
-                    cur.execute("SELECT run_id FROM memory_refs WHERE memory_id=?", (memory_id,))
-                    refs = [row[0] for row in cur.fetchall() if row[0]]
-                    if any(r in failed_runs for r in refs):
-                        continue
-                except Exception:
-                    pass
-            score = _cosine(qvec, emb)
-            if score <= 0:
+        for memory_id, score in hits:
+            if memory_id not in rows:
                 continue
+            kind, content, created_at, tags_blob = rows[memory_id]
             scored.append({
                 "kind": kind,
                 "content": content,
@@ -952,5 +1419,4 @@ class MemoryStore:
                 "created_at": created_at,
                 "tags": tags_blob or "[]",
             })
-        scored.sort(key=lambda x: x["score"], reverse=True)
-        return scored[:limit]
+        return scored
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from core.schemas import Budget, PlanStepSchema
+
+# Tools that drive the same underlying resource share one concurrency limit.
+# All browser tools act on the single Playwright page in `AgentApp.page`.
+TOOL_GROUPS: Dict[str, str] = {
+    "browse": "browser",
+    "search": "browser",
+    "click": "browser",
+    "type": "browser",
+    "press": "browser",
+    "screenshot": "browser",
+}
+# `agent` steps go through `AgentApp._agent_chat`, which drives the shared open-interpreter
+# client unless the LLM gateway is in use.
+DEFAULT_TOOL_LIMITS: Dict[str, int] = {"computer": 1, "vm": 1, "browser": 1, "agent": 1}
+
+
+def parse_tool_limits(spec: str, concurrent_agent: bool = False) -> Dict[str, int]:
+    """Parse `"computer=1,agent=4"` into `{"computer": 1, "agent": 4}` on top of the defaults.
+
+    `agent` steps stay one at a time unless `concurrent_agent` is set (i.e. `_agent_chat`
+    is thread-safe); then they are uncapped unless `spec` limits them.
+    """
+    limits = dict(DEFAULT_TOOL_LIMITS)
+    if concurrent_agent:
+        del limits["agent"]
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        name, value = item.split("=", 1)
+        try:
+            limits[name.strip()] = max(1, int(value))
+        except ValueError:
+            continue
+    if not concurrent_agent:
+        limits["agent"] = 1
+    return limits
+
+
+def parse_depends_on(value) -> Optional[List[int]]:
+    """`depends_on` from plan JSON: a list of step ids, a single id, `"1, 2"`, or absent (None).
+
+    Anything that is not a step id (e.g. `"step_1"`) also gives None, so the step
+    falls back to running after the previous one instead of invalidating the plan.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = [part for part in value.split(",") if part.strip()]
+    elif not isinstance(value, (list, tuple)):
+        value = [value]
+    ids: List[int] = []
+    for item in value:
+        if isinstance(item, bool):
+            return None
+        try:
+            ids.append(int(str(item).strip()) if isinstance(item, str) else int(item))
+        except (TypeError, ValueError):
+            return None
+    return ids
+
+
+def step_dependencies(steps: Sequence[PlanStepSchema]) -> Dict[int, List[int]]:
+    """Map each step_id to the step_ids it waits for.
+
+    A step whose `depends_on` is None runs after the step before it, so plans
+    that declare no dependencies keep their sequential order. Raises ValueError
+    for duplicate ids, unknown dependencies and cycles.
+    """
+    ids = {step.step_id for step in steps}
+    if len(ids) != len(steps):
+        raise ValueError("Plan step ids must be unique")
+    deps: Dict[int, List[int]] = {}
+    previous: Optional[int] = None
+    for step in steps:
+        if step.depends_on is None:
+            deps[step.step_id] = [] if previous is None else [previous]
+        else:
+            deps[step.step_id] = list(dict.fromkeys(int(dep) for dep in step.depends_on))
+        unknown = [dep for dep in deps[step.step_id] if dep not in ids]
+        if unknown:
+            raise ValueError(f"Step {step.step_id} depends on unknown steps: {unknown}")
+        previous = step.step_id
+    # Kahn's algorithm: anything left unvisited sits on a cycle.
+    indegree = {step_id: len(parents) for step_id, parents in deps.items()}
+    children: Dict[int, List[int]] = {step_id: [] for step_id in deps}
+    for step_id, parents in deps.items():
+        for parent in parents:
+            children[parent].append(step_id)
+    ready = [step_id for step_id, count in indegree.items() if count == 0]
+    visited = 0
+    while ready:
+        step_id = ready.pop()
+        visited += 1
+        for child in children[step_id]:
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                ready.append(child)
+    if visited != len(deps):
+        raise ValueError("Plan step dependencies contain a cycle")
+    return deps
+
+
+class PlanBudget:
+    """Thread-safe step, tool-call and wall-clock budget shared by concurrent steps."""
+
+    def __init__(self, budget: Budget, started: float | None = None, steps_used: int = 0) -> None:
+        self.budget = budget
+        self.started = time.time() if started is None else started
+        self.steps_used = steps_used
+        self.tool_calls = 0
+        self._lock = threading.Lock()
+
+    def start_step(self) -> str:
+        """Claim a step slot; returns the exceeded budget's failure reason, or "" when the step may run."""
+        with self._lock:
+            if self.steps_used >= self.budget.max_steps:
+                return "Budget exceeded: max_steps"
+            if (time.time() - self.started) > self.budget.max_seconds:
+                return "Budget exceeded: max_seconds"
+            self.steps_used += 1
+            return ""
+
+    def take_tool_call(self) -> bool:
+        with self._lock:
+            self.tool_calls += 1
+            return self.tool_calls <= self.budget.max_tool_calls
+
+
+class DagScheduler:
+    """Runs plan steps as soon as their dependencies succeed, on a bounded worker pool.
+
+    `run_step(step)` returns True when the step succeeded. A False return (failed
+    step, budget exhausted, approval needed) or an exception stops new steps from
+    starting; steps already running are allowed to finish, then `run` returns or
+    re-raises. Tools listed in `tool_limits` (directly or through `TOOL_GROUPS`)
+    never run more than that many steps at once.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        tool_limits: Optional[Dict[str, int]] = None,
+        tool_groups: Optional[Dict[str, str]] = None,
+    ) -> None:
+        self.max_workers = max(1, max_workers)
+        self.tool_limits = dict(DEFAULT_TOOL_LIMITS if tool_limits is None else tool_limits)
+        self.tool_groups = dict(TOOL_GROUPS if tool_groups is None else tool_groups)
+
+    def _slot(self, step: PlanStepSchema) -> str:
+        return self.tool_groups.get(step.tool, step.tool)
+
+    def run(
+        self,
+        steps: Sequence[PlanStepSchema],
+        run_step: Callable[[PlanStepSchema], bool],
+        done: Iterable[int] = (),
+    ) -> List[int]:
+        """Execute `steps` (skipping the ids in `done`, which count as succeeded); returns the ids started, in start order."""
+        deps = step_dependencies(steps)
+        succeeded = set(done)
+        pending = [step for step in steps if step.step_id not in succeeded]
+        started: List[int] = []
+        if self.max_workers == 1 or _is_chain(pending, deps):
+            for step in pending:
+                if any(dep not in succeeded for dep in deps[step.step_id]):
+                    break
+                started.append(step.step_id)
+                if not run_step(step):
+                    break
+                succeeded.add(step.step_id)
+            return started
+        running: Dict[Future, PlanStepSchema] = {}
+        in_use: Dict[str, int] = {}
+        halted = False
+        error: Optional[BaseException] = None
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="plan-step") as pool:
+            while True:
+                if not halted:
+                    for step in list(pending):
+                        if len(running) >= self.max_workers:
+                            break
+                        if any(dep not in succeeded for dep in deps[step.step_id]):
+                            continue
+                        slot = self._slot(step)
+                        limit = self.tool_limits.get(slot)
+                        if limit is not None and in_use.get(slot, 0) >= limit:
+                            continue
+                        in_use[slot] = in_use.get(slot, 0) + 1
+                        pending.remove(step)
+                        started.append(step.step_id)
+                        running[pool.submit(run_step, step)] = step
+                if not running:
+                    break
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    step = running.pop(future)
+                    slot = self._slot(step)
+                    in_use[slot] -= 1
+                    try:
+                        ok = future.result()
+                    except BaseException as exc:
+                        ok = False
+                        error = error or exc
+                    if ok:
+                        succeeded.add(step.step_id)
+                    else:
+                        halted = True
+        if error is not None:
+            raise error
+        return started
+
+
+def _is_chain(steps: Sequence[PlanStepSchema], deps: Dict[int, List[int]]) -> bool:
+    """True when no two of `steps` could ever run at the same time."""
+    previous: Optional[int] = None
+    for step in steps:
+        parents = deps[step.step_id]
+        if previous is not None and previous not in parents:
+            return False
+        previous = step.step_id
+    return True
@@ -2,10 +2,24 @@
 
 import os
 import json
-from typing import List
+import time
+import hashlib
+import datetime as _dt
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from memory import _embed_text, _cosine
+from embeddings import decode_sparse, embed_sparse, encode_sparse, migrate_embeddings, sparse_cosine, sparse_norm
+from chunking import chunk_text, from_signed64, hamming, simhash, simhash_bands, to_signed64
 from data_constitution import check_text
+from fts import bm25_search, ensure_fts, rrf
+from retrieval_cache import RetrievalCache
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+from storage import as_database
 
 
 def _read_pdf_text(path: str, max_pages: int = 30) -> str:
@@ -29,56 +43,223 @@ def _read_pdf_text(path: str, max_pages: int = 30) -> str:
     return "\n".join(parts)
 
 
+SEARCH_MODES = ("vector", "bm25", "hybrid")
+_CHUNK_COLUMNS = (
+    "id, source, text, embedding, source_rank, source_path, chunk_index, chunk_start, chunk_end, metadata"
+)
+
+
+def _extract_text(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".pdf":
+        text = _read_pdf_text(path)
+        if not text:
+            try:
+                from multimodal import ocr_pdf
+                text = ocr_pdf(path, pages=2)
+            except Exception:
+                text = ""
+        return text
+    with open(path, "r", encoding="utf-8", errors="ignore") as handle:
+        return handle.read()
+
+
+def _content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8", errors="ignore")).hexdigest()
+
+
+def _chunker_key(chunking: Dict) -> str:
+    return json.dumps(chunking, sort_keys=True)
+
+
+def _prepare_file(
+    path: str,
+    dims: int,
+    known: Optional[Tuple[int, float, str, str]] = None,
+    reuse_hashes: Iterable[str] = (),
+    force: bool = False,
+    chunking: Optional[Dict] = None,
+) -> Dict:
+    """Extract, check, chunk and embed one file; runs inside ingest worker processes.
+
+    `known` is the manifest (size, mtime, content_hash, chunker) and `reuse_hashes`
+    the chunk hashes already stored for the file, whose embeddings are not
+    recomputed. `chunking` holds the `chunking.chunk_text` strategy and options;
+    files indexed with different options are always re-chunked.
+    """
+    chunking = dict(chunking or {"strategy": "fixed"})
+    chunker = _chunker_key(chunking)
+    stat = os.stat(path)
+    prepared = {
+        "path": path,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "status": "unchanged",
+        "chunker": chunker,
+    }
+    if known and known[3] != chunker:
+        force = True
+    if known and not force and known[0] == stat.st_size and known[1] == stat.st_mtime:
+        return prepared
+    text = _extract_text(path)
+    if not text:
+        raise RuntimeError("No text extracted for indexing.")
+    content_hash = _content_hash(text)
+    prepared["content_hash"] = content_hash
+    if known and not force and known[2] == content_hash:
+        prepared["status"] = "touched"
+        return prepared
+    issues = check_text(text)
+    if issues:
+        raise RuntimeError("Data constitution blocked indexing: " + "; ".join(issues))
+    reuse = set(reuse_hashes)
+    chunks = []
+    # chunking for provenance and retrieval quality
+    for idx, start, end, chunk in chunk_text(text, **chunking):
+        chunk_hash = _content_hash(chunk)
+        blob = None if chunk_hash in reuse else encode_sparse(embed_sparse(chunk, dims), dims)
+        chunks.append((idx, start, end, chunk, chunk_hash, blob, simhash(chunk)))
+    prepared["status"] = "changed"
+    prepared["chunks"] = chunks
+    prepared["metadata"] = {
+        "path": path,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "ext": os.path.splitext(path)[1].lower(),
+    }
+    return prepared
+
+
 class RagStore:
-    def __init__(self, memory) -> None:
+    def __init__(
+        self,
+        memory,
+        ingest_workers: int = 0,
+        ingest_batch_rows: int = 500,
+        search_mode: str = "vector",
+        shortlist_size: int = 200,
+        chunking: Optional[Dict] = None,
+        dedup_distance: int = 3,
+    ) -> None:
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(f"Invalid RAG search mode: {search_mode}")
         self.memory = memory
+        # `chunking.chunk_text` strategy and options used by index_file / ingestion.
+        self.chunking = dict(chunking or {"strategy": "fixed", "size": 1000})
+        # Max simhash distance for storing a chunk as a reference to one from another file; < 0 disables.
+        self.dedup_distance = dedup_distance
+        self.search_mode = search_mode
+        self.shortlist_size = shortlist_size
+        self.cache: RetrievalCache | None = None
+        self._fts = False
+        self.ingest_workers = ingest_workers
+        self.ingest_batch_rows = max(1, ingest_batch_rows)
+        self.db = as_database(memory)
         self._init()
 
     def _init(self) -> None:
-        cur = self.memory._conn.cursor()
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS rag_chunks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                source TEXT NOT NULL,
-                text TEXT NOT NULL,
-                embedding TEXT NOT NULL,
-                source_path TEXT,
-                chunk_index INTEGER,
-                chunk_start INTEGER,
-                chunk_end INTEGER,
-                metadata TEXT,
-                source_rank REAL DEFAULT 1.0,
-                created_at TEXT
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rag_chunks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    source TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    embedding BLOB NOT NULL,
+                    source_path TEXT,
+                    chunk_index INTEGER,
+                    chunk_start INTEGER,
+                    chunk_end INTEGER,
+                    metadata TEXT,
+                    source_rank REAL DEFAULT 1.0,
+                    created_at TEXT
+                )
+                """
             )
-            """
-        )
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rag_files (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER,
+                    mtime REAL,
+                    content_hash TEXT,
+                    chunks INTEGER,
+                    indexed_at TEXT,
+                    chunker TEXT
+                )
+                """
+            )
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rag_chunk_refs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chunk_id INTEGER NOT NULL,
+                    source TEXT NOT NULL,
+                    source_path TEXT,
+                    chunk_index INTEGER,
+                    chunk_start INTEGER,
+                    chunk_end INTEGER,
+                    chunk_hash TEXT,
+                    metadata TEXT,
+                    created_at TEXT
+                )
+                """
+            )
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_rag_refs_chunk ON rag_chunk_refs(chunk_id)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_rag_refs_path ON rag_chunk_refs(source_path)")
+            cur.execute("CREATE TABLE IF NOT EXISTS rag_simhash_bands (band INTEGER NOT NULL, chunk_id INTEGER NOT NULL)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_rag_bands_band ON rag_simhash_bands(band)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_rag_bands_chunk ON rag_simhash_bands(chunk_id)")
         self._migrate()
-        self.memory._conn.commit()
 
     def _migrate(self) -> None:
-        cur = self.memory._conn.cursor()
-        cur.execute("PRAGMA table_info(rag_chunks)")
-        cols = {row[1] for row in cur.fetchall()}
-        if "source_path" not in cols:
-            cur.execute("ALTER TABLE rag_chunks ADD COLUMN source_path TEXT")
-        if "chunk_index" not in cols:
-            cur.execute("ALTER TABLE rag_chunks ADD COLUMN chunk_index INTEGER")
-        if "chunk_start" not in cols:
-            cur.execute("ALTER TABLE rag_chunks ADD COLUMN chunk_start INTEGER")
-        if "chunk_end" not in cols:
-            cur.execute("ALTER TABLE rag_chunks ADD COLUMN chunk_end INTEGER")
-        if "metadata" not in cols:
-            cur.execute("ALTER TABLE rag_chunks ADD COLUMN metadata TEXT")
-        if "source_rank" not in cols:
-            cur.execute("ALTER TABLE rag_chunks ADD COLUMN source_rank REAL DEFAULT 1.0")
-        if "created_at" not in cols:
-            cur.execute("ALTER TABLE rag_chunks ADD COLUMN created_at TEXT")
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute("PRAGMA table_info(rag_chunks)")
+            cols = {row[1] for row in cur.fetchall()}
+            if "source_path" not in cols:
+                cur.execute("ALTER TABLE rag_chunks ADD COLUMN source_path TEXT")
+            if "chunk_index" not in cols:
+                cur.execute("ALTER TABLE rag_chunks ADD COLUMN chunk_index INTEGER")
+            if "chunk_start" not in cols:
+                cur.execute("ALTER TABLE rag_chunks ADD COLUMN chunk_start INTEGER")
+            if "chunk_end" not in cols:
+                cur.execute("ALTER TABLE rag_chunks ADD COLUMN chunk_end INTEGER")
+            if "metadata" not in cols:
+                cur.execute("ALTER TABLE rag_chunks ADD COLUMN metadata TEXT")
+            if "source_rank" not in cols:
+                cur.execute("ALTER TABLE rag_chunks ADD COLUMN source_rank REAL DEFAULT 1.0")
+            if "created_at" not in cols:
+                cur.execute("ALTER TABLE rag_chunks ADD COLUMN created_at TEXT")
+            if "chunk_hash" not in cols:
+                cur.execute("ALTER TABLE rag_chunks ADD COLUMN chunk_hash TEXT")
+            if "simhash" not in cols:
+                cur.execute("ALTER TABLE rag_chunks ADD COLUMN simhash INTEGER")
+            cur.execute("PRAGMA table_info(rag_files)")
+            if "chunker" not in {row[1] for row in cur.fetchall()}:
+                cur.execute("ALTER TABLE rag_files ADD COLUMN chunker TEXT")
+            # 4 x 16-bit simhash bands: chunks within 3 bits of each other share at least one.
+            bands = ", ".join(
+                f"({i * 65536} + ((new.simhash >> {i * 16}) & 65535), new.id)" for i in range(4)
+            )
+            cur.execute(
+                "CREATE TRIGGER IF NOT EXISTS rag_chunks_bands_ai AFTER INSERT ON rag_chunks "
+                f"WHEN new.simhash IS NOT NULL BEGIN INSERT INTO rag_simhash_bands (band, chunk_id) VALUES {bands}; END"
+            )
+            cur.execute(
+                "CREATE TRIGGER IF NOT EXISTS rag_chunks_bands_ad AFTER DELETE ON rag_chunks "
+                "BEGIN DELETE FROM rag_simhash_bands WHERE chunk_id = old.id; END"
+            )
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_rag_source_path ON rag_chunks(source_path)")
+            migrate_embeddings(conn, "rag_chunks")
+            self._fts = ensure_fts(conn, "rag_chunks", "rag_fts", "text")
 
     def _current_source_rank(self, source: str) -> float:
-        cur = self.memory._conn.cursor()
-        cur.execute("SELECT AVG(source_rank) FROM rag_chunks WHERE source = ?", (source,))
-        row = cur.fetchone()
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT AVG(source_rank) FROM rag_chunks WHERE source = ?", (source,))
+            row = cur.fetchone()
         if not row or row[0] is None:
             return 1.0
         try:
@@ -97,98 +278,443 @@ class RagStore:
         metadata: dict | None = None,
         source_rank: float | None = None,
     ) -> int:
-        emb = _embed_text(text, self.memory.embedding_dim)
+        emb = embed_sparse(text, self.memory.embedding_dim)
         if source_rank is None:
             source_rank = self._current_source_rank(source)
-        created_at = None
-        try:
-            import datetime as _dt
-            created_at = _dt.datetime.utcnow().isoformat()
-        except Exception:
-            created_at = None
-        cur = self.memory._conn.cursor()
-        cur.execute(
-            """
-            INSERT INTO rag_chunks (
-                source, text, embedding, source_path, chunk_index, chunk_start, chunk_end,
-                metadata, source_rank, created_at
+        created_at = _dt.datetime.utcnow().isoformat()
+        fingerprint = simhash(text)
+        if fingerprint is not None:
+            fingerprint = to_signed64(fingerprint)
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                INSERT INTO rag_chunks (
+                    source, text, embedding, source_path, chunk_index, chunk_start, chunk_end,
+                    metadata, source_rank, created_at, simhash
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    source,
+                    text,
+                    encode_sparse(emb, self.memory.embedding_dim),
+                    source_path,
+                    chunk_index,
+                    chunk_start,
+                    chunk_end,
+                    json.dumps(metadata or {}),
+                    source_rank,
+                    created_at,
+                    fingerprint,
+                ),
             )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                source,
-                text,
-                json.dumps(emb),
-                source_path,
-                chunk_index,
-                chunk_start,
-                chunk_end,
-                json.dumps(metadata or {}),
-                source_rank,
-                created_at,
-            ),
-        )
-        self.memory._conn.commit()
+        self._invalidate()
         return cur.lastrowid
 
     def index_file(self, path: str) -> int:
-        text = ""
-        ext = os.path.splitext(path)[1].lower()
-        if ext == ".pdf":
-            text = _read_pdf_text(path)
-            if not text:
+        """Index `path` incrementally; returns the number of chunks now held for the file."""
+        return self.sync_file(path)["chunks"]
+
+    def sync_file(self, path: str, force: bool = False) -> Dict:
+        """Bring the chunks for one file in line with its current content.
+
+        Files whose size and mtime match the manifest are skipped without being
+        read; otherwise only chunks whose hash changed are re-embedded and
+        chunks that no longer exist are deleted.
+        """
+        given = path
+        path = os.path.abspath(path)
+        manifest, hashes = self._file_state(path)
+        prepared = _prepare_file(
+            path, self.memory.embedding_dim, self._known(manifest), hashes, force, self.chunking
+        )
+        with self.db.write() as conn:
+            result = self._apply(conn, prepared, manifest, legacy_paths=[given])
+        if result["chunks_added"] or result["chunks_deduped"] or result["chunks_removed"]:
+            self._invalidate()
+        return result
+
+    def ingest_paths(
+        self,
+        paths: Iterable[str],
+        workers: Optional[int] = None,
+        on_progress: Optional[Callable[[Dict], None]] = None,
+    ) -> Dict:
+        """Index many files through a bounded worker pool feeding one batched writer.
+
+        Extraction, constitution checks and embedding run in `workers` processes
+        (default `ingest_workers`, 0 = CPU count, 1 = in-process); at most twice
+        that many files are in flight, and prepared chunks are committed in
+        transactions of about `ingest_batch_rows` rows.
+        """
+        started = time.time()
+        report = {
+            "added": 0,
+            "updated": 0,
+            "unchanged": 0,
+            "removed": 0,
+            "skipped": 0,
+            "chunks_added": 0,
+            "chunks_deduped": 0,
+            "chunks_removed": 0,
+        }
+        batch: List[Tuple[Dict, Optional[Dict]]] = []
+        batch_rows = 0
+        for path, manifest, prepared in self._prepared_stream(paths, workers):
+            if isinstance(prepared, Exception):
+                report["skipped"] += 1
+                if on_progress:
+                    on_progress({"path": path, "status": "skipped", "error": str(prepared)})
+                continue
+            batch.append((prepared, manifest))
+            batch_rows += len(prepared.get("chunks") or ()) or 1
+            if batch_rows >= self.ingest_batch_rows:
+                self._write_batch(batch, report, on_progress)
+                batch = []
+                batch_rows = 0
+        self._write_batch(batch, report, on_progress)
+        elapsed = max(time.time() - started, 1e-6)
+        files = sum(report[k] for k in ("added", "updated", "unchanged", "skipped"))
+        report["seconds"] = elapsed
+        report["files_per_sec"] = files / elapsed
+        report["chunks_per_sec"] = report["chunks_added"] / elapsed
+        return report
+
+    def _prepared_stream(self, paths: Iterable[str], workers: Optional[int]) -> Iterator[Tuple[str, Optional[Dict], object]]:
+        dims = self.memory.embedding_dim
+        if workers is None:
+            workers = self.ingest_workers
+        if workers <= 0:
+            workers = os.cpu_count() or 1
+        paths = [os.path.abspath(p) for p in paths]
+        executor = None
+        if workers > 1 and len(paths) > 1:
+            try:
+                # spawn: forking a process that already runs UI and network threads is unsafe
+                executor = ProcessPoolExecutor(
+                    max_workers=min(workers, len(paths)),
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            except Exception:
+                executor = None
+        if executor is None:
+            for path in paths:
+                manifest, hashes = self._file_state(path)
                 try:
-                    from multimodal import ocr_pdf
-                    text = ocr_pdf(path, pages=2)
-                except Exception:
-                    text = ""
-        else:
-            with open(path, "r", encoding="utf-8", errors="ignore") as handle:
-                text = handle.read()
-        if not text:
-            raise RuntimeError("No text extracted for indexing.")
-        issues = check_text(text)
-        if issues:
-            raise RuntimeError("Data constitution blocked indexing: " + "; ".join(issues))
+                    prepared = _prepare_file(path, dims, self._known(manifest), hashes, False, self.chunking)
+                except Exception as exc:
+                    prepared = exc
+                yield path, manifest, prepared
+            return
+        max_inflight = workers * 2
+        pending = {}
+        remaining = iter(paths)
         try:
-            stat = os.stat(path)
-            metadata = {
-                "path": path,
-                "size": stat.st_size,
-                "mtime": stat.st_mtime,
-                "ext": ext,
+            while True:
+                # Backpressure: only submit more files once earlier ones come back.
+                while len(pending) < max_inflight:
+                    path = next(remaining, None)
+                    if path is None:
+                        break
+                    manifest, hashes = self._file_state(path)
+                    future = executor.submit(
+                        _prepare_file, path, dims, self._known(manifest), hashes, False, self.chunking
+                    )
+                    pending[future] = (path, manifest)
+                if not pending:
+                    break
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, manifest = pending.pop(future)
+                    try:
+                        prepared = future.result()
+                    except Exception as exc:
+                        prepared = exc
+                    yield path, manifest, prepared
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _write_batch(
+        self,
+        batch: List[Tuple[Dict, Optional[Dict]]],
+        report: Dict,
+        on_progress: Optional[Callable[[Dict], None]] = None,
+    ) -> None:
+        if not batch:
+            return
+        if any(prepared["status"] != "unchanged" for prepared, _ in batch):
+            with self.db.write() as conn:
+                results = [self._apply(conn, prepared, manifest) for prepared, manifest in batch]
+        else:
+            results = [self._apply(None, prepared, manifest) for prepared, manifest in batch]
+        if any(result["chunks_added"] or result["chunks_deduped"] or result["chunks_removed"] for result in results):
+            self._invalidate()
+        for result in results:
+            report[result["status"]] += 1
+            report["chunks_added"] += result["chunks_added"]
+            report["chunks_deduped"] += result["chunks_deduped"]
+            report["chunks_removed"] += result["chunks_removed"]
+            if on_progress:
+                on_progress(result)
+
+    def _file_state(self, path: str) -> Tuple[Optional[Dict], List[str]]:
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT size, mtime, content_hash, chunks, chunker FROM rag_files WHERE path = ?", (path,))
+            row = cur.fetchone()
+            if not row:
+                return None, []
+            cur.execute(
+                "SELECT chunk_hash FROM rag_chunks WHERE source_path = ? AND chunk_hash IS NOT NULL "
+                "UNION SELECT chunk_hash FROM rag_chunk_refs WHERE source_path = ? AND chunk_hash IS NOT NULL",
+                (path, path),
+            )
+            hashes = [r[0] for r in cur.fetchall()]
+        manifest = {
+            "size": row[0],
+            "mtime": row[1],
+            "content_hash": row[2],
+            "chunks": int(row[3] or 0),
+            "chunker": row[4] or _chunker_key({"strategy": "fixed", "size": 1000}),
+        }
+        return manifest, hashes
+
+    @staticmethod
+    def _known(manifest: Optional[Dict]) -> Optional[Tuple[int, float, str, str]]:
+        if not manifest:
+            return None
+        return manifest["size"], manifest["mtime"], manifest["content_hash"], manifest["chunker"]
+
+    def _apply(self, conn, prepared: Dict, manifest: Optional[Dict], legacy_paths: Optional[List[str]] = None) -> Dict:
+        """Write one prepared file on the writer connection `conn` (inside `db.write()`)."""
+        path = prepared["path"]
+        result = {
+            "path": path,
+            "status": "unchanged",
+            "chunks": manifest["chunks"] if manifest else 0,
+            "chunks_added": 0,
+            "chunks_deduped": 0,
+            "chunks_removed": 0,
+        }
+        if prepared["status"] == "unchanged":
+            return result
+        if prepared["status"] == "touched":
+            self._save_manifest(conn, prepared, result["chunks"])
+            return result
+        chunks = prepared["chunks"]
+        added, deduped, removed = self._replace_chunks(conn, path, chunks, prepared["metadata"], legacy_paths)
+        self._save_manifest(conn, prepared, len(chunks))
+        result.update(
+            {
+                "status": "updated" if manifest else "added",
+                "chunks": len(chunks),
+                "chunks_added": added,
+                "chunks_deduped": deduped,
+                "chunks_removed": removed,
             }
-        except Exception:
-            metadata = {"path": path, "ext": ext}
-        # chunking for provenance and retrieval quality
-        chunk_size = 1000
-        count = 0
-        for idx, i in enumerate(range(0, len(text), chunk_size)):
-            chunk = text[i : i + chunk_size]
-            if chunk.strip():
-                self.index_text(
-                    os.path.basename(path),
-                    chunk,
-                    source_path=path,
-                    chunk_index=idx,
-                    chunk_start=i,
-                    chunk_end=i + len(chunk),
-                    metadata=metadata,
+        )
+        return result
+
+    def _replace_chunks(
+        self,
+        conn,
+        path: str,
+        chunks: List[Tuple[int, int, int, str, str, Optional[bytes], Optional[int]]],
+        metadata: dict,
+        legacy_paths: Optional[List[str]] = None,
+    ) -> Tuple[int, int, int]:
+        """Reuse unchanged rows, store near-duplicates of other files' chunks as
+        `rag_chunk_refs`, insert the rest and delete what is left over."""
+        paths = list(dict.fromkeys([path] + list(legacy_paths or [])))
+        marks = ",".join("?" * len(paths))
+        cur = conn.cursor()
+        # References are cheap to recompute, so they are rebuilt on every change.
+        cur.execute(f"DELETE FROM rag_chunk_refs WHERE source_path IN ({marks})", paths)
+        cur.execute(f"SELECT id, chunk_hash FROM rag_chunks WHERE source_path IN ({marks})", paths)
+        existing: Dict[str, List[int]] = {}
+        for row_id, chunk_hash in cur.fetchall():
+            existing.setdefault(chunk_hash, []).append(row_id)
+        source = os.path.basename(path)
+        cur.execute("SELECT AVG(source_rank) FROM rag_chunks WHERE source = ?", (source,))
+        row = cur.fetchone()
+        source_rank = float(row[0]) if row and row[0] is not None else 1.0
+        created_at = _dt.datetime.utcnow().isoformat()
+        metadata_json = json.dumps(metadata)
+        dims = self.memory.embedding_dim
+        fresh = []
+        updates = []
+        for idx, start, end, chunk, chunk_hash, blob, fingerprint in chunks:
+            reuse = existing.get(chunk_hash)
+            if reuse:
+                updates.append((path, idx, start, end, metadata_json, reuse.pop()))
+            else:
+                fresh.append((idx, start, end, chunk, chunk_hash, blob, fingerprint))
+        stale = [row_id for ids in existing.values() for row_id in ids]
+        if updates:
+            cur.executemany(
+                "UPDATE rag_chunks SET source_path=?, chunk_index=?, chunk_start=?, chunk_end=?, metadata=? WHERE id=?",
+                updates,
+            )
+        self._delete_chunks(cur, stale)
+        inserts = []
+        refs = []
+        for idx, start, end, chunk, chunk_hash, blob, fingerprint in fresh:
+            target = self._near_duplicate(cur, fingerprint, paths)
+            if target is not None:
+                refs.append((target, source, path, idx, start, end, chunk_hash, metadata_json, created_at))
+                continue
+            if blob is None:
+                blob = encode_sparse(embed_sparse(chunk, dims), dims)
+            signed = to_signed64(fingerprint) if fingerprint is not None else None
+            cur.execute(
+                """
+                INSERT INTO rag_chunks (
+                    source, text, embedding, source_path, chunk_index, chunk_start, chunk_end,
+                    metadata, source_rank, created_at, chunk_hash, simhash
                 )
-                count += 1
-        return count
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (source, chunk, blob, path, idx, start, end, metadata_json, source_rank, created_at, chunk_hash, signed),
+            )
+            inserts.append(cur.lastrowid)
+        if refs:
+            cur.executemany(
+                "INSERT INTO rag_chunk_refs (chunk_id, source, source_path, chunk_index, chunk_start, chunk_end, "
+                "chunk_hash, metadata, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                refs,
+            )
+        return len(inserts), len(refs), len(stale)
 
-    def list_sources(self) -> List[dict]:
-        cur = self.memory._conn.cursor()
+    def _near_duplicate(self, cur, fingerprint: Optional[int], own_paths: List[str]) -> Optional[int]:
+        """Id of a stored chunk from another file within `dedup_distance` simhash bits, if any."""
+        if fingerprint is None or self.dedup_distance < 0:
+            return None
+        bands = simhash_bands(fingerprint)
         cur.execute(
-            """
-            SELECT source, COUNT(*), AVG(source_rank), MAX(created_at)
-            FROM rag_chunks
-            GROUP BY source
-            ORDER BY AVG(source_rank) DESC, COUNT(*) DESC
-            """
+            f"""
+            SELECT DISTINCT c.id, c.simhash, c.source_path
+            FROM rag_simhash_bands b JOIN rag_chunks c ON c.id = b.chunk_id
+            WHERE b.band IN ({",".join("?" * len(bands))})
+            """,
+            bands,
+        )
+        best = None
+        for chunk_id, other, source_path in cur.fetchall():
+            if other is None or source_path in own_paths:
+                continue
+            distance = hamming(fingerprint, from_signed64(other))
+            if distance <= self.dedup_distance and (best is None or distance < best[0]):
+                best = (distance, chunk_id)
+        return best[1] if best else None
+
+    def _delete_chunks(self, cur, ids: List[int]) -> None:
+        """Delete chunk rows; a row other files still reference is handed over to the first
+        referencing file as a regular chunk, and the remaining references re-pointed to it."""
+        for i in range(0, len(ids), 500):
+            batch = ids[i : i + 500]
+            marks = ",".join("?" * len(batch))
+            cur.execute(
+                f"SELECT id, chunk_id, source, source_path, chunk_index, chunk_start, chunk_end, chunk_hash, metadata "
+                f"FROM rag_chunk_refs WHERE chunk_id IN ({marks}) ORDER BY id",
+                batch,
+            )
+            promoted: Dict[int, int] = {}
+            for ref_id, chunk_id, source, source_path, idx, start, end, chunk_hash, metadata in cur.fetchall():
+                if chunk_id in promoted:
+                    cur.execute("UPDATE rag_chunk_refs SET chunk_id = ? WHERE id = ?", (promoted[chunk_id], ref_id))
+                    continue
+                cur.execute(
+                    """
+                    INSERT INTO rag_chunks (
+                        source, text, embedding, source_path, chunk_index, chunk_start, chunk_end,
+                        metadata, source_rank, created_at, chunk_hash, simhash
+                    )
+                    SELECT ?, text, embedding, ?, ?, ?, ?, ?, source_rank, created_at, ?, simhash
+                    FROM rag_chunks WHERE id = ?
+                    """,
+                    (source, source_path, idx, start, end, metadata, chunk_hash, chunk_id),
+                )
+                promoted[chunk_id] = cur.lastrowid
+                cur.execute("DELETE FROM rag_chunk_refs WHERE id = ?", (ref_id,))
+            cur.execute(f"DELETE FROM rag_chunks WHERE id IN ({marks})", batch)
+
+    @staticmethod
+    def _save_manifest(conn, prepared: Dict, chunks: int) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO rag_files (path, size, mtime, content_hash, chunks, indexed_at, chunker) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                prepared["path"],
+                prepared["size"],
+                prepared["mtime"],
+                prepared["content_hash"],
+                chunks,
+                _dt.datetime.utcnow().isoformat(),
+                prepared["chunker"],
+            ),
         )
-        rows = cur.fetchall()
+
+    def remove_file(self, path: str) -> int:
+        path = os.path.abspath(path)
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM rag_chunk_refs WHERE source_path = ?", (path,))
+            removed = cur.rowcount
+            cur.execute("SELECT id FROM rag_chunks WHERE source_path = ?", (path,))
+            ids = [row[0] for row in cur.fetchall()]
+            self._delete_chunks(cur, ids)
+            removed += len(ids)
+            cur.execute("DELETE FROM rag_files WHERE path = ?", (path,))
+        if removed:
+            self._invalidate()
+        return removed
+
+    def _invalidate(self) -> None:
+        if self.cache is not None:
+            self.cache.bump()
+
+    def reindex_dir(
+        self,
+        root: str,
+        on_progress: Optional[Callable[[Dict], None]] = None,
+        workers: Optional[int] = None,
+    ) -> Dict:
+        """Sync every file under `root` and drop chunks for files that disappeared."""
+        root = os.path.abspath(root)
+        started = time.time()
+        paths = [os.path.join(dirpath, name) for dirpath, _dirs, files in os.walk(root) for name in files]
+        report = self.ingest_paths(paths, workers=workers, on_progress=on_progress)
+        report["root"] = root
+        seen = set(paths)
+        prefix = root.rstrip(os.sep) + os.sep
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT path FROM rag_files")
+            known = [row[0] for row in cur.fetchall()]
+        for path in known:
+            if path.startswith(prefix) and path not in seen:
+                report["chunks_removed"] += self.remove_file(path)
+                report["removed"] += 1
+        elapsed = max(time.time() - started, 1e-6)
+        files = sum(report[k] for k in ("added", "updated", "unchanged", "skipped"))
+        report["seconds"] = elapsed
+        report["files_per_sec"] = files / elapsed
+        report["chunks_per_sec"] = report["chunks_added"] / elapsed
+        return report
+
+    def list_sources(self) -> List[dict]:
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                SELECT source, COUNT(*), AVG(source_rank), MAX(created_at)
+                FROM rag_chunks
+                GROUP BY source
+                ORDER BY AVG(source_rank) DESC, COUNT(*) DESC
+                """
+            )
+            rows = cur.fetchall()
         sources = []
         for source, count, avg_rank, last_seen in rows:
             sources.append(
@@ -202,79 +728,281 @@ class RagStore:
         return sources
 
     def set_source_rank(self, source: str, rank: float) -> int:
-        cur = self.memory._conn.cursor()
-        cur.execute("UPDATE rag_chunks SET source_rank = ? WHERE source = ?", (rank, source))
-        self.memory._conn.commit()
+        with self.db.write() as conn:
+            cur = conn.cursor()
+            cur.execute("UPDATE rag_chunks SET source_rank = ? WHERE source = ?", (rank, source))
+        self._invalidate()
         return cur.rowcount
 
     def stats(self) -> dict:
-        cur = self.memory._conn.cursor()
-        cur.execute("SELECT COUNT(*), COUNT(DISTINCT source) FROM rag_chunks")
-        total, sources = cur.fetchone()
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT COUNT(*), COUNT(DISTINCT source) FROM rag_chunks")
+            total, sources = cur.fetchone()
         return {"chunks": total or 0, "sources": sources or 0}
 
-    def search(self, query: str, limit: int = 5) -> List[dict]:
-        qvec = _embed_text(query, self.memory.embedding_dim)
-        cur = self.memory._conn.cursor()
-        cur.execute(
-            """
-            SELECT id, source, text, embedding, source_rank, source_path,
-                   chunk_index, chunk_start, chunk_end, metadata
-            FROM rag_chunks
-            """
-        )
-        rows = cur.fetchall()
+    def search(self, query: str, limit: int = 5, mode: str | None = None) -> List[dict]:
+        """Top chunks for `query`.
+
+        `vector` scores every chunk by hashed cosine, `bm25` ranks through the
+        FTS5 mirror, and `hybrid` takes the BM25 shortlist, rescores only those
+        chunks by cosine and fuses both rankings with reciprocal-rank fusion.
+        Without FTS5 every mode falls back to `vector`.
+        """
+        mode = mode or self.search_mode
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Invalid RAG search mode: {mode}")
+        return self._cached("rag", query, (limit, mode), lambda: self._search(query, limit, mode))
+
+    def _cached(self, kind: str, query: str, filters: tuple, compute: Callable[[], List[dict]]) -> List[dict]:
+        cache = self.cache
+        if cache is None:
+            return compute()
+        key = cache.key(kind, query, *filters)
+        hit, cached = cache.get(key)
+        if hit:
+            return cached
+        generation = cache.generation
+        results = compute()
+        cache.put(key, results, generation)
+        return results
+
+    def _search(self, query: str, limit: int, mode: str) -> List[dict]:
+        if mode != "vector" and not self._fts:
+            mode = "vector"
+        if mode == "bm25":
+            return self._search_bm25(query, limit)
+        if mode == "hybrid":
+            return self._search_hybrid(query, limit)
+        return self._search_vector(query, limit)
+
+    def _search_vector(self, query: str, limit: int) -> List[dict]:
+        qvec = embed_sparse(query, self.memory.embedding_dim)
+        qnorm = sparse_norm(qvec)
+        if not qnorm:
+            return []
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            cur.execute(f"SELECT {_CHUNK_COLUMNS} FROM rag_chunks")
+            rows = cur.fetchall()
         scored = []
-        for _id, source, text, emb_json, source_rank, source_path, chunk_index, chunk_start, chunk_end, metadata in rows:
+        for row in rows:
             try:
-                emb = json.loads(emb_json)
+                emb = decode_sparse(row[3], self.memory.embedding_dim)
             except Exception:
                 continue
-            score = _cosine(qvec, emb)
+            score = sparse_cosine(qvec, emb, norm_a=qnorm)
             if score <= 0:
                 continue
+            scored.append(self._result(row, score, score))
+        scored.sort(key=lambda x: x["weighted_score"], reverse=True)
+        return scored[:limit]
+
+    def _search_bm25(self, query: str, limit: int) -> List[dict]:
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            # over-fetch so source_rank weighting can still reorder the head
+            hits = bm25_search(cur, "rag_fts", query, max(limit * 4, 20))
+            rows = self._fetch_chunks(cur, [row_id for row_id, _ in hits])
+        scored = [self._result(rows[row_id], score, score) for row_id, score in hits if row_id in rows]
+        scored.sort(key=lambda x: x["weighted_score"], reverse=True)
+        return scored[:limit]
+
+    def _search_hybrid(self, query: str, limit: int) -> List[dict]:
+        qvec = embed_sparse(query, self.memory.embedding_dim)
+        qnorm = sparse_norm(qvec)
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            hits = bm25_search(cur, "rag_fts", query, max(self.shortlist_size, limit))
+            rows = self._fetch_chunks(cur, [row_id for row_id, _ in hits])
+        cosine = {}
+        for row_id, row in rows.items():
             try:
-                rank = float(source_rank) if source_rank is not None else 1.0
-            except Exception:
-                rank = 1.0
-            rank = max(0.0, min(rank, 2.0))
-            weight = 0.5 + 0.5 * rank
-            weighted = score * weight
-            try:
-                metadata_obj = json.loads(metadata) if metadata else {}
+                emb = decode_sparse(row[3], self.memory.embedding_dim)
             except Exception:
-                metadata_obj = {}
-            scored.append(
-                {
-                    "id": _id,
-                    "source": source,
-                    "text": text,
-                    "score": score,
-                    "weighted_score": weighted,
-                    "source_rank": rank,
-                    "source_path": source_path or "",
-                    "chunk_index": chunk_index,
-                    "chunk_start": chunk_start,
-                    "chunk_end": chunk_end,
-                    "metadata": metadata_obj,
-                }
+                continue
+            score = sparse_cosine(qvec, emb, norm_a=qnorm) if qnorm else 0.0
+            if score > 0:
+                cosine[row_id] = score
+        lexical = [row_id for row_id, _ in hits if row_id in rows]
+        semantic = sorted(cosine, key=cosine.get, reverse=True)
+        fused = rrf([lexical, semantic])
+        scored = []
+        for row_id in lexical:
+            item = self._result(rows[row_id], cosine.get(row_id, 0.0), fused[row_id])
+            item["fused_score"] = fused[row_id]
+            scored.append(item)
+        scored.sort(key=lambda x: x["weighted_score"], reverse=True)
+        return scored[:limit]
+
+    @staticmethod
+    def _fetch_chunks(cur, ids: List[int]) -> Dict[int, tuple]:
+        rows: Dict[int, tuple] = {}
+        for i in range(0, len(ids), 500):
+            batch = ids[i : i + 500]
+            cur.execute(
+                f"SELECT {_CHUNK_COLUMNS} FROM rag_chunks WHERE id IN ({','.join('?' * len(batch))})",
+                batch,
             )
+            for row in cur.fetchall():
+                rows[row[0]] = row
+        return rows
+
+    @staticmethod
+    def _result(row: tuple, score: float, base: float) -> dict:
+        _id, source, text, _emb, source_rank, source_path, chunk_index, chunk_start, chunk_end, metadata = row
+        try:
+            rank = float(source_rank) if source_rank is not None else 1.0
+        except Exception:
+            rank = 1.0
+        rank = max(0.0, min(rank, 2.0))
+        weight = 0.5 + 0.5 * rank
+        try:
+            metadata_obj = json.loads(metadata) if metadata else {}
+        except Exception:
+            metadata_obj = {}
+        return {
+            "id": _id,
+            "source": source,
+            "text": text,
+            "score": score,
+            "weighted_score": base * weight,
+            "source_rank": rank,
+            "source_path": source_path or "",
+            "chunk_index": chunk_index,
+            "chunk_start": chunk_start,
+            "chunk_end": chunk_end,
+            "metadata": metadata_obj,
+        }
+
+    def hybrid_search(
+        self,
+        query: str,
+        graph_store,
+        limit: int = 5,
+        max_terms: int = 32,
+        expand_depth: int = 1,
+    ) -> List[dict]:
+        """Search with the query plus a graph-expanded query in a single pass.
+
+        The expansion adds entities named in the query and everything within
+        `expand_depth` hops of them (`graph_store.k_hop`). Candidates are
+        fetched and decoded once, both query vectors are scored together, and
+        the cosine (and BM25, when the lexical index is in use) rankings are
+        merged with reciprocal-rank fusion.
+        """
+        return self._cached(
+            "rag_hybrid",
+            query,
+            (limit, max_terms, expand_depth, self.search_mode),
+            lambda: self._hybrid_search(query, graph_store, limit, max_terms, expand_depth),
+        )
+
+    def _hybrid_search(
+        self,
+        query: str,
+        graph_store,
+        limit: int,
+        max_terms: int,
+        expand_depth: int,
+    ) -> List[dict]:
+        terms = self._graph_terms(query, graph_store, max_terms, expand_depth)
+        queries = [query]
+        if terms:
+            queries.append(query + " " + " ".join(terms))
+        return self._fused_search(queries, limit)
+
+    def search_many(self, queries: List[str], limit: int = 5) -> List[dict]:
+        """Top chunks for several related queries at once, fused into one ranking.
+
+        Candidates are fetched and decoded once (the union of the per-query BM25
+        shortlists, or the whole corpus in `vector` mode), every query vector
+        is scored against them in one batch, and the per-query rankings are
+        merged with reciprocal-rank fusion.
+        """
+        queries = list(dict.fromkeys(q.strip() for q in queries if q and q.strip()))
+        if not queries:
+            return []
+        return self._cached(
+            "rag_many",
+            "\n".join(queries),
+            (limit, self.search_mode),
+            lambda: self._fused_search(queries, limit),
+        )
+
+    def _fused_search(self, queries: List[str], limit: int) -> List[dict]:
+        rows, rankings = self._hybrid_candidates(queries)
+        if not rows:
+            return []
+        scores = self._score_batch(rows, queries)
+        for column in scores:
+            order = sorted((i for i, score in enumerate(column) if score > 0), key=lambda i: column[i], reverse=True)
+            rankings.append([rows[i][0] for i in order])
+        fused = rrf(rankings)
+        scored = []
+        for i, row in enumerate(rows):
+            if row[0] not in fused:
+                continue
+            item = self._result(row, max(column[i] for column in scores), fused[row[0]])
+            item["fused_score"] = fused[row[0]]
+            scored.append(item)
         scored.sort(key=lambda x: x["weighted_score"], reverse=True)
         return scored[:limit]
 
-    def hybrid_search(self, query: str, graph_store, limit: int = 5) -> List[dict]:
-        results = self.search(query, limit=limit)
+    @staticmethod
+    def _graph_terms(query: str, graph_store, max_terms: int, depth: int) -> List[str]:
         try:
             entities = graph_store.find_entities(query)
         except Exception:
-            entities = []
-        if not entities:
-            return results
-        expanded_query = query + " " + " ".join(entities)
-        graph_results = self.search(expanded_query, limit=limit)
-        merged = {r["id"]: r for r in results}
-        for item in graph_results:
-            merged.setdefault(item["id"], item)
-        merged_list = list(merged.values())
-        merged_list.sort(key=lambda x: x["weighted_score"], reverse=True)
-        return merged_list[:limit]
+            return []
+        terms = list(entities)
+        for name in entities:
+            try:
+                terms.extend(item["name"] for item in graph_store.k_hop(name, depth=depth, limit=max_terms))
+            except Exception:
+                continue
+        return list(dict.fromkeys(terms))[:max_terms]
+
+    def _hybrid_candidates(self, queries: List[str]) -> Tuple[List[tuple], List[List[int]]]:
+        with self.db.read() as conn:
+            cur = conn.cursor()
+            if not self._fts or self.search_mode == "vector":
+                cur.execute(f"SELECT {_CHUNK_COLUMNS} FROM rag_chunks")
+                return cur.fetchall(), []
+            rankings = [
+                [row_id for row_id, _ in bm25_search(cur, "rag_fts", q, self.shortlist_size)] for q in queries
+            ]
+            ids = list(dict.fromkeys(row_id for ranking in rankings for row_id in ranking))
+            rows = self._fetch_chunks(cur, ids)
+        return list(rows.values()), rankings
+
+    def _score_batch(self, rows: List[tuple], queries: List[str]) -> List[List[float]]:
+        """Cosine of every row against every query; each embedding is decoded once."""
+        dims = self.memory.embedding_dim
+        qvecs = [embed_sparse(q, dims) for q in queries]
+        embs = []
+        for row in rows:
+            try:
+                embs.append(decode_sparse(row[3], dims))
+            except Exception:
+                embs.append({})
+        if np is not None:
+            matrix = np.zeros((len(rows), dims), dtype=np.float32)
+            for i, emb in enumerate(embs):
+                if emb:
+                    matrix[i, list(emb.keys())] = list(emb.values())
+            qmatrix = np.zeros((len(qvecs), dims), dtype=np.float32)
+            for j, qvec in enumerate(qvecs):
+                if qvec:
+                    qmatrix[j, list(qvec.keys())] = list(qvec.values())
+            norms = np.linalg.norm(matrix, axis=1)
+            qnorms = np.linalg.norm(qmatrix, axis=1)
+            denom = np.outer(qnorms, norms)
+            denom[denom == 0] = 1.0
+            return ((qmatrix @ matrix.T) / denom).tolist()
+        qnorms = [sparse_norm(qvec) for qvec in qvecs]
+        norms = [sparse_norm(emb) for emb in embs]
+        return [
+            [sparse_cosine(qvec, emb, qnorm, norm) for emb, norm in zip(embs, norms)]
+            for qvec, qnorm in zip(qvecs, qnorms)
+        ]
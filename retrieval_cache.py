@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class RetrievalCache:
+    """LRU + TTL cache for retrieval results, invalidated by a generation counter.
+
+    Stores share one cache and call `bump()` after any write that can change a
+    result; entries recorded under an older generation are treated as misses.
+    Hits and misses are counted on the cache and, when given, on `metrics` as
+    `retrieval_cache.hits` / `retrieval_cache.misses`.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 300.0, metrics=None) -> None:
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.metrics = metrics
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[int, float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(kind: str, query: str, *filters: Hashable) -> Tuple:
+        return (kind, normalize_query(query)) + tuple(filters)
+
+    def bump(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == self.generation and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                hit, value = True, entry[2]
+            else:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                hit, value = False, None
+        if self.metrics is not None:
+            self.metrics.inc("retrieval_cache.hits" if hit else "retrieval_cache.misses")
+        # callers may mutate what they get back
+        return hit, copy.deepcopy(value) if hit else None
+
+    def put(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        """Store `value`; pass the generation read before computing it so a write that
+        raced with the computation leaves the entry stale instead of caching old data."""
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (self.generation, time.monotonic() + self.ttl_seconds, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "generation": self.generation,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
 import os
-from memory import _embed_text, _cosine
+from functools import lru_cache
+from typing import Dict, Tuple
+
+from embeddings import SparseVector, embed_sparse, sparse_cosine, sparse_norm
 
 
 _LABELS = {
@@ -11,12 +14,22 @@ _LABELS = {
 }
 
 
+@lru_cache(maxsize=8)
+def _label_vectors(dims: int) -> Dict[str, Tuple[SparseVector, float]]:
+    vectors = {}
+    for name, seed in _LABELS.items():
+        vec = embed_sparse(seed, dims)
+        vectors[name] = (vec, sparse_norm(vec))
+    return vectors
+
+
 def choose_model(instruction: str) -> str:
     dims = int(os.getenv("AGENTIC_EMBEDDING_DIM", "256"))
-    qvec = _embed_text(instruction, dims)
+    qvec = embed_sparse(instruction, dims)
+    qnorm = sparse_norm(qvec)
     best = ("default", 0.0)
-    for name, seed in _LABELS.items():
-        score = _cosine(qvec, _embed_text(seed, dims))
+    for name, (seed_vec, seed_norm) in _label_vectors(dims).items():
+        score = sparse_cosine(qvec, seed_vec, norm_a=qnorm, norm_b=seed_norm)
         if score > best[1]:
             best = (name, score)
     if best[1] < 0.05:
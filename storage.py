@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+
+class Database:
+    """SQLite access layer: one serialized writer plus a pool of reader connections.
+
+    The file is opened in WAL mode so readers never block on the writer. All
+    writes go through `write()`, which holds a process-wide lock around the single
+    writer connection and commits (or rolls back) on exit. `read()` hands out a
+    pooled reader connection; nested `read()` calls on the same thread reuse it.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        pool_size: int = 4,
+        synchronous: str = "NORMAL",
+        cache_size_kb: int = 65536,
+        mmap_size_mb: int = 256,
+        busy_timeout_ms: int = 30000,
+    ) -> None:
+        self.path = path
+        self.synchronous = synchronous
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size_mb = mmap_size_mb
+        self.busy_timeout_ms = busy_timeout_ms
+        self.write_lock = threading.RLock()
+        self.writer = self._connect()
+        try:
+            self.writer.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.DatabaseError:
+            pass
+        self._pool_size = max(1, pool_size)
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._created = 0
+        self._pool_lock = threading.Lock()
+        self._local = threading.local()
+        self._shared = False
+
+    @classmethod
+    def from_connection(cls, conn: sqlite3.Connection) -> "Database":
+        """Wrap an existing connection (e.g. ``:memory:``); reads and writes share it under the lock."""
+        db = cls.__new__(cls)
+        db.path = ""
+        db.write_lock = threading.RLock()
+        db.writer = conn
+        db._pool_size = 0
+        db._pool = queue.LifoQueue()
+        db._created = 0
+        db._pool_lock = threading.Lock()
+        db._local = threading.local()
+        db._shared = True
+        return db
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=self.busy_timeout_ms / 1000.0)
+        for pragma in (
+            f"PRAGMA synchronous={self.synchronous}",
+            f"PRAGMA cache_size=-{int(self.cache_size_kb)}",
+            f"PRAGMA mmap_size={int(self.mmap_size_mb) * 1024 * 1024}",
+            "PRAGMA temp_store=MEMORY",
+            f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}",
+        ):
+            try:
+                conn.execute(pragma)
+            except sqlite3.DatabaseError:
+                continue
+        return conn
+
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        with self.write_lock:
+            try:
+                yield self.writer
+            except BaseException:
+                self.writer.rollback()
+                raise
+            else:
+                self.writer.commit()
+
+    @contextmanager
+    def read(self) -> Iterator[sqlite3.Connection]:
+        if self._shared:
+            with self.write_lock:
+                yield self.writer
+            return
+        held: Optional[sqlite3.Connection] = getattr(self._local, "conn", None)
+        if held is not None:
+            yield held
+            return
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            if conn.in_transaction:
+                conn.rollback()
+            self._pool.put(conn)
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        with self._pool_lock:
+            if self._created < self._pool_size:
+                self._created += 1
+                return self._connect()
+        return self._pool.get()
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+        with self.write_lock:
+            self.writer.close()
+
+
+def as_database(target) -> Database:
+    if isinstance(target, Database):
+        return target
+    db = getattr(target, "db", None)
+    if isinstance(db, Database):
+        return db
+    conn = target if isinstance(target, sqlite3.Connection) else getattr(target, "_conn")
+    return Database.from_connection(conn)
@@ -1,35 +1,180 @@
 ﻿from __future__ import annotations
 
-import queue
+import logging
 import threading
-from typing import Callable
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+# Highest priority first: a free worker always takes the oldest task of the first lane
+# that has one waiting and is below its concurrency limit.
+LANES = ("interactive", "scheduled", "background")
+DEFAULT_LANE_LIMITS: Dict[str, int] = {"interactive": 1, "scheduled": 1, "background": 1}
+
+
+def parse_lane_limits(spec: str) -> Dict[str, int]:
+    """Parse `"interactive=2,background=1"` on top of the defaults; unknown lanes are ignored."""
+    limits = dict(DEFAULT_LANE_LIMITS)
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        name, value = item.split("=", 1)
+        name = name.strip()
+        if name not in LANES:
+            continue
+        try:
+            limits[name] = max(1, int(value))
+        except ValueError:
+            continue
+    return limits
 
 
 class TaskQueue:
-    def __init__(self, max_size: int = 100) -> None:
-        self._queue = queue.Queue(maxsize=max_size)
-        self._worker = threading.Thread(target=self._run, daemon=True)
-        self._worker.start()
+    """Bounded task scheduler with `workers` threads and priority lanes.
 
-    def enqueue(self, fn: Callable[[], None]) -> None:
-        self._queue.put(fn)
+    `enqueue` returns a `concurrent.futures.Future`; `future.cancel()` drops a task
+    that has not started yet. Each lane runs at most `lane_limits[lane]` tasks at
+    once, so a long interactive run never stops scheduled or background work from
+    using the remaining workers. Queue depth, wait time and outcomes are reported
+    through `stats()` and, when given, `metrics` (`task_queue.<lane>.*`).
+    """
 
-    def enqueue_and_wait(self, fn: Callable[[], None]) -> None:
-        done = threading.Event()
+    def __init__(
+        self,
+        max_size: int = 100,
+        workers: int = 1,
+        lane_limits: Optional[Dict[str, int]] = None,
+        metrics=None,
+    ) -> None:
+        self.max_size = max(1, max_size)
+        self.lane_limits = dict(DEFAULT_LANE_LIMITS)
+        self.lane_limits.update(lane_limits or {})
+        self.metrics = metrics
+        self._lanes: Dict[str, Deque[Tuple[Future, Callable[[], Any], float]]] = {lane: deque() for lane in LANES}
+        self._running: Dict[str, int] = {lane: 0 for lane in LANES}
+        self._stats: Dict[str, Dict[str, float]] = {
+            lane: {"completed": 0, "failed": 0, "cancelled": 0, "wait_total": 0.0, "wait_max": 0.0} for lane in LANES
+        }
+        self._cond = threading.Condition()
+        self._closed = False
+        self._workers = [
+            threading.Thread(target=self._run, name=f"task-queue-{i}", daemon=True) for i in range(max(1, workers))
+        ]
+        for worker in self._workers:
+            worker.start()
 
-        def wrapped():
-            try:
-                fn()
-            finally:
-                done.set()
+    def _pending(self) -> int:
+        return sum(len(tasks) for tasks in self._lanes.values())
+
+    def enqueue(self, fn: Callable[[], Any], lane: str = "interactive") -> Future:
+        """Queue `fn` on `lane`, blocking while the queue is full."""
+        if lane not in self._lanes:
+            raise ValueError(f"Unknown task lane: {lane}")
+        future: Future = Future()
+        with self._cond:
+            while not self._closed and self._pending() >= self.max_size:
+                self._cond.wait()
+            if self._closed:
+                raise RuntimeError("TaskQueue is shut down")
+            self._lanes[lane].append((future, fn, time.monotonic()))
+            self._cond.notify_all()
+        self._inc(f"task_queue.{lane}.enqueued")
+        return future
 
-        self._queue.put(wrapped)
-        done.wait()
+    def enqueue_and_wait(self, fn: Callable[[], Any], lane: str = "interactive", timeout: float | None = None) -> Any:
+        """Queue `fn` and block until it finished; returns its result or re-raises its exception."""
+        return self.enqueue(fn, lane=lane).result(timeout)
+
+    def _next(self) -> Optional[Tuple[str, Future, Callable[[], Any], float]]:
+        with self._cond:
+            while True:
+                for lane in LANES:
+                    tasks = self._lanes[lane]
+                    while tasks and self._running[lane] < self.lane_limits.get(lane, 1):
+                        future, fn, queued_at = tasks.popleft()
+                        self._cond.notify_all()
+                        if not future.set_running_or_notify_cancel():
+                            self._stats[lane]["cancelled"] += 1
+                            self._inc(f"task_queue.{lane}.cancelled")
+                            continue
+                        self._running[lane] += 1
+                        return lane, future, fn, queued_at
+                if self._closed and not self._pending():
+                    return None
+                self._cond.wait()
 
     def _run(self) -> None:
         while True:
-            fn = self._queue.get()
+            task = self._next()
+            if task is None:
+                return
+            lane, future, fn, queued_at = task
+            waited = time.monotonic() - queued_at
+            if self.metrics is not None:
+                self.metrics.set_timer(f"task_queue.{lane}.wait_seconds", waited)
+            outcome = "completed"
             try:
-                fn()
+                future.set_result(fn())
+            except BaseException as exc:
+                outcome = "failed"
+                logging.exception("Queued %s task failed", lane)
+                future.set_exception(exc)
             finally:
-                self._queue.task_done()
+                with self._cond:
+                    self._running[lane] -= 1
+                    stats = self._stats[lane]
+                    stats[outcome] += 1
+                    stats["wait_total"] += waited
+                    stats["wait_max"] = max(stats["wait_max"], waited)
+                    self._cond.notify_all()
+                self._inc(f"task_queue.{lane}.{outcome}")
+
+    def _inc(self, name: str) -> None:
+        if self.metrics is not None:
+            self.metrics.inc(name)
+
+    def depth(self, lane: str | None = None) -> int:
+        with self._cond:
+            if lane is None:
+                return self._pending()
+            return len(self._lanes[lane])
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._cond:
+            out = {}
+            for lane in LANES:
+                stats = self._stats[lane]
+                started = stats["completed"] + stats["failed"]
+                out[lane] = {
+                    "queued": len(self._lanes[lane]),
+                    "running": self._running[lane],
+                    "limit": self.lane_limits.get(lane, 1),
+                    "completed": stats["completed"],
+                    "failed": stats["failed"],
+                    "cancelled": stats["cancelled"],
+                    "avg_wait_seconds": stats["wait_total"] / started if started else 0.0,
+                    "max_wait_seconds": stats["wait_max"],
+                }
+            return out
+
+    def shutdown(self, wait: bool = True, timeout: float | None = None, cancel_pending: bool = False) -> bool:
+        """Stop accepting tasks and let the workers drain what is queued.
+
+        With `cancel_pending`, queued tasks are cancelled instead of run. Returns
+        False if `wait` was requested and workers were still busy after `timeout`.
+        """
+        with self._cond:
+            self._closed = True
+            if cancel_pending:
+                for tasks in self._lanes.values():
+                    for future, _, _ in tasks:
+                        future.cancel()
+            self._cond.notify_all()
+        if not wait:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for worker in self._workers:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            worker.join(remaining)
+        return not any(worker.is_alive() for worker in self._workers)
@@ -1,7 +1,12 @@
 ﻿from __future__ import annotations
 
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
-from typing import List
+from typing import List, Tuple
+
+from cost import estimate_tokens
 
 
 @dataclass
@@ -12,19 +17,99 @@ class AgentRole:
     allowed_tools: List[str] = field(default_factory=list)
 
 
+class RollingContext:
+    """Shared team context kept within a token budget.
+
+    The newest turns are kept verbatim. Older turns shrink to a one-line
+    summary, and the oldest are dropped once even the summaries no longer fit.
+    """
+
+    def __init__(self, max_tokens: int = 1500, summary_chars: int = 160):
+        self.max_tokens = max_tokens
+        self.summary_chars = summary_chars
+        self.entries: List[Tuple[str, str]] = []
+
+    def add(self, name: str, text: str) -> None:
+        self.entries.append((name, (text or "").strip()))
+
+    def last(self) -> str:
+        return self.entries[-1][1] if self.entries else ""
+
+    def render(self) -> str:
+        lines: List[str] = []
+        used = 0
+        verbatim = True
+        omitted = 0
+        for name, text in reversed(self.entries):
+            line = f"[{name}] {text}"
+            if verbatim and used + estimate_tokens(line) > self.max_tokens:
+                verbatim = False
+            if not verbatim:
+                short = " ".join(text.split())
+                if len(short) > self.summary_chars:
+                    short = short[: self.summary_chars].rstrip() + "..."
+                line = f"[{name}] (summary) {short}"
+                if used + estimate_tokens(line) > self.max_tokens:
+                    omitted += 1
+                    continue
+            lines.append(line)
+            used += estimate_tokens(line)
+        if omitted:
+            lines.append(f"({omitted} earlier turns omitted)")
+        return "\n".join(reversed(lines))
+
+    def __str__(self) -> str:
+        return self.render()
+
+
 class TeamOrchestrator:
-    def __init__(self, agent_chat, manager_llm=None, speaker_selector_llm=None):
+    def __init__(
+        self,
+        agent_chat,
+        manager_llm=None,
+        speaker_selector_llm=None,
+        context_tokens: int = 1500,
+        local_select_roles: int = 2,
+        selection_cache_size: int = 128,
+    ):
         self.agent_chat = agent_chat
         self.manager_llm = manager_llm or agent_chat
         self.speaker_selector_llm = speaker_selector_llm or agent_chat
+        self.context_tokens = context_tokens
+        # With this many roles left or fewer, pick locally instead of asking the LLM.
+        self.local_select_roles = local_select_roles
+        self.selection_cache_size = selection_cache_size
+        self._selections: "OrderedDict[Tuple[Tuple[str, ...], str], str]" = OrderedDict()
+        self._selections_lock = threading.Lock()
 
-    def select_next_speaker(self, roles: List[AgentRole], context: str) -> AgentRole:
-        names = ", ".join([r.name for r in roles])
-        prompt = (
-            "Pick the next speaker based on context. Respond with exactly one role name.\n"
-            f"Roles: {names}\nContext:\n{context}\n"
-        )
-        choice = (self.speaker_selector_llm(prompt) or "").strip()
+    def _select_locally(self, roles: List[AgentRole], last_output: str) -> AgentRole:
+        # A role the previous speaker handed off to by name goes next; otherwise keep declared order.
+        lowered = last_output.lower()
+        for r in roles:
+            if r.name.lower() in lowered:
+                return r
+        return roles[0]
+
+    def select_next_speaker(self, roles: List[AgentRole], context, last_output: str = "") -> AgentRole:
+        if len(roles) <= max(1, self.local_select_roles):
+            return self._select_locally(roles, last_output)
+        context = str(context)
+        key = (tuple(r.name for r in roles), context)
+        with self._selections_lock:
+            choice = self._selections.get(key)
+            if choice is not None:
+                self._selections.move_to_end(key)
+        if choice is None:
+            names = ", ".join([r.name for r in roles])
+            prompt = (
+                "Pick the next speaker based on context. Respond with exactly one role name.\n"
+                f"Roles: {names}\nContext:\n{context}\n"
+            )
+            choice = (self.speaker_selector_llm(prompt) or "").strip()
+            with self._selections_lock:
+                self._selections[key] = choice
+                while len(self._selections) > self.selection_cache_size:
+                    self._selections.popitem(last=False)
         for r in roles:
             if r.name.lower() == choice.lower():
                 return r
@@ -32,10 +117,10 @@ class TeamOrchestrator:
 
     def run(self, roles: List[AgentRole], task: str) -> str:
         outputs = []
-        context = ""
+        context = RollingContext(self.context_tokens)
         remaining = roles[:]
         while remaining:
-            role = self.select_next_speaker(remaining, context)
+            role = self.select_next_speaker(remaining, context, context.last())
             remaining = [r for r in remaining if r != role]
             sop_text = f"SOP: {role.sop}\n" if role.sop else ""
             tools_text = ""
@@ -51,7 +136,7 @@ class TeamOrchestrator:
             )
             out = self.agent_chat(prompt)
             outputs.append(f"## {role.name}\n{out}")
-            context += f"\n[{role.name}] {out}\n"
+            context.add(role.name, out)
 
             # Manager oversight (CrewAI-style)
             if self.manager_llm and role.name.lower() == "builder":
@@ -61,14 +146,14 @@ class TeamOrchestrator:
                 if review and review.strip().lower().startswith("fix:"):
                     fix_task = review.split(":", 1)[1].strip()
                     outputs.append(f"## Manager\n{review}")
-                    context += f"\n[Manager] {review}\n"
+                    context.add("Manager", review)
                     # Send fix to reviewer if present
                     for r in roles:
                         if r.name.lower() == "reviewer":
                             fix_prompt = f"Role: {r.name}\nInstructions: {r.instructions}\nTask: {fix_task}"
                             fix_out = self.agent_chat(fix_prompt)
                             outputs.append(f"## {r.name}\n{fix_out}")
-                            context += f"\n[{r.name}] {fix_out}\n"
+                            context.add(r.name, fix_out)
                             break
         return "\n\n".join(outputs)
 
@@ -83,9 +168,13 @@ class TwoAgentOrchestrator:
         exec_out = self.executor_chat(f"Executor: execute this plan.\nPlan:\n{plan}\nTask: {task}")
         review = self.planner_chat(f"Planner: verify success criteria and note issues.\nOutput:\n{exec_out}")
         return "\n\n".join(["## Planner Plan", plan or "", "## Executor", exec_out or "", "## Planner Review", review or ""])
+
+
 class ManagerWorkerOrchestrator:
-    def __init__(self, agent_chat):
+    def __init__(self, agent_chat, max_workers: int = 1):
         self.agent_chat = agent_chat
+        # Workers only see the manager plan, so they can run side by side when agent_chat is thread-safe.
+        self.max_workers = max(1, int(max_workers or 1))
 
     def run(self, manager: AgentRole, workers: List[AgentRole], task: str) -> str:
         outputs = []
@@ -97,7 +186,8 @@ class ManagerWorkerOrchestrator:
         )
         plan = self.agent_chat(manager_prompt)
         outputs.append(f"## {manager.name}\n{plan}")
-        for worker in workers:
+
+        def _work(worker: AgentRole) -> str:
             tools = ", ".join(worker.allowed_tools or [])
             sop_text = f"SOP: {worker.sop}\n" if worker.sop else ""
             worker_prompt = (
@@ -109,8 +199,14 @@ class ManagerWorkerOrchestrator:
                 f"Manager plan:\n{plan}\n"
                 f"Task: {task}"
             )
-            out = self.agent_chat(worker_prompt)
-            outputs.append(f"## {worker.name}\n{out}")
+            return f"## {worker.name}\n{self.agent_chat(worker_prompt)}"
+
+        fan_out = min(self.max_workers, len(workers))
+        if fan_out > 1:
+            with ThreadPoolExecutor(max_workers=fan_out, thread_name_prefix="team-worker") as pool:
+                outputs.extend(pool.map(_work, workers))
+        else:
+            outputs.extend(_work(worker) for worker in workers)
         review_prompt = (
             f"Role: {manager.name}\nInstructions: {manager.instructions}\n"
             "Review the worker outputs. Summarize issues or approve.\n"
@@ -1,5 +1,8 @@
 ﻿import os
+import json
 import tempfile
+import threading
+import time
 import shutil
 import unittest
 from types import SimpleNamespace
@@ -283,6 +286,94 @@ class AppCommandTests(unittest.TestCase):
             if "OLLAMA_MODEL" in os.environ:
                 del os.environ["OLLAMA_MODEL"]
 
+    def test_gateway_chat_replays_recent_history(self):
+        calls = []
+
+        class FakeGateway:
+            def chat(self, prompt, **kwargs):
+                calls.append(prompt)
+                return f"reply {len(calls)}"
+
+        self.app.engine = SimpleNamespace(llm=FakeGateway())
+        self.app.settings.llm_gateway = "true"
+        self.app.settings.max_chat_turns = 1
+        os.environ["OLLAMA_MODEL"] = "dummy-model"
+        try:
+            self.assertEqual(self.app._agent_chat_base("first"), "reply 1")
+            self.assertEqual(self.app._agent_chat_base("second"), "reply 2")
+            self.assertEqual(
+                calls[1],
+                [
+                    {"role": "user", "content": "first"},
+                    {"role": "assistant", "content": "reply 1"},
+                    {"role": "user", "content": "second"},
+                ],
+            )
+            self.app._agent_chat_base("third")
+            # max_chat_turns=1 keeps one user/assistant pair of history.
+            self.assertEqual([m["content"] for m in calls[2]], ["second", "reply 2", "third"])
+        finally:
+            del os.environ["OLLAMA_MODEL"]
+
+    def test_concurrent_task_runs_do_not_overlap(self):
+        active = []
+        seen = []
+        lock = threading.Lock()
+
+        def run_plan(plan):
+            with lock:
+                active.append(plan)
+                overlap = len(active) > 1
+            self.app._tool_calls_this_task += 1
+            time.sleep(0.05)
+            seen.append((plan, self.app.current_run.run_id, self.app._tool_calls_this_task, overlap))
+            with lock:
+                active.remove(plan)
+            return SimpleNamespace(status="succeeded")
+
+        self.app.stop_event = threading.Event()
+        self.app._start_proof_pack = lambda run: None
+        self.app._set_run_status = lambda run, status: setattr(run, "status", status)
+        self.app._run_plan_schema = run_plan
+        runs = [
+            app_mod.TaskRun(
+                run_id=f"run-{i}",
+                intent={"goal": "test", "source": "unit"},
+                plan_steps=[],
+                approved=True,
+                mode="advanced",
+                status="queued",
+                created_at="",
+                command="",
+                plan_schema=f"plan-{i}",
+            )
+            for i in range(2)
+        ]
+        threads = [threading.Thread(target=self.app._run_task_run, args=(run,)) for run in runs]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(sorted(seen), [("plan-0", "run-0", 1, False), ("plan-1", "run-1", 1, False)])
+        self.assertEqual([run.status for run in runs], ["complete", "complete"])
+
+    def test_llm_plan_with_unusable_depends_on_runs_in_order(self):
+        plan_json = json.dumps(
+            {
+                "goal": "two steps",
+                "steps": [
+                    {"step_id": 1, "tool": "agent", "args": {"text": "a"}},
+                    {"step_id": 2, "tool": "agent", "args": {"text": "b"}, "depends_on": ["step_1"]},
+                    {"step_id": 3, "tool": "agent", "args": {"text": "c"}, "depends_on": "1, 2"},
+                ],
+            }
+        )
+        self.app._tool_catalog = lambda: [{"name": "agent", "risk_level": "safe"}]
+        self.app._agent_chat = lambda prompt: plan_json
+        plan = self.app._plan_with_llm("do two things")
+        self.assertIsNotNone(plan)
+        self.assertEqual([step.depends_on for step in plan.steps], [None, None, [1, 2]])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,73 @@
+import os
+import unittest
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from chunking import chunk_text, from_signed64, hamming, simhash, simhash_bands, to_signed64
+from cost import estimate_tokens
+
+DOC = (
+    "# Intro\nAtlas ships weekly. It has two services.\n\n"
+    "The scheduler runs jobs. The runner executes them. Logs go to disk.\n\n"
+    "## Deploy\nDeploys happen on Fridays. Rollbacks are manual.\n"
+)
+
+
+class TestChunking(unittest.TestCase):
+    def assert_exact(self, text, chunks):
+        self.assertEqual([c[0] for c in chunks], list(range(len(chunks))))
+        for _, start, end, piece in chunks:
+            self.assertEqual(text[start:end], piece)
+
+    def test_fixed_matches_character_windows(self):
+        text = "x" * 2500
+        chunks = chunk_text(text, "fixed", size=1000)
+        self.assertEqual([(c[1], c[2]) for c in chunks], [(0, 1000), (1000, 2000), (2000, 2500)])
+
+    def test_paragraph_breaks_at_headings(self):
+        chunks = chunk_text(DOC, "paragraph", size=1000)
+        self.assert_exact(DOC, chunks)
+        self.assertEqual(len(chunks), 2)
+        self.assertTrue(chunks[0][3].startswith("# Intro"))
+        self.assertIn("Logs go to disk.", chunks[0][3])
+        self.assertTrue(chunks[1][3].startswith("## Deploy"))
+
+        small = chunk_text(DOC, "paragraph", size=60)
+        self.assert_exact(DOC, small)
+        self.assertTrue(all(len(c[3]) <= 60 for c in small))
+
+    def test_sliding_overlaps(self):
+        text = " ".join(f"word{i}" for i in range(200))
+        chunks = chunk_text(text, "sliding", size=100, overlap=30)
+        self.assert_exact(text, chunks)
+        for prev, cur in zip(chunks, chunks[1:]):
+            self.assertLess(cur[1], prev[2])
+        self.assertEqual(chunks[-1][2], len(text))
+
+    def test_tokens_respect_budget(self):
+        text = " ".join(f"Sentence number {i} is here." for i in range(40))
+        chunks = chunk_text(text, "tokens", max_tokens=30, overlap_tokens=8)
+        self.assert_exact(text, chunks)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(estimate_tokens(c[3]) <= 30 + 8 for c in chunks))
+        self.assertLess(chunks[1][1], chunks[0][2])
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            chunk_text("text", "semantic")
+
+    def test_simhash_near_duplicates(self):
+        base = "the scheduler runs nightly jobs and the runner executes them against the cluster"
+        near = simhash(base.replace("nightly", "hourly"))
+        far = simhash("completely unrelated prose about gardening tomatoes basil soil and watering cans")
+        self.assertIsNone(simhash("too short"))
+        self.assertLessEqual(hamming(simhash(base), near), 16)
+        self.assertGreater(hamming(simhash(base), far), hamming(simhash(base), near))
+        fp = simhash(base)
+        self.assertEqual(from_signed64(to_signed64(fp)), fp)
+        flipped = fp ^ 0b111
+        self.assertTrue(set(simhash_bands(fp)) & set(simhash_bands(flipped)))
+
+
+if __name__ == "__main__":
+    unittest.main()
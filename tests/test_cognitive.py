@@ -0,0 +1,126 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from cognitive import current_pass, dot_ensemble, similarity, slow_mode_stream
+from memory import MemoryStore
+
+
+class TestConcurrentEnsemble(unittest.TestCase):
+    def test_drafts_run_concurrently(self):
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def chat(prompt):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.1)
+            with lock:
+                active.pop()
+            if "evaluate the drafts" in prompt.lower():
+                return "Draft 3 is best"
+            return prompt.split(":")[0]  # distinct drafts, so no quorum
+
+        started = time.monotonic()
+        out = dot_ensemble(chat, "question", n=3, concurrent=True)
+        self.assertEqual(out, "Draft 3/3")
+        self.assertEqual(max(peak), 3)
+        # Three parallel drafts plus the critique, rather than four sequential calls.
+        self.assertLess(time.monotonic() - started, 0.35)
+
+    def test_quorum_returns_without_waiting_for_stragglers(self):
+        release = threading.Event()
+        calls = []
+
+        def chat(prompt):
+            calls.append(prompt)
+            if prompt.startswith("Draft 3"):
+                release.wait(2)
+                return "late"
+            return "the answer is 42"
+
+        started = time.monotonic()
+        out = dot_ensemble(chat, "question", n=3, concurrent=True)
+        release.set()
+        self.assertEqual(out, "the answer is 42")
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertFalse(any("evaluate the drafts" in c.lower() for c in calls))
+
+    def test_draft_timeout_and_failures_drop_drafts(self):
+        release = threading.Event()
+        seen = []
+
+        def chat(prompt):
+            if prompt.startswith("Draft 1"):
+                raise RuntimeError("backend down")
+            if prompt.startswith("Draft 2"):
+                release.wait(2)
+            return "only survivor"
+
+        out = dot_ensemble(
+            chat,
+            "question",
+            n=3,
+            concurrent=True,
+            draft_timeout=0.2,
+            on_draft=lambda i, text, latency, error: seen.append((i, error is not None)),
+        )
+        release.set()
+        self.assertEqual(out, "only survivor")
+        self.assertEqual(sorted(seen), [(0, True), (2, False)])
+
+        with self.assertRaises(RuntimeError):
+            dot_ensemble(lambda p: (_ for _ in ()).throw(RuntimeError("down")), "q", n=2, concurrent=True)
+
+    def test_calls_are_labelled(self):
+        labels = []
+
+        def chat(prompt):
+            labels.append(current_pass())
+            return "Draft 1" if "evaluate" in prompt.lower() else prompt[:7]
+
+        dot_ensemble(chat, "q", n=2)
+        self.assertEqual(labels, ["draft 1/2", "draft 2/2", "critique"])
+        self.assertEqual(current_pass(), "")
+
+
+class TestSlowModeStream(unittest.TestCase):
+    def test_stops_once_passes_converge(self):
+        answers = iter(["rough idea", "final answer here", "final answer here", "never asked"])
+        prompts = []
+
+        def chat(prompt):
+            prompts.append(prompt)
+            return next(answers)
+
+        passes = list(slow_mode_stream(chat, "hello", passes=4))
+        self.assertEqual(passes, ["rough idea", "final answer here", "final answer here"])
+        self.assertIn("Previous answer:\nrough idea", prompts[1])
+
+    def test_similarity(self):
+        self.assertEqual(similarity("A b", "b a"), 1.0)
+        self.assertEqual(similarity("a b", "c d"), 0.0)
+
+
+class TestModelRunTags(unittest.TestCase):
+    def test_tag_is_stored(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = MemoryStore(os.path.join(tmp, "memory.db"), embedding_dim=32)
+            try:
+                store.log_model_run("m", 1, 2, 0.0, 0.1, tag="draft 2/3")
+                store.log_model_run("m", 1, 2, 0.0, 0.1)
+                cur = store._conn.cursor()
+                cur.execute("SELECT tag FROM model_runs ORDER BY id")
+                self.assertEqual([row[0] for row in cur.fetchall()], ["draft 2/3", None])
+            finally:
+                store._conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from deep_research import DeepResearch, plan_subquestions
+
+
+class TestDeepResearch(unittest.TestCase):
+    def _chat(self, prompt):
+        if prompt.startswith("Create a concise research plan"):
+            time.sleep(0.1)
+            return "Plan:\n1. Find the outage timeline\n2. Check the runbook\nDone."
+        if prompt.startswith("Use the evidence"):
+            return "draft answer"
+        if prompt.startswith("Critique"):
+            return "needs sources"
+        return "final answer"
+
+    def test_retrieval_overlaps_planning_and_fans_out(self):
+        search_threads = []
+        batches = []
+
+        def rag_search(query, limit=5):
+            search_threads.append(threading.current_thread())
+            time.sleep(0.1)
+            return [{"id": 1, "source": "a.md", "text": "timeline"}]
+
+        def rag_search_many(queries, limit=5):
+            batches.append(list(queries))
+            return [{"id": 1, "source": "a.md", "text": "timeline"}, {"id": 2, "source": "b.md", "text": "runbook"}]
+
+        stages = []
+        partials = []
+        research = DeepResearch(self._chat, rag_search, rag_search_many=rag_search_many, on_stage=lambda s, _t: stages.append(s))
+        started = time.monotonic()
+        out = research.run("why did it fail?", on_partial=lambda stage, text: partials.append((stage, text)))
+        # Planning and the first retrieval both take 0.1s and run side by side.
+        self.assertLess(time.monotonic() - started, 0.18)
+        self.assertIsNot(search_threads[0], threading.current_thread())
+        self.assertEqual(batches, [["Find the outage timeline", "Check the runbook"]])
+        self.assertEqual(out, "Plan:\nPlan:\n1. Find the outage timeline\n2. Check the runbook\nDone.\n\nAnswer:\nfinal answer")
+        self.assertEqual(partials, [("draft", "draft answer"), ("final", "final answer")])
+        self.assertEqual(set(stages), {"plan", "retrieve", "retrieve_subquestions", "draft", "critique", "revise"})
+        self.assertIn("total", research.last_timings)
+
+    def test_falls_back_to_one_search_per_subquestion(self):
+        queries = []
+
+        def rag_search(query, limit=5):
+            queries.append(query)
+            return [{"id": len(queries), "source": "a.md", "text": query}]
+
+        DeepResearch(self._chat, rag_search).run("why?")
+        self.assertEqual(sorted(queries), ["Check the runbook", "Find the outage timeline", "why?"])
+
+    def test_plan_subquestions(self):
+        plan = "Steps:\n- **Scope** the question\n* Scope the question\n3) Compare vendors\nNot a step"
+        self.assertEqual(plan_subquestions(plan), ["Scope the question", "Compare vendors"])
+        self.assertEqual(plan_subquestions("1. a\n2. bbbb", limit=1), ["bbbb"])
+
+
+if __name__ == "__main__":
+    unittest.main()
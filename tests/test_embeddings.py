@@ -0,0 +1,59 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from embeddings import (
+    decode_embedding,
+    decode_sparse,
+    embed_sparse,
+    encode_embedding,
+    encode_sparse,
+    migrate_embeddings,
+    sparse_cosine,
+    tokenize,
+)
+
+
+class TestEmbeddingCodec(unittest.TestCase):
+    def test_sparse_embedding_matches_legacy_buckets(self):
+        text = "Alpha beta alpha gamma_1"
+        expected = {}
+        for tok in tokenize(text):
+            idx = int(hashlib.sha1(tok.encode("utf-8")).hexdigest(), 16) % 64
+            expected[idx] = expected.get(idx, 0) + 1
+        vec = embed_sparse(text, 64)
+        self.assertEqual(vec, expected)
+        self.assertEqual(decode_sparse(encode_sparse(vec, 64), 64), expected)
+        self.assertAlmostEqual(sparse_cosine(vec, vec), 1.0)
+        self.assertEqual(sparse_cosine(vec, {}), 0.0)
+
+    def test_sparse_and_dense_round_trip(self):
+        sparse = [0, 3, 0, 0, 1, 0, 0, 0]
+        self.assertEqual([float(v) for v in decode_embedding(encode_embedding(sparse), 8)], sparse)
+        dense = [0.25, -1.5, 2.0]
+        self.assertEqual([float(v) for v in decode_embedding(encode_embedding(dense), 3)], dense)
+        self.assertLess(len(encode_embedding(sparse)), len(json.dumps(sparse)))
+
+    def test_migrates_json_rows_in_place(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = sqlite3.connect(os.path.join(tmp, "legacy.db"))
+            try:
+                conn.execute("CREATE TABLE rag_chunks (id INTEGER PRIMARY KEY, embedding TEXT NOT NULL)")
+                conn.execute("INSERT INTO rag_chunks (embedding) VALUES (?)", (json.dumps([1, 0, 2, 0]),))
+                conn.commit()
+                self.assertEqual(migrate_embeddings(conn, "rag_chunks"), 1)
+                blob, kind = conn.execute("SELECT embedding, typeof(embedding) FROM rag_chunks").fetchone()
+                self.assertEqual(kind, "blob")
+                self.assertEqual([float(v) for v in decode_embedding(blob, 4)], [1.0, 0.0, 2.0, 0.0])
+                self.assertEqual(migrate_embeddings(conn, "rag_chunks"), 0)
+            finally:
+                conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+import urllib.request
+from http.server import ThreadingHTTPServer
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import app as app_mod
+from event_bus import EventBus, RunEventWriter
+
+
+class TestEventBus(unittest.TestCase):
+    def test_cursor_reads_only_new_events(self):
+        bus = EventBus(capacity=3)
+        for i in range(2):
+            bus.publish({"event_type": "tick", "n": i})
+        events, dropped = bus.since(0)
+        self.assertEqual([e["seq"] for e in events], [1, 2])
+        self.assertEqual(dropped, 0)
+        self.assertEqual(bus.since(2), ([], 0))
+
+        for i in range(2, 6):
+            bus.publish({"event_type": "tick", "n": i})
+        events, dropped = bus.since(2)
+        self.assertEqual([e["n"] for e in events], [3, 4, 5])
+        self.assertEqual(dropped, 1)
+        self.assertEqual([e["seq"] for e in bus.since(4, limit=1)[0]], [5])
+        self.assertEqual([e["seq"] for e in bus.recent(2)], [6, 5])
+        # A cursor from before a restart starts over.
+        self.assertEqual(len(bus.since(99)[0]), 3)
+
+    def test_wait_wakes_on_publish(self):
+        bus = EventBus()
+        self.assertFalse(bus.wait(0, timeout=0.01))
+        timer = threading.Timer(0.05, bus.publish, args=({"event_type": "done"},))
+        timer.start()
+        self.assertTrue(bus.wait(0, timeout=5))
+        timer.join()
+
+    def test_writer_keeps_handles_open_per_run(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            writer = RunEventWriter(max_open=1)
+            first = os.path.join(tmp, "a.jsonl")
+            second = os.path.join(tmp, "b.jsonl")
+            writer.write(first, {"n": 1})
+            with open(first, encoding="utf-8") as handle:
+                self.assertEqual(json.loads(handle.read()), {"n": 1})
+            writer.write(second, {"n": 2})
+            writer.write(first, {"n": 3})
+            writer.close(first)
+            writer.close_all()
+            with open(first, encoding="utf-8") as handle:
+                self.assertEqual([json.loads(line)["n"] for line in handle], [1, 3])
+
+
+class TestEventEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.events = EventBus()
+        self.a2a = EventBus()
+        fake = SimpleNamespace(engine=SimpleNamespace(events=self.events), a2a=SimpleNamespace(events=self.a2a))
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), app_mod._make_web_handler(fake))
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_long_poll_returns_when_an_event_arrives(self):
+        self.events.publish({"event_type": "old"})
+        timer = threading.Timer(0.1, self.events.publish, args=({"event_type": "new"},))
+        timer.start()
+        with urllib.request.urlopen(f"{self.base}/api/events?since=1&wait=10", timeout=10) as resp:
+            body = json.loads(resp.read())
+        timer.join()
+        self.assertEqual([e["event_type"] for e in body["events"]], ["new"])
+        self.assertEqual(body["next"], 2)
+
+    def test_sse_pushes_a2a_messages(self):
+        self.a2a.publish({"sender": "a", "receiver": "b", "message": "hi"})
+        with urllib.request.urlopen(f"{self.base}/api/stream?channel=a2a", timeout=10) as resp:
+            self.assertEqual(resp.headers["Content-Type"], "text/event-stream")
+            self.assertEqual(resp.readline(), b"retry: 1000\n")
+            resp.readline()
+            lines = [resp.readline() for _ in range(3)]
+        self.assertEqual(lines[0], b"id: 1\n")
+        self.assertEqual(lines[1], b"event: a2a\n")
+        self.assertEqual(json.loads(lines[2][len(b"data: "):])["message"], "hi")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from fts import bm25_search, ensure_fts, fts5_available, match_query, rrf
+from memory import MemoryStore
+from rag import RagStore
+
+
+@unittest.skipUnless(fts5_available(sqlite3.connect(":memory:")), "SQLite built without FTS5")
+class TestFts(unittest.TestCase):
+    def test_mirror_backfills_and_tracks_changes(self):
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE docs (id INTEGER PRIMARY KEY, body TEXT)")
+        conn.execute("INSERT INTO docs (body) VALUES ('existing row about kernels')")
+        self.assertTrue(ensure_fts(conn, "docs", "docs_fts", "body"))
+        cur = conn.cursor()
+        self.assertEqual([row_id for row_id, _ in bm25_search(cur, "docs_fts", "kernels", 5)], [1])
+        conn.execute("INSERT INTO docs (body) VALUES ('fresh row about compilers')")
+        conn.execute("UPDATE docs SET body = 'rewritten row' WHERE id = 1")
+        self.assertEqual(bm25_search(cur, "docs_fts", "kernels", 5), [])
+        self.assertEqual([row_id for row_id, _ in bm25_search(cur, "docs_fts", "compilers", 5)], [2])
+        conn.execute("DELETE FROM docs WHERE id = 2")
+        self.assertEqual(bm25_search(cur, "docs_fts", "compilers", 5), [])
+
+    def test_match_query_and_rrf(self):
+        self.assertEqual(match_query('Alpha "beta" alpha-OR'), '"alpha" OR "beta" OR "or"')
+        fused = rrf([[1, 2, 3], [3, 1]], k=60)
+        self.assertEqual(max(fused, key=fused.get), 1)
+        self.assertAlmostEqual(fused[2], 1.0 / 62)
+
+    def test_rag_and_memory_modes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            mem = MemoryStore(os.path.join(tmp, "mem.db"), embedding_dim=32)
+            try:
+                rag = RagStore(mem)
+                rag.index_text("a.txt", "the deployment checklist mentions zanzibar tokens")
+                rag.index_text("b.txt", "an unrelated note about gardening")
+                for mode in ("bm25", "hybrid"):
+                    results = rag.search("zanzibar", limit=3, mode=mode)
+                    self.assertEqual([r["source"] for r in results], ["a.txt"])
+                self.assertEqual(rag.search("nothing matches", mode="bm25"), [])
+                mem.add_memory("note", "rotate the zanzibar credentials weekly")
+                mem.add_memory("note", "water the plants")
+                for mode in ("bm25", "hybrid"):
+                    hits = mem.search_memory("zanzibar", mode=mode)
+                    self.assertEqual(len(hits), 1)
+                    self.assertIn("zanzibar", hits[0]["content"])
+            finally:
+                mem._conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import random
+import sqlite3
+import time
+import unittest
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from graph_rag import EntityMatcher, GraphStore
+
+
+class TestEntityMatcher(unittest.TestCase):
+    def test_finds_overlapping_mentions_on_word_boundaries(self):
+        matcher = EntityMatcher(["New York", "York", "AI", "he"])
+        self.assertEqual(matcher.find("Flights from new york to Boston"), ["New York", "York"])
+        self.assertEqual(matcher.find("maintain the hedge"), [])
+        matcher.add("Boston")
+        self.assertEqual(matcher.find("AI in Boston"), ["AI", "Boston"])
+
+
+class TestGraphStore(unittest.TestCase):
+    def test_add_entity_dedupes_and_matcher_tracks_inserts(self):
+        store = GraphStore(sqlite3.connect(":memory:"))
+        alpha = store.add_entity("Alpha", "concept")
+        self.assertEqual(store.find_entities("tell me about alpha"), ["Alpha"])
+        self.assertEqual(store.add_entity("Alpha", "project"), alpha)
+        store.add_entity("Beta", "concept")
+        self.assertEqual(store.find_entities("beta and alpha"), ["Beta", "Alpha"])
+
+    def test_migrates_duplicate_entities(self):
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE graph_entities (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, entity_type TEXT NOT NULL)")
+        conn.execute("CREATE TABLE graph_edges (id INTEGER PRIMARY KEY AUTOINCREMENT, src_id INTEGER NOT NULL, rel TEXT NOT NULL, dst_id INTEGER NOT NULL)")
+        conn.executemany(
+            "INSERT INTO graph_entities (id, name, entity_type) VALUES (?, ?, ?)",
+            [(1, "Alpha", "concept"), (2, "Beta", "concept"), (3, "Alpha", "concept")],
+        )
+        conn.execute("INSERT INTO graph_edges (src_id, rel, dst_id) VALUES (3, 'related_to', 2)")
+        conn.commit()
+        store = GraphStore(conn)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM graph_entities").fetchone()[0], 2)
+        self.assertEqual(store.neighbors("Alpha"), [{"name": "Beta", "type": "concept", "rel": "related_to"}])
+        self.assertEqual(store.add_entity("Alpha", "concept"), 1)
+
+    def _chain(self, snapshot):
+        store = GraphStore(sqlite3.connect(":memory:"), snapshot=snapshot)
+        ids = store.add_entities([("a", "concept"), ("b", "concept"), ("c", "service"), ("d", "concept"), ("x", "concept")])
+        store.add_edges(
+            [
+                (ids["a"], "uses", ids["b"]),
+                (ids["b"], "uses", ids["c"]),
+                (ids["c"], "owns", ids["d"]),
+                (ids["a"], "owns", ids["d"]),
+                (ids["d"], "uses", ids["a"]),
+            ]
+        )
+        return store
+
+    def test_traversals_agree_between_cte_and_snapshot(self):
+        for snapshot in (False, True):
+            store = self._chain(snapshot)
+            hops = store.k_hop("a", depth=2)
+            self.assertEqual(
+                [(h["name"], h["depth"], h["rel"]) for h in hops],
+                [("b", 1, "uses"), ("d", 1, "owns"), ("c", 2, "uses")],
+            )
+            self.assertEqual([h["name"] for h in store.k_hop("a", depth=3, rel_filter="uses")], ["b", "c"])
+            self.assertEqual(store.k_hop("a", depth=3, limit=1)[0]["name"], "b")
+            path = store.shortest_path("b", "a")
+            self.assertEqual([(p["name"], p["rel"]) for p in path], [("b", ""), ("c", "uses"), ("d", "owns"), ("a", "uses")])
+            self.assertEqual(store.shortest_path("a", "x"), [])
+            self.assertEqual(len(store.shortest_path("a", "c", rel_filter=["uses"])), 3)
+
+    def test_shortest_path_on_dense_graph_is_fast(self):
+        rng = random.Random(7)
+        names = [f"n{i}" for i in range(300)]
+        for snapshot in (False, True):
+            store = GraphStore(sqlite3.connect(":memory:"), snapshot=snapshot)
+            ids = store.add_entities([(name, "concept") for name in names])
+            edges = {(rng.randrange(300), rng.randrange(300)) for _ in range(6000)}
+            edges.discard((0, 299))
+            store.add_edges([(ids[names[a]], "rel", ids[names[b]]) for a, b in edges if a != b])
+            hub = next(b for a, b in sorted(edges) if a == 0 and b not in (0, 299))
+            store.add_edge(ids[names[hub]], "rel", ids["n299"])
+            started = time.monotonic()
+            path = store.shortest_path("n0", "n299", max_depth=5)
+            self.assertLess(time.monotonic() - started, 1.0)
+            self.assertLessEqual(len(path), 3)
+            self.assertEqual((path[0]["name"], path[-1]["name"]), ("n0", "n299"))
+            self.assertEqual(store.shortest_path("n0", "n299", max_depth=1), [])
+
+    def test_subgraph_and_snapshot_invalidation(self):
+        store = self._chain(True)
+        sub = store.subgraph(["c"], depth=1)
+        self.assertEqual([n["name"] for n in sub["nodes"]], ["c", "d"])
+        self.assertEqual(sub["edges"], [{"src": "c", "rel": "owns", "dst": "d"}])
+        self.assertEqual(store.k_hop("x", depth=1), [])
+        ids = store.add_entities([("x", "concept"), ("y", "concept")])
+        store.add_edge(ids["x"], "uses", ids["y"])
+        self.assertEqual([h["name"] for h in store.k_hop("x", depth=1)], ["y"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from group_commit import GroupCommitWriter
+from memory import MemoryStore
+from metrics import Metrics
+
+
+class TestGroupCommit(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = MemoryStore(os.path.join(self.tmp.name, "memory.db"), embedding_dim=32)
+        self.writer = self.store.enable_group_commit(max_rows=50, interval_ms=20)
+
+    def tearDown(self):
+        self.writer.close()
+        self.store._conn.close()
+        self.tmp.cleanup()
+
+    def test_batches_and_flush_barrier(self):
+        for i in range(120):
+            self.store.log_event("tick", str(i))
+        self.assertTrue(self.store.flush(timeout=5))
+        cur = self.store._conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM events")
+        self.assertEqual(cur.fetchone()[0], 120)
+        self.assertEqual(self.writer.rows, 120)
+        self.assertLess(self.writer.batches, 120)
+
+    def test_read_your_writes(self):
+        self.store.set("mode", "fast")
+        self.assertEqual(self.store.get("mode"), "fast")
+        self.store.log_model_run("m", 1, 2, 0.0, 0.1)
+        self.assertEqual(self.store.model_summary()[0]["runs"], 1)
+
+
+class TestGroupCommitFailures(unittest.TestCase):
+    def test_bad_statement_does_not_drop_its_batch(self):
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+        conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT NOT NULL)")
+        metrics = Metrics()
+        errors = []
+        writer = GroupCommitWriter(conn, max_rows=50, interval_ms=200, metrics=metrics, on_error=errors.append)
+        try:
+            with self.assertLogs(level="ERROR"):
+                writer.submit("INSERT INTO t (id, v) VALUES (?, ?)", (1, "a"))
+                writer.submit("INSERT INTO t (id, v) VALUES (?, ?)", (2, None))
+                writer.submit("INSERT INTO t (id, v) VALUES (?, ?)", (3, "c"))
+                writer.submit("UPDATE t SET v = ? WHERE id = ?", ("A", 1))
+                self.assertTrue(writer.flush(timeout=5))
+            self.assertEqual(conn.execute("SELECT id, v FROM t ORDER BY id").fetchall(), [(1, "A"), (3, "c")])
+            self.assertEqual((writer.failed, writer.rows, writer.pending), (1, 3, 0))
+            self.assertEqual(len(errors), 1)
+            self.assertEqual(metrics.snapshot()["counters"]["group_commit.failed"], 1)
+        finally:
+            writer.close()
+            conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
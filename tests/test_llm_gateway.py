@@ -0,0 +1,173 @@
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import llm_gateway
+from llm_gateway import LLMBackend, LLMError, LLMGateway, resolve_model
+
+
+class _FakeModelServer:
+    """Speaks just enough of the OpenAI and Ollama chat APIs, over keep-alive HTTP/1.1."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.requests = []
+        self.connections = set()
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with server.lock:
+                    server.requests.append((self.path, body, self.headers.get("Authorization")))
+                    server.connections.add(self.client_address)
+                    server.active += 1
+                    server.peak = max(server.peak, server.active)
+                try:
+                    time.sleep(server.delay)
+                    text = f"echo {body['messages'][-1]['content']} via {body['model']}"
+                    ollama = self.path == "/api/chat"
+                    if body.get("stream"):
+                        words = text.split(" ")
+                        if ollama:
+                            lines = [json.dumps({"message": {"content": w + " "}, "done": False}) for w in words]
+                        else:
+                            lines = ["data: " + json.dumps({"choices": [{"delta": {"content": w + " "}}]}) for w in words]
+                            lines.append("data: [DONE]")
+                        payload = ("\n".join(lines) + "\n").encode("utf-8")
+                    elif ollama:
+                        payload = json.dumps({"message": {"role": "assistant", "content": text}}).encode("utf-8")
+                    else:
+                        payload = json.dumps({"choices": [{"message": {"content": text}}]}).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True  # client gave up (timeout test)
+                finally:
+                    with server.lock:
+                        server.active -= 1
+
+            def log_message(self, format, *args):
+                return
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@mock.patch.object(llm_gateway, "aiohttp", None)
+class TestLLMGateway(unittest.TestCase):
+    def _gateway(self, server, concurrency=2, timeout=5.0):
+        return LLMGateway(
+            [
+                LLMBackend("openai", "openai", server.url + "/v1", api_key="sk-test", max_concurrency=concurrency, timeout=timeout),
+                LLMBackend("ollama", "ollama", server.url, max_concurrency=concurrency, timeout=timeout),
+            ],
+            default_backend="openai",
+        )
+
+    def test_per_call_model_and_backend(self):
+        server = _FakeModelServer()
+        gateway = self._gateway(server)
+        try:
+            self.assertEqual(gateway.chat("hi", model="gpt-a"), "echo hi via gpt-a")
+            self.assertEqual(gateway.chat("yo", backend="ollama", model="phi", system="be brief"), "echo yo via phi")
+            path, body, auth = server.requests[1]
+            self.assertEqual(path, "/api/chat")
+            self.assertEqual(body["messages"][0], {"role": "system", "content": "be brief"})
+            self.assertIsNone(auth)
+            self.assertEqual(server.requests[0][0], "/v1/chat/completions")
+            self.assertEqual(server.requests[0][2], "Bearer sk-test")
+            with self.assertRaises(LLMError):
+                gateway.chat("no model")
+        finally:
+            gateway.close()
+            server.close()
+
+    def test_concurrency_cap_and_connection_reuse(self):
+        server = _FakeModelServer(delay=0.05)
+        gateway = self._gateway(server, concurrency=2)
+        try:
+            replies = gateway.chat_many([f"p{i}" for i in range(6)], model="m")
+            self.assertEqual(replies, [f"echo p{i} via m" for i in range(6)])
+            self.assertEqual(server.peak, 2)
+            # Six requests over a pool of two keep-alive connections.
+            self.assertLessEqual(len(server.connections), 2)
+        finally:
+            gateway.close()
+            server.close()
+
+    def test_streaming_tokens(self):
+        server = _FakeModelServer()
+        gateway = self._gateway(server)
+        try:
+            for backend in ("openai", "ollama"):
+                tokens = []
+                reply = gateway.chat("stream me", backend=backend, model="m", on_token=tokens.append)
+                self.assertEqual(reply.strip(), "echo stream me via m")
+                self.assertEqual(len(tokens), 5)
+        finally:
+            gateway.close()
+            server.close()
+
+    def test_request_timeout(self):
+        server = _FakeModelServer(delay=1.0)
+        gateway = self._gateway(server, timeout=0.2)
+        try:
+            with self.assertRaises(LLMError):
+                gateway.chat("slow", model="m")
+        finally:
+            gateway.close()
+            server.close()
+
+    def test_close_closes_event_loop(self):
+        server = _FakeModelServer()
+        gateway = self._gateway(server)
+        try:
+            self.assertEqual(gateway.chat("hi", model="m"), "echo hi via m")
+        finally:
+            gateway.close()
+            server.close()
+        self.assertTrue(gateway._loop.is_closed())
+        gateway.close()  # idempotent
+
+
+class TestResolveModel(unittest.TestCase):
+    def setUp(self):
+        self.settings = SimpleNamespace(
+            openai_model="gpt-base",
+            openai_coding_model="gpt-code",
+            openai_reasoning_model="gpt-think",
+            ollama_model="phi",
+            ollama_coding_model="phi-code",
+            ollama_reasoning_model="phi-think",
+        )
+
+    def test_prefers_openai_unless_offline(self):
+        env = {"OPENAI_API_KEY": "sk", "OLLAMA_MODEL": "", "OLLAMA_CODING_MODEL": "", "OLLAMA_REASONING_MODEL": ""}
+        with mock.patch.dict(os.environ, env):
+            self.assertEqual(resolve_model(self.settings, "hello")[0], "openai")
+            self.assertEqual(resolve_model(self.settings, "hello", prefer_offline=True)[0], "ollama")
+
+
+if __name__ == "__main__":
+    unittest.main()
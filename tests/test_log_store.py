@@ -0,0 +1,61 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from log_store import PartitionedLogStore
+from memory import MemoryStore
+
+DAY = 24 * 3600
+
+
+class TestPartitionedLogs(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, "logs")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_range_query_and_partition_drop(self):
+        logs = PartitionedLogStore(self.root)
+        now = time.time()
+        for days_ago in (3, 2, 1, 0):
+            for i in range(3):
+                logs.append("audit_logs", f"kind{i}", f"{days_ago}-{i}", "v1", timestamp=now - days_ago * DAY + i)
+        self.assertEqual(len(logs.days("audit_logs")), 4)
+        rows = logs.query("audit_logs", start=now - 2 * DAY, end=now - DAY + 2)
+        self.assertEqual([row[2] for row in rows], ["1-1", "1-0", "2-2", "2-1", "2-0"])
+        self.assertEqual(rows[0][3], "v1")
+        self.assertEqual([row[2] for row in logs.query("audit_logs", limit=4)], ["0-2", "0-1", "0-0", "1-2"])
+        self.assertEqual(len(logs.query("audit_logs", event_type="kind0")), 4)
+
+        self.assertEqual(logs.drop_before("audit_logs", now - DAY), 2)
+        self.assertEqual(len(logs.days("audit_logs")), 2)
+        self.assertEqual(len(logs.query("audit_logs")), 6)
+        logs.close()
+
+    def test_memory_store_moves_legacy_rows(self):
+        db_path = os.path.join(self.tmp.name, "memory.db")
+        store = MemoryStore(db_path, embedding_dim=32)
+        store.log_event("tick", '{"n": 1}')
+        store.log_audit("tool_call", "{}")
+        store.db.close()
+
+        store = MemoryStore(db_path, embedding_dim=32, log_dir=self.root)
+        writer = store.enable_group_commit(interval_ms=10)
+        store.log_event("tick", '{"n": 2}')
+        self.assertEqual([e["payload"] for e in store.get_recent_events(5)], [{"n": 2}, {"n": 1}])
+        self.assertEqual(store.query_logs("audit_logs")[0]["event_type"], "tool_call")
+        self.assertEqual(store._conn.execute("SELECT COUNT(*) FROM events").fetchone()[0], 0)
+        store.purge_events(3600)
+        self.assertEqual(len(store.recent_events(5)), 2)
+        writer.close()
+        store.logs.close()
+        store.db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
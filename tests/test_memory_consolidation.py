@@ -0,0 +1,100 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from memory import MemoryStore
+
+
+class TestMemoryConsolidation(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = MemoryStore(os.path.join(self.tmp.name, "memory.db"), embedding_dim=256)
+
+    def tearDown(self):
+        self.store.db.close()
+        self.tmp.cleanup()
+
+    def test_merges_near_duplicates_within_scope(self):
+        base = "nightly builds fail when the artifact cache is cold so warm it before the release job runs"
+        self.store.add_memory("wisdom", base, tags=["a"], relevance=0.5, run_id="run-1")
+        self.store.add_memory("wisdom", base + " again", tags=["b"], relevance=0.4)
+        self.store.add_memory("wisdom", base, scope="private", relevance=0.5)
+        self.store.add_memory("wisdom", "gardening tips for tomatoes basil and peppers in raised beds all summer")
+        contents = [r["content"] for r in self.store.search_memory("artifact cache", limit=10)]
+        self.assertEqual(sum("artifact cache" in content for content in contents), 2)
+
+        self.assertEqual(self.store.merge_duplicates(threshold=0.9), 1)
+        cur = self.store._conn.cursor()
+        cur.execute("SELECT id, relevance, tags FROM memories WHERE scope = 'shared' AND content = ?", (base,))
+        canonical, relevance, tags = cur.fetchone()
+        self.assertAlmostEqual(relevance, 0.9)
+        self.assertEqual(json.loads(tags), ["a", "b"])
+        cur.execute("SELECT COUNT(*) FROM memories")
+        self.assertEqual(cur.fetchone()[0], 3)
+        cur.execute("SELECT merged_into, archive_reason FROM memories_archive")
+        self.assertEqual(cur.fetchall(), [(canonical, "merged")])
+        cur.execute("SELECT run_id, merged_from IS NOT NULL FROM memory_refs WHERE memory_id = ? ORDER BY id", (canonical,))
+        self.assertEqual(cur.fetchall(), [("run-1", 0), (None, 1)])
+        contents = [r["content"] for r in self.store.search_memory("artifact cache", limit=10)]
+        self.assertEqual(sum("artifact cache" in content for content in contents), 1)
+
+    def test_failed_run_duplicates_do_not_hide_the_canonical_row(self):
+        base = "deploys need the feature flag service warmed up before traffic is shifted over"
+        self.store.create_task_run("run-bad", "error", False, "deploy", "{}", "{}")
+        self.store.add_memory("wisdom", base, relevance=0.9, run_id="run-ok")
+        self.store.add_memory("wisdom", base + " again", relevance=0.2, run_id="run-bad")
+        before = [r["content"] for r in self.store.search_memory("feature flag service", limit=5)]
+        self.assertEqual(before, [base])
+
+        self.store.consolidate(threshold=0.9, archive_after_seconds=None)
+        after = [r["content"] for r in self.store.search_memory("feature flag service", limit=5)]
+        self.assertEqual(after, [base])
+        cur = self.store._conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM memories_archive")
+        self.assertEqual(cur.fetchone()[0], 0)
+
+    def test_default_consolidation_keeps_aged_memories(self):
+        fact = "the staging database password rotates on the first monday of every month"
+        self.store.add_memory("long_term", fact)
+        self.store.add_memory("note", "an aged note about quarterly planning", ttl_seconds=60 * 24 * 3600)
+        self.store._conn.execute("UPDATE memories SET created_at = ?", (time.time() - 15 * 24 * 3600,))
+        self.store._conn.commit()
+        self.assertEqual([r["content"] for r in self.store.search_memory("staging database password", limit=1)], [fact])
+
+        self.assertEqual(self.store.consolidate()["archived"], 0)
+        self.assertEqual([r["content"] for r in self.store.search_memory("staging database password", limit=1)], [fact])
+        # Even with archiving on, memories without a TTL are kept.
+        self.assertEqual(self.store.archive_cold(14 * 24 * 3600), 1)
+        self.assertEqual([r["content"] for r in self.store.search_memory("staging database password", limit=1)], [fact])
+
+    def test_archive_cold_and_optimize(self):
+        for i in range(20):
+            self.store.add_memory("note", f"old note number {i} " + "filler " * 50, ttl_seconds=30 * 24 * 3600)
+        self.store.add_memory("pin", "keep this pinned note")
+        self.store.add_memory("note", "recent note")
+        self.store._conn.execute(
+            "UPDATE memories SET created_at = ? WHERE content != 'recent note'", (time.time() - 3600,)
+        )
+        self.store._conn.commit()
+        self.assertEqual(self.store.archive_cold(60, batch_size=7), 20)
+        cur = self.store._conn.cursor()
+        cur.execute("SELECT kind, content FROM memories ORDER BY id")
+        self.assertEqual(cur.fetchall(), [("pin", "keep this pinned note"), ("note", "recent note")])
+        contents = [r["content"] for r in self.store.search_memory("old note", limit=5)]
+        self.assertFalse(any(content.startswith("old note") for content in contents))
+
+        self.store._conn.execute("DELETE FROM memories_archive")
+        self.store._conn.commit()
+        report = self.store.optimize(vacuum_free_ratio=0.0)
+        self.assertTrue(report["vacuumed"])
+        self.assertEqual(self.store.optimize()["free_pages"], 0)
+        report = self.store.consolidate(archive_after_seconds=None)
+        self.assertEqual((report["merged"], report["archived"]), (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,7 @@
 import os
 import sys
 import tempfile
+import time
 import unittest
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -48,6 +49,23 @@ class TestMemoryFilters(unittest.TestCase):
         self.assertNotIn("alpha acl", contents)
         self.assertNotIn("alpha fail", contents)
 
+    def test_expired_rows_hidden_without_purge(self):
+        self.store.add_memory("note", "alpha fresh", ttl_seconds=3600)
+        for i in range(5):
+            self.store.add_memory("note", f"alpha stale {i}", ttl_seconds=3600)
+        cur = self.store._conn.cursor()
+        cur.execute("UPDATE memories SET expires_at=? WHERE content LIKE 'alpha stale%'", (time.time() - 1,))
+        self.store._conn.commit()
+
+        contents = [r["content"] for r in self.store.search_memory("alpha", limit=10)]
+        self.assertEqual(contents, ["alpha fresh"])
+        cur.execute("SELECT COUNT(*) FROM memories")
+        self.assertEqual(cur.fetchone()[0], 6)
+
+        self.assertEqual(self.store.prune_memories(batch_size=2), 5)
+        cur.execute("SELECT COUNT(*) FROM memories")
+        self.assertEqual(cur.fetchone()[0], 1)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,152 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from core.schemas import Budget, PlanStepSchema
+from plan_scheduler import TOOL_GROUPS, DagScheduler, PlanBudget, parse_depends_on, parse_tool_limits, step_dependencies
+
+
+# As with the LLM gateway on: agent steps may overlap.
+PARALLEL_AGENT = parse_tool_limits("", concurrent_agent=True)
+
+
+def _step(step_id, tool="agent", depends_on=None):
+    return PlanStepSchema(step_id=step_id, title=f"step {step_id}", intent="", tool=tool, depends_on=depends_on)
+
+
+class _Recorder:
+    def __init__(self, delay=0.05, fail=()):
+        self.delay = delay
+        self.fail = set(fail)
+        self.active = {}
+        self.peak = {}
+        self.finished = []
+        self._lock = threading.Lock()
+
+    def __call__(self, step):
+        slot = TOOL_GROUPS.get(step.tool, step.tool)
+        with self._lock:
+            self.active[slot] = self.active.get(slot, 0) + 1
+            self.peak[slot] = max(self.peak.get(slot, 0), self.active[slot])
+        time.sleep(self.delay)
+        with self._lock:
+            self.active[slot] -= 1
+            self.finished.append(step.step_id)
+        return step.step_id not in self.fail
+
+
+class TestStepDependencies(unittest.TestCase):
+    def test_undeclared_dependencies_keep_plan_order(self):
+        deps = step_dependencies([_step(1), _step(2), _step(3, depends_on=[])])
+        self.assertEqual(deps, {1: [], 2: [1], 3: []})
+
+    def test_rejects_unknown_steps_and_cycles(self):
+        with self.assertRaises(ValueError):
+            step_dependencies([_step(1, depends_on=[7])])
+        with self.assertRaises(ValueError):
+            step_dependencies([_step(1, depends_on=[2]), _step(2, depends_on=[1])])
+
+    def test_parse_helpers(self):
+        self.assertIsNone(parse_depends_on(None))
+        self.assertEqual(parse_depends_on("2"), [2])
+        self.assertEqual(parse_depends_on("1, 2"), [1, 2])
+        self.assertEqual(parse_depends_on([]), [])
+        # Not step ids: the step runs after the previous one instead of invalidating the plan.
+        self.assertIsNone(parse_depends_on(["step_1"]))
+        self.assertIsNone(parse_depends_on({"id": 1}))
+        self.assertEqual(parse_tool_limits("agent=3, vm=2, bogus")["vm"], 2)
+        self.assertEqual(parse_tool_limits("")["computer"], 1)
+        self.assertEqual(parse_tool_limits("agent=3")["agent"], 1)
+        self.assertNotIn("agent", parse_tool_limits("", concurrent_agent=True))
+        self.assertEqual(parse_tool_limits("agent=3", concurrent_agent=True)["agent"], 3)
+
+
+class TestDagScheduler(unittest.TestCase):
+    def test_independent_steps_run_concurrently(self):
+        steps = [_step(i, depends_on=[]) for i in range(1, 5)] + [_step(5, depends_on=[1, 2, 3, 4])]
+        recorder = _Recorder(delay=0.1)
+        started = time.monotonic()
+        order = DagScheduler(max_workers=4, tool_limits=PARALLEL_AGENT).run(steps, recorder)
+        self.assertLess(time.monotonic() - started, 0.35)
+        self.assertEqual(recorder.peak["agent"], 4)
+        self.assertEqual(order[-1], 5)
+        self.assertEqual(recorder.finished[-1], 5)
+
+    def test_agent_steps_are_serialized_by_default(self):
+        # Without the LLM gateway, _agent_chat drives the shared open-interpreter client.
+        steps = [_step(i, depends_on=[]) for i in range(1, 4)] + [_step(4, "files", [])]
+        recorder = _Recorder(delay=0.05)
+        DagScheduler(max_workers=4).run(steps, recorder)
+        self.assertEqual(recorder.peak["agent"], 1)
+        self.assertEqual(sorted(recorder.finished), [1, 2, 3, 4])
+
+    def test_tool_limits_and_groups_are_respected(self):
+        steps = [_step(1, "computer", []), _step(2, "computer", []), _step(3, "browse", []), _step(4, "search", [])]
+        recorder = _Recorder(delay=0.05)
+        DagScheduler(max_workers=4).run(steps, recorder)
+        self.assertEqual(recorder.peak["computer"], 1)
+        self.assertEqual(sorted(recorder.finished), [1, 2, 3, 4])
+        # browse and search share the single browser page, so they never overlap either.
+        self.assertEqual(recorder.peak["browser"], 1)
+
+    def test_failure_stops_new_steps_and_dependents(self):
+        steps = [_step(1, depends_on=[]), _step(2, depends_on=[]), _step(3, depends_on=[1]), _step(4, depends_on=[2])]
+        recorder = _Recorder(delay=0.02, fail={1})
+        order = DagScheduler(max_workers=2, tool_limits=PARALLEL_AGENT).run(steps, recorder)
+        self.assertEqual(sorted(order), [1, 2])
+
+    def test_sequential_plan_and_done_steps(self):
+        calls = []
+        order = DagScheduler(max_workers=4).run(
+            [_step(1), _step(2), _step(3)],
+            lambda step: calls.append(threading.current_thread()) or True,
+            done=[1],
+        )
+        self.assertEqual(order, [2, 3])
+        # A chain never needs the pool: steps run on the caller's thread.
+        self.assertTrue(all(thread is threading.current_thread() for thread in calls))
+
+    def test_step_exception_propagates_after_running_steps_finish(self):
+        recorder = _Recorder(delay=0.05)
+
+        def run_step(step):
+            if step.step_id == 1:
+                raise RuntimeError("boom")
+            return recorder(step)
+
+        with self.assertRaises(RuntimeError):
+            DagScheduler(max_workers=2, tool_limits=PARALLEL_AGENT).run(
+                [_step(1, depends_on=[]), _step(2, depends_on=[])], run_step
+            )
+        self.assertEqual(recorder.finished, [2])
+
+
+class TestPlanBudget(unittest.TestCase):
+    def test_tool_calls_are_counted_atomically(self):
+        budget = PlanBudget(Budget(max_tool_calls=100))
+        granted = []
+
+        def worker():
+            for _ in range(50):
+                granted.append(budget.take_tool_call())
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(granted.count(True), 100)
+
+    def test_step_and_time_limits(self):
+        budget = PlanBudget(Budget(max_steps=1, max_seconds=60))
+        self.assertEqual(budget.start_step(), "")
+        self.assertEqual(budget.start_step(), "Budget exceeded: max_steps")
+        expired = PlanBudget(Budget(max_seconds=1), started=time.time() - 5)
+        self.assertEqual(expired.start_step(), "Budget exceeded: max_seconds")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,11 @@
 import os
 import tempfile
 import unittest
+from unittest import mock
 
 import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from graph_rag import GraphStore
 from memory import MemoryStore
 from rag import RagStore
 
@@ -25,6 +27,145 @@ class TestRagStore(unittest.TestCase):
             finally:
                 mem._conn.close()
 
+    def test_incremental_reindex(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            docs = os.path.join(tmp, "docs")
+            os.makedirs(docs)
+            first = os.path.join(docs, "a.txt")
+            second = os.path.join(docs, "b.txt")
+            with open(first, "w", encoding="utf-8") as handle:
+                handle.write("alpha " * 400)
+            with open(second, "w", encoding="utf-8") as handle:
+                handle.write("beta " * 100)
+            mem = MemoryStore(os.path.join(tmp, "mem.db"), embedding_dim=32)
+            try:
+                rag = RagStore(mem)
+                report = rag.reindex_dir(docs)
+                self.assertEqual(report["added"], 2)
+                self.assertEqual(rag.stats()["chunks"], 4)
+
+                report = rag.reindex_dir(docs)
+                self.assertEqual(report["unchanged"], 2)
+                self.assertEqual(report["chunks_added"], 0)
+
+                with open(first, "w", encoding="utf-8") as handle:
+                    handle.write("alpha " * 200 + "gamma " * 200)
+                os.utime(first, (1, 1))
+                result = rag.sync_file(first)
+                self.assertEqual(result["status"], "updated")
+                self.assertEqual(result["chunks_added"], 2)
+                self.assertEqual(result["chunks_removed"], 2)
+
+                os.remove(second)
+                report = rag.reindex_dir(docs)
+                self.assertEqual(report["removed"], 1)
+                self.assertEqual(rag.stats()["chunks"], 3)
+                self.assertEqual(rag.index_file(first), 3)
+            finally:
+                mem._conn.close()
+
+    def test_parallel_ingest_matches_inline(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            docs = os.path.join(tmp, "docs")
+            os.makedirs(docs)
+            for i in range(6):
+                with open(os.path.join(docs, f"doc{i}.txt"), "w", encoding="utf-8") as handle:
+                    handle.write(f"document {i} " * 300)
+            with open(os.path.join(docs, "short.txt"), "w", encoding="utf-8") as handle:
+                handle.write("too short")
+            mem = MemoryStore(os.path.join(tmp, "mem.db"), embedding_dim=32)
+            try:
+                rag = RagStore(mem, ingest_batch_rows=4)
+                seen = []
+                report = rag.reindex_dir(docs, on_progress=seen.append, workers=2)
+                self.assertEqual(report["added"], 6)
+                self.assertEqual(report["skipped"], 1)
+                self.assertEqual(len(seen), 7)
+                chunks = rag.stats()["chunks"]
+                self.assertEqual(chunks, report["chunks_added"])
+                report = rag.reindex_dir(docs, workers=1)
+                self.assertEqual(report["unchanged"], 6)
+                self.assertEqual(rag.stats()["chunks"], chunks)
+            finally:
+                mem._conn.close()
+
+    def test_near_duplicate_chunks_are_stored_once(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            docs = os.path.join(tmp, "docs")
+            os.makedirs(docs)
+            shared = "The deploy checklist covers backups, migrations, smoke tests and the rollback plan."
+            paths = []
+            intros = {
+                "a.md": "The platform team owns ingestion, queues and the scheduler; pages go to the on-call engineer.",
+                "b.md": "Analysts own the warehouse models, dashboards and weekly revenue reports for finance.",
+            }
+            for name, intro in intros.items():
+                path = os.path.join(docs, name)
+                with open(path, "w", encoding="utf-8") as handle:
+                    handle.write(f"# Notes\n{intro} Reviewed every quarter.\n\n## Deploy\n{shared}\n")
+                paths.append(path)
+            mem = MemoryStore(os.path.join(tmp, "mem.db"), embedding_dim=32)
+            try:
+                rag = RagStore(mem, chunking={"strategy": "paragraph", "size": 400})
+                report = rag.ingest_paths(paths, workers=1)
+                self.assertEqual(report["chunks_added"], 3)
+                self.assertEqual(report["chunks_deduped"], 1)
+                self.assertEqual(rag.stats()["chunks"], 3)
+
+                self.assertEqual(rag.remove_file(paths[0]), 2)
+                rows = mem._conn.execute("SELECT source, text FROM rag_chunks ORDER BY id").fetchall()
+                self.assertEqual({r[0] for r in rows}, {"b.md"})
+                self.assertTrue(any(shared in r[1] for r in rows))
+                self.assertEqual(mem._conn.execute("SELECT COUNT(*) FROM rag_chunk_refs").fetchone()[0], 0)
+                self.assertEqual(rag.sync_file(paths[1])["status"], "unchanged")
+
+                rag = RagStore(mem, chunking={"strategy": "fixed", "size": 1000})
+                self.assertEqual(rag.sync_file(paths[1])["status"], "updated")
+            finally:
+                mem._conn.close()
+
+    def test_hybrid_search_expands_through_graph_neighbors(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            mem = MemoryStore(os.path.join(tmp, "mem.db"), embedding_dim=64)
+            try:
+                graph = GraphStore(mem.db)
+                atlas = graph.add_entity("atlas", "project")
+                hermes = graph.add_entity("hermes", "service")
+                graph.add_edge(atlas, "depends_on", hermes)
+                for mode in ("vector", "hybrid"):
+                    rag = RagStore(mem, search_mode=mode)
+                    if mode == "vector":
+                        rag.index_text("plan.md", "atlas milestones and schedule")
+                        rag.index_text("ops.md", "hermes outage runbook")
+                        rag.index_text("misc.md", "quarterly gardening notes")
+                    results = rag.hybrid_search("atlas", graph, limit=5)
+                    sources = [r["source"] for r in results]
+                    self.assertEqual(sources[0], "plan.md")
+                    self.assertIn("ops.md", sources)
+                    self.assertNotIn("misc.md", sources)
+                    self.assertEqual(len(sources), len(set(sources)))
+            finally:
+                mem._conn.close()
+
+    def test_search_many_fuses_queries_in_one_pass(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            mem = MemoryStore(os.path.join(tmp, "mem.db"), embedding_dim=64)
+            try:
+                for mode in ("vector", "hybrid"):
+                    rag = RagStore(mem, search_mode=mode)
+                    if mode == "vector":
+                        rag.index_text("plan.md", "atlas milestones and schedule")
+                        rag.index_text("ops.md", "hermes outage runbook")
+                        rag.index_text("misc.md", "quarterly gardening notes")
+                    with mock.patch.object(rag, "_hybrid_candidates", wraps=rag._hybrid_candidates) as candidates:
+                        results = rag.search_many(["atlas schedule", "hermes outage", "atlas schedule"], limit=5)
+                    self.assertEqual(candidates.call_count, 1)
+                    sources = [r["source"] for r in results]
+                    self.assertEqual(sorted(sources), ["ops.md", "plan.md"])
+                    self.assertEqual(rag.search_many([" "]), [])
+            finally:
+                mem._conn.close()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import time
+import unittest
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from memory import MemoryStore
+from metrics import Metrics
+from rag import RagStore
+from retrieval_cache import RetrievalCache
+
+
+class TestRetrievalCache(unittest.TestCase):
+    def test_lru_ttl_and_generation(self):
+        metrics = Metrics()
+        cache = RetrievalCache(max_entries=2, ttl_seconds=60, metrics=metrics)
+        first = cache.key("rag", "  Alpha   Beta ", 5)
+        self.assertEqual(first, cache.key("rag", "alpha beta", 5))
+        cache.put(first, [{"id": 1}])
+        hit, value = cache.get(first)
+        self.assertTrue(hit)
+        value[0]["id"] = 99
+        self.assertEqual(cache.get(first)[1], [{"id": 1}])
+        cache.put(cache.key("rag", "two", 5), [])
+        self.assertTrue(cache.get(first)[0])
+        cache.put(cache.key("rag", "three", 5), [])
+        self.assertTrue(cache.get(first)[0])
+        self.assertFalse(cache.get(cache.key("rag", "two", 5))[0])
+
+        stale = cache.generation
+        cache.bump()
+        self.assertFalse(cache.get(first)[0])
+        cache.put(first, ["old"], generation=stale)
+        self.assertFalse(cache.get(first)[0])
+
+        cache.ttl_seconds = 0
+        cache.put(first, [])
+        time.sleep(0.01)
+        self.assertFalse(cache.get(first)[0])
+        counters = metrics.snapshot()["counters"]
+        self.assertEqual(counters["retrieval_cache.hits"], cache.hits)
+        self.assertEqual(counters["retrieval_cache.misses"], cache.misses)
+
+    def test_stores_invalidate_on_writes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            mem = MemoryStore(os.path.join(tmp, "mem.db"), embedding_dim=32)
+            try:
+                rag = RagStore(mem)
+                cache = RetrievalCache()
+                mem.cache = cache
+                rag.cache = cache
+                rag.index_text("a.txt", "alpha notes")
+                self.assertEqual(len(rag.search("alpha")), 1)
+                self.assertEqual(len(rag.search("ALPHA ")), 1)
+                self.assertEqual(cache.hits, 1)
+                rag.index_text("b.txt", "more alpha notes")
+                self.assertEqual(len(rag.search("alpha")), 2)
+
+                mem.add_memory("note", "alpha memory")
+                self.assertEqual(len(mem.search_memory("alpha")), 1)
+                mem.add_memory("note", "second alpha memory")
+                self.assertEqual(len(mem.search_memory("alpha")), 2)
+                self.assertEqual(len(mem.search_memory("alpha", limit=1)), 1)
+            finally:
+                mem._conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from memory import MemoryStore
+from storage import Database
+
+
+class TestStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "memory.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_wal_and_reader_pool(self):
+        db = Database(self.path, pool_size=2)
+        try:
+            self.assertEqual(db.writer.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            with db.write() as conn:
+                conn.execute("CREATE TABLE t (v INTEGER)")
+                conn.execute("INSERT INTO t (v) VALUES (1)")
+            with db.read() as outer:
+                with db.read() as inner:
+                    self.assertIs(outer, inner)
+                    self.assertIsNot(inner, db.writer)
+                    self.assertEqual(inner.execute("SELECT v FROM t").fetchone()[0], 1)
+        finally:
+            db.close()
+
+    def test_concurrent_writes_and_reads(self):
+        store = MemoryStore(self.path, embedding_dim=32, db_options={"pool_size": 2})
+        errors = []
+
+        def writer(n):
+            try:
+                for i in range(50):
+                    store.add_memory("note", f"alpha {n} {i}")
+                    store.log_event("tick", str(i))
+            except Exception as exc:
+                errors.append(exc)
+
+        def reader():
+            try:
+                for _ in range(50):
+                    store.search_memory("alpha")
+                    store.recent_events(5)
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(3)]
+        threads += [threading.Thread(target=reader) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        with store.db.read() as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM memories").fetchone()[0], 150)
+        store.db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
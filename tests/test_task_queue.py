@@ -0,0 +1,79 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from metrics import Metrics
+from task_queue import TaskQueue, parse_lane_limits
+
+
+class TestTaskQueue(unittest.TestCase):
+    def setUp(self):
+        self.metrics = Metrics()
+        self.queue = TaskQueue(max_size=50, workers=3, metrics=self.metrics)
+
+    def tearDown(self):
+        self.queue.shutdown(timeout=5, cancel_pending=True)
+
+    def test_enqueue_and_wait_returns_result(self):
+        self.assertEqual(self.queue.enqueue_and_wait(lambda: 42), 42)
+        with self.assertRaises(ZeroDivisionError):
+            self.queue.enqueue_and_wait(lambda: 1 / 0)
+        # A failing task does not take its worker down.
+        self.assertEqual(self.queue.enqueue_and_wait(lambda: "still running"), "still running")
+
+    def test_long_interactive_task_does_not_block_other_lanes(self):
+        release = threading.Event()
+        self.queue.enqueue(release.wait)
+        started = time.monotonic()
+        self.assertEqual(self.queue.enqueue_and_wait(lambda: "tick", lane="scheduled", timeout=2), "tick")
+        self.assertEqual(self.queue.enqueue_and_wait(lambda: "dream", lane="background", timeout=2), "dream")
+        self.assertLess(time.monotonic() - started, 1.0)
+        release.set()
+
+    def test_lane_limit_and_cancellation(self):
+        release = threading.Event()
+        first = self.queue.enqueue(release.wait)
+        second = self.queue.enqueue(lambda: "second")
+        time.sleep(0.05)
+        # interactive allows one task at a time, so the second is still queued and can be cancelled.
+        self.assertEqual(self.queue.depth("interactive"), 1)
+        self.assertTrue(second.cancel())
+        release.set()
+        first.result(timeout=2)
+        self.assertEqual(self.queue.enqueue_and_wait(lambda: "third", timeout=2), "third")
+        stats = self.queue.stats()["interactive"]
+        self.assertEqual(stats["cancelled"], 1)
+        self.assertEqual(stats["completed"], 2)
+        self.assertEqual(self.metrics.snapshot()["counters"]["task_queue.interactive.cancelled"], 1)
+
+    def test_higher_priority_lane_runs_first(self):
+        queue = TaskQueue(max_size=10, workers=1, lane_limits={"background": 1})
+        release = threading.Event()
+        order = []
+        queue.enqueue(release.wait)
+        queue.enqueue(lambda: order.append("background"), lane="background")
+        queue.enqueue(lambda: order.append("scheduled"), lane="scheduled")
+        queue.enqueue(lambda: order.append("interactive"))
+        release.set()
+        self.assertTrue(queue.shutdown(timeout=2))
+        self.assertEqual(order, ["interactive", "scheduled", "background"])
+
+    def test_shutdown_drains_queue_and_rejects_new_tasks(self):
+        done = []
+        for i in range(5):
+            self.queue.enqueue(lambda i=i: done.append(i), lane="background")
+        self.assertTrue(self.queue.shutdown(timeout=2))
+        self.assertEqual(sorted(done), [0, 1, 2, 3, 4])
+        with self.assertRaises(RuntimeError):
+            self.queue.enqueue(lambda: None)
+
+    def test_parse_lane_limits(self):
+        limits = parse_lane_limits("interactive=2, bogus=3, background=x")
+        self.assertEqual(limits, {"interactive": 2, "scheduled": 1, "background": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from team import AgentRole, ManagerWorkerOrchestrator, RollingContext, TeamOrchestrator
+
+
+class TestManagerWorkerOrchestrator(unittest.TestCase):
+    def test_workers_fan_out_and_keep_order(self):
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def chat(prompt):
+            role = prompt.split("\n", 1)[0][len("Role: "):]
+            if role.startswith("W"):
+                with lock:
+                    active.append(role)
+                    peak.append(len(active))
+                time.sleep(0.1)
+                with lock:
+                    active.remove(role)
+            return f"{role} done"
+
+        manager = AgentRole("Manager", "Plan only.")
+        workers = [AgentRole(f"W{i}", "Work.") for i in range(4)]
+        started = time.monotonic()
+        out = ManagerWorkerOrchestrator(chat, max_workers=2).run(manager, workers, "task")
+        self.assertEqual(max(peak), 2)
+        self.assertLess(time.monotonic() - started, 0.35)
+        sections = [block.split("\n", 1)[0] for block in out.split("\n\n")]
+        self.assertEqual(sections, ["## Manager", "## W0", "## W1", "## W2", "## W3", "## Manager Review"])
+
+
+class TestTeamOrchestrator(unittest.TestCase):
+    def setUp(self):
+        self.roles = [
+            AgentRole("Planner", "Plan."),
+            AgentRole("Builder", "Build."),
+            AgentRole("Reviewer", "Review."),
+        ]
+        self.selector_calls = []
+
+    def _selector(self, prompt):
+        self.selector_calls.append(prompt)
+        return "Planner"
+
+    def test_small_role_sets_are_selected_locally(self):
+        team = TeamOrchestrator(lambda p: "ok, over to Reviewer", speaker_selector_llm=self._selector, manager_llm=lambda p: "")
+        out = team.run(self.roles, "task")
+        self.assertEqual(len(self.selector_calls), 1)
+        # The builder handed off to the reviewer by name.
+        self.assertEqual([b.split("\n", 1)[0] for b in out.split("\n\n")], ["## Planner", "## Reviewer", "## Builder"])
+
+    def test_llm_selection_is_cached(self):
+        team = TeamOrchestrator(lambda p: "ok", speaker_selector_llm=self._selector, manager_llm=lambda p: "")
+        team.run(self.roles, "task")
+        team.run(self.roles, "another task")
+        self.assertEqual(len(self.selector_calls), 1)
+
+
+class TestRollingContext(unittest.TestCase):
+    def test_stays_within_budget(self):
+        context = RollingContext(max_tokens=100, summary_chars=40)
+        for i in range(30):
+            context.add(f"R{i}", f"turn {i} " + "detail " * 30)
+        text = context.render()
+        self.assertLessEqual(len(text) // 4, 110)
+        self.assertIn("[R29] turn 29 detail", text)
+        self.assertIn("(summary)", text)
+        self.assertIn("earlier turns omitted", text)
+        self.assertTrue(text.index("[R28]") < text.index("[R29]"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from vector_index import VectorIndex, np
+
+
+class TestVectorIndex(unittest.TestCase):
+    def test_exact_top_k_and_remove(self):
+        index = VectorIndex(4)
+        index.add_many([(1, [1, 0, 0, 0]), (2, [1, 1, 0, 0]), (3, [0, 0, 1, 0])])
+        hits = index.search([1, 0, 0, 0], k=5)
+        self.assertEqual([item_id for item_id, _ in hits], [1, 2])
+        self.assertAlmostEqual(hits[0][1], 1.0, places=5)
+        index.remove([1])
+        self.assertEqual([item_id for item_id, _ in index.search([1, 0, 0, 0], k=5)], [2])
+        self.assertEqual(index.search([1, 0, 0, 0], k=5, allowed=[3]), [])
+
+    @unittest.skipIf(np is None, "numpy not installed")
+    def test_approximate_mode_finds_exact_match(self):
+        rng = random.Random(7)
+        index = VectorIndex(16, ann_threshold=200, nprobe=4)
+        vectors = {i: [rng.randint(0, 3) for _ in range(16)] for i in range(500)}
+        index.add_many(vectors.items())
+        self.assertTrue(index.approximate)
+        hits = index.search(vectors[42], k=3)
+        self.assertEqual(hits[0][0], 42)
+
+
+if __name__ == "__main__":
+    unittest.main()
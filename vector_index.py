@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import heapq
+import math
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+
+def _normalize(vec: Sequence[float]) -> List[float]:
+    norm = math.sqrt(sum(v * v for v in vec))
+    if norm == 0:
+        return [0.0] * len(vec)
+    return [v / norm for v in vec]
+
+
+class VectorIndex:
+    """Resident L2-normalized embedding matrix answering top-k cosine queries.
+
+    Uses one matrix-vector product plus argpartition when NumPy is available and
+    falls back to a pure-Python scan otherwise. Once the corpus grows past
+    `ann_threshold` rows an IVF (inverted file) coarse quantizer is trained and
+    queries only score the `nprobe` closest cells.
+    """
+
+    def __init__(
+        self,
+        dims: int,
+        ann_threshold: int = 50000,
+        nprobe: int = 8,
+        nlist: int | None = None,
+    ) -> None:
+        self.dims = dims
+        self.ann_threshold = ann_threshold
+        self.nprobe = max(1, nprobe)
+        self.nlist = nlist
+        self._lock = threading.RLock()
+        self._ids: List[int] = []
+        self._pos: Dict[int, int] = {}
+        self._rows: List[List[float]] = []
+        self._matrix = np.zeros((0, dims), dtype=np.float32) if np is not None else None
+        self._centroids = None
+        self._assign = None
+        self._trained_size = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self._pos
+
+    @property
+    def approximate(self) -> bool:
+        return np is not None and self.ann_threshold > 0 and len(self._ids) >= self.ann_threshold
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ids = []
+            self._pos = {}
+            self._rows = []
+            if np is not None:
+                self._matrix = np.zeros((0, self.dims), dtype=np.float32)
+            self._centroids = None
+            self._assign = None
+            self._trained_size = 0
+
+    def add(self, item_id: int, vec: Sequence[float]) -> None:
+        self.add_many([(item_id, vec)])
+
+    def add_many(self, items: Iterable[Tuple[int, Sequence[float]]]) -> None:
+        items = [(int(item_id), vec) for item_id, vec in items]
+        if not items:
+            return
+        with self._lock:
+            stale = [item_id for item_id, _ in items if item_id in self._pos]
+            if stale:
+                self.remove(stale)
+            if np is None:
+                for item_id, vec in items:
+                    self._pos[item_id] = len(self._ids)
+                    self._ids.append(item_id)
+                    self._rows.append(_normalize(vec))
+                return
+            block = np.asarray([vec for _, vec in items], dtype=np.float32).reshape(len(items), self.dims)
+            norms = np.linalg.norm(block, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            block /= norms
+            start = len(self._ids)
+            needed = start + len(items)
+            if needed > self._matrix.shape[0]:
+                capacity = max(needed, self._matrix.shape[0] * 2, 64)
+                grown = np.zeros((capacity, self.dims), dtype=np.float32)
+                grown[:start] = self._matrix[:start]
+                self._matrix = grown
+            self._matrix[start:needed] = block
+            for offset, (item_id, _) in enumerate(items):
+                self._pos[item_id] = start + offset
+                self._ids.append(item_id)
+            if self._centroids is not None:
+                assign = np.argmax(block @ self._centroids.T, axis=1).astype(np.int32)
+                self._assign = np.concatenate([self._assign[:start], assign])
+
+    def remove(self, ids: Iterable[int]) -> int:
+        removed = 0
+        with self._lock:
+            for item_id in ids:
+                pos = self._pos.pop(int(item_id), None)
+                if pos is None:
+                    continue
+                last = len(self._ids) - 1
+                if pos != last:
+                    moved = self._ids[last]
+                    self._ids[pos] = moved
+                    self._pos[moved] = pos
+                    if np is None:
+                        self._rows[pos] = self._rows[last]
+                    else:
+                        self._matrix[pos] = self._matrix[last]
+                        if self._assign is not None:
+                            self._assign[pos] = self._assign[last]
+                self._ids.pop()
+                if np is None:
+                    self._rows.pop()
+                elif self._assign is not None:
+                    self._assign = self._assign[:last]
+                removed += 1
+        return removed
+
+    def search(
+        self,
+        qvec: Sequence[float],
+        k: int = 5,
+        allowed: Optional[Iterable[int]] = None,
+    ) -> List[Tuple[int, float]]:
+        """Return up to k (id, cosine) pairs with a positive score, best first."""
+        if k <= 0:
+            return []
+        with self._lock:
+            if not self._ids:
+                return []
+            if np is None:
+                return self._search_python(qvec, k, allowed)
+            return self._search_numpy(qvec, k, allowed)
+
+    def _search_python(self, qvec, k, allowed) -> List[Tuple[int, float]]:
+        q = _normalize(qvec)
+        if allowed is None:
+            positions: Iterable[int] = range(len(self._ids))
+        else:
+            positions = [self._pos[i] for i in allowed if i in self._pos]
+        scored = []
+        for pos in positions:
+            row = self._rows[pos]
+            score = sum(a * b for a, b in zip(q, row))
+            if score > 0:
+                scored.append((score, self._ids[pos]))
+        return [(item_id, score) for score, item_id in heapq.nlargest(k, scored)]
+
+    def _search_numpy(self, qvec, k, allowed) -> List[Tuple[int, float]]:
+        q = np.asarray(qvec, dtype=np.float32).reshape(self.dims)
+        qnorm = float(np.linalg.norm(q))
+        if qnorm == 0:
+            return []
+        q = q / qnorm
+        size = len(self._ids)
+        positions = None
+        if allowed is not None:
+            positions = np.fromiter(
+                (self._pos[i] for i in allowed if i in self._pos),
+                dtype=np.int64,
+            )
+            if positions.size == 0:
+                return []
+        if self.approximate:
+            self._ensure_ivf()
+            probes = np.argsort(self._centroids @ q)[::-1][: self.nprobe]
+            in_probe = np.isin(self._assign[:size], probes)
+            if positions is None:
+                positions = np.nonzero(in_probe)[0]
+            else:
+                positions = positions[in_probe[positions]]
+            if positions.size == 0:
+                return []
+        if positions is None:
+            scores = self._matrix[:size] @ q
+        else:
+            scores = self._matrix[positions] @ q
+        top = min(k, scores.shape[0])
+        idx = np.argpartition(-scores, top - 1)[:top]
+        idx = idx[np.argsort(-scores[idx])]
+        results = []
+        for i in idx:
+            score = float(scores[i])
+            if score <= 0:
+                break
+            pos = int(positions[i]) if positions is not None else int(i)
+            results.append((self._ids[pos], score))
+        return results
+
+    def _ensure_ivf(self) -> None:
+        size = len(self._ids)
+        if self._centroids is not None and size < self._trained_size * 2:
+            return
+        nlist = self.nlist or max(1, int(math.sqrt(size)))
+        data = self._matrix[:size]
+        rng = np.random.default_rng(0)
+        sample = data[rng.choice(size, size=min(size, nlist * 64), replace=False)]
+        centroids = sample[rng.choice(sample.shape[0], size=min(nlist, sample.shape[0]), replace=False)].copy()
+        for _ in range(8):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(centroids.shape[0]):
+                members = sample[assign == c]
+                if members.shape[0]:
+                    centroids[c] = members.mean(axis=0)
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids /= norms
+        self._centroids = centroids
+        self._assign = np.argmax(data @ centroids.T, axis=1).astype(np.int32)
+        self._trained_size = size